@@ -0,0 +1,144 @@
+'''
+    Сравнение бэкендов исполнения моделей. Для каждой модели конфигурации и
+    каждого варианта (бэкенд:точность) измеряет скорость обработки кадров и
+    расхождение результатов с эталоном PyTorch fp32: долю найденных эталонных
+    объектов, долю лишних объектов, средний IoU и смещение ключевых точек.
+
+    python benchmarks/backends.py --video-path data/test_short.mp4 --frames 200 \
+        --variants YOLO:fp32 ONNX:fp32 ONNX:int8 OpenVINO:fp32 OpenVINO:int8
+'''
+import argparse
+import copy
+import json
+import time
+
+import cv2
+import numpy as np
+
+from dms.handler.backends import load_backend
+from dms.settings import config
+
+
+def read_frames(video_path, count):
+    """чтение первых count кадров видео"""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        success, frame = cap.read()
+        if not success:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run(backend, frames, batch_size, conf):
+    """применение модели ко всем кадрам батчами
+
+    Returns:
+        (float, list): число кадров в секунду и результаты для каждого кадра
+    """
+    backend.predict(frames[:batch_size], conf)  # прогрев
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        results.extend(backend.predict(frames[i:i + batch_size], conf))
+    return len(frames) / (time.perf_counter() - start), results
+
+
+def objects(result):
+    """классы, рамки и ключевые точки объектов кадра в виде массивов numpy"""
+    boxes = result.boxes.cpu().numpy()
+    keypoints = result.keypoints.xy.cpu().numpy() if result.keypoints else None
+    return boxes.cls.astype(np.int64), boxes.xyxy, keypoints
+
+
+def iou(boxes_a, boxes_b):
+    """матрица IoU двух наборов рамок"""
+    lt = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    rb = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def drift(reference, results, iou_threshold=0.5):
+    """расхождение результатов с эталоном. Объекты одного класса сопоставляются
+       жадно по убыванию IoU
+
+    Returns:
+        dict: доля найденных эталонных объектов, доля лишних объектов,
+        средний IoU и среднее смещение ключевых точек сопоставленных объектов (пиксели)
+    """
+    ref_total, total, ious, keypoint_shifts = 0, 0, [], []
+    for ref_result, result in zip(reference, results):
+        ref_cls, ref_boxes, ref_keypoints = objects(ref_result)
+        cls, boxes, keypoints = objects(result)
+        ref_total += len(ref_cls)
+        total += len(cls)
+        if not len(ref_cls) or not len(cls):
+            continue
+        overlap = iou(ref_boxes, boxes)
+        overlap[ref_cls[:, None] != cls[None, :]] = 0
+        for _ in range(min(len(ref_cls), len(cls))):
+            i, j = np.unravel_index(np.argmax(overlap), overlap.shape)
+            if overlap[i, j] < iou_threshold:
+                break
+            ious.append(overlap[i, j])
+            if ref_keypoints is not None and keypoints is not None:
+                keypoint_shifts.append(np.linalg.norm(ref_keypoints[i] - keypoints[j], axis=1).mean())
+            overlap[i, :] = 0
+            overlap[:, j] = 0
+    return {
+        'recall': len(ious) / ref_total if ref_total else 1.0,
+        'extra': (total - len(ious)) / total if total else 0.0,
+        'mean_iou': float(np.mean(ious)) if ious else None,
+        'keypoint_shift': float(np.mean(keypoint_shifts)) if keypoint_shifts else None
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-v', '--video-path', type=str, default='data/test_short.mp4', help="Путь к видео")
+    parser.add_argument('-n', '--frames', type=int, default=200, help="Число кадров")
+    parser.add_argument('-b', '--batch-size', type=int, default=config['handler']['processing']['BATCH_SIZE'],
+                        help="Размер батча")
+    parser.add_argument('--variants', nargs='+', default=['YOLO:fp32', 'ONNX:fp32', 'ONNX:int8',
+                                                          'OpenVINO:fp32', 'OpenVINO:int8'],
+                        help="Варианты исполнения в виде бэкенд:точность")
+    parser.add_argument('--device', type=str, default='cpu', help="Устройство исполнения")
+    parser.add_argument('--json', type=str, default=None, help="Путь для сохранения результатов в json")
+    args = parser.parse_args()
+
+    frames = read_frames(args.video_path, args.frames)
+    report = {}
+    for model_name, model_conf in config['handler']['models'].items():
+        conf = model_conf['specific_params']['conf']
+        reference_conf = copy.deepcopy(model_conf)
+        reference_conf['format'] = 'YOLO'
+        reference_conf['specific_params']['precision'] = 'fp32'
+        _, reference = run(load_backend(reference_conf, args.device), frames, args.batch_size, conf)
+
+        report[model_name] = {}
+        for variant in args.variants:
+            model_format, precision = variant.split(':')
+            variant_conf = copy.deepcopy(model_conf)
+            variant_conf['format'] = model_format
+            variant_conf['specific_params']['precision'] = precision
+            try:
+                fps, results = run(load_backend(variant_conf, args.device), frames, args.batch_size, conf)
+            except Exception as e:
+                print(f'{model_name} {variant}: ошибка: {e!r}')
+                continue
+            report[model_name][variant] = {'fps': fps, **drift(reference, results)}
+
+            stats = report[model_name][variant]
+            mean_iou = f'{stats["mean_iou"]:.3f}' if stats['mean_iou'] is not None else '-'
+            shift = f'{stats["keypoint_shift"]:.2f}' if stats['keypoint_shift'] is not None else '-'
+            print(f'{model_name:24} {variant:16} fps: {fps:7.2f}  recall: {stats["recall"]:.3f}  '
+                  f'extra: {stats["extra"]:.3f}  iou: {mean_iou}  keypoints: {shift}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
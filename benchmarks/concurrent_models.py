@@ -0,0 +1,85 @@
+'''
+    Сравнение последовательного и параллельного применения независимых моделей
+    в process_batch. Проверяет совпадение результатов обработчика и выводит
+    время обработки и ускорение. Каскадный режим отключается, чтобы все модели
+    конфигурации были независимыми.
+
+    python benchmarks/concurrent_models.py --video-path data/test_short.mp4 --frames 200 \
+        --threads yolo_phone_detection=4 yolo_pose_detection=12
+
+    Без --video-path используется синтетическое видео с моделями-заглушками,
+    время инференса заглушек задается --latency-ms:
+
+    python benchmarks/concurrent_models.py --latency-ms 10
+'''
+import argparse
+import copy
+import os
+import tempfile
+import time
+
+import cv2
+
+from dms.benchmark.stubs import stub_config
+from dms.benchmark.synthetic import make_video
+from dms.handler import VideoHandler
+from dms.settings import config as default_config
+
+
+def run(handler_config, batches):
+    """обработка заранее прочитанных батчей кадров
+
+    Returns:
+        (float, dict): время обработки и результаты обработчика
+    """
+    handler = VideoHandler(handler_config)
+    handler.process_batch(*batches[0])  # прогрев
+    handler.clear_data()
+    start = time.perf_counter()
+    for frames, timestamps, frame_ids in batches:
+        handler.process_batch(frames, timestamps, frame_ids)
+    return time.perf_counter() - start, handler.data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-v', '--video-path', type=str, default=None,
+                        help="Путь к видео, по умолчанию синтетическое видео с моделями-заглушками")
+    parser.add_argument('-n', '--frames', type=int, default=200, help="Число обрабатываемых кадров")
+    parser.add_argument('--latency-ms', type=float, default=10.0, help="Время инференса заглушки на кадр (мс)")
+    parser.add_argument('-t', '--threads', type=str, nargs='*', default=[],
+                        help="Число потоков torch для моделей: название=число")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.video_path is None:
+            config = stub_config({'latency_ms': args.latency_ms})
+            video_path = make_video(os.path.join(tmp_dir, 'synthetic.avi'), args.frames)
+        else:
+            config = default_config
+            video_path = args.video_path
+
+        sequential_config = copy.deepcopy(config['handler'])
+        sequential_config['processing']['cascade'] = False
+        sequential_config['processing']['concurrency'] = {'enabled': False}
+        concurrent_config = copy.deepcopy(sequential_config)
+        concurrent_config['processing']['concurrency'] = {
+            'enabled': True,
+            'threads': {name: int(value) for name, value in (item.split('=') for item in args.threads)}
+        }
+
+        cap = cv2.VideoCapture(video_path)
+        batches = list(VideoHandler.read_batches(cap, sequential_config['processing']['BATCH_SIZE'], args.frames))
+        cap.release()
+
+    sequential_time, sequential_data = run(sequential_config, batches)
+    concurrent_time, concurrent_data = run(concurrent_config, batches)
+
+    for task in sequential_data:
+        assert list(sequential_data[task]) == list(concurrent_data[task]), f'результаты {task} не совпадают'
+
+    frames = len(sequential_data['detection'])
+    print(f'frames: {frames}, models: {sum(len(models) for models in VideoHandler(sequential_config).models.values())}')
+    print(f'sequential: {sequential_time:.2f} s ({frames / sequential_time:.1f} fps)')
+    print(f'concurrent: {concurrent_time:.2f} s ({frames / concurrent_time:.1f} fps)')
+    print(f'speedup:    {sequential_time / concurrent_time:.2f}x')
@@ -0,0 +1,105 @@
+'''
+    Сравнение декодирования кадров в новые массивы и в кольцевой буфер кадров
+    (processing.frame_buffer). Каждый режим выполняется в отдельном процессе,
+    выводятся скорость обработки, число выделенных массивов кадров и пиковый
+    объем памяти процесса (RSS). Проверяет совпадение результатов обработчика.
+
+    python benchmarks/frame_buffer.py --video-path data/test_short.mp4 --frames 600
+
+    Без --video-path используется синтетическое видео заданного размера
+    с моделями-заглушками:
+
+    python benchmarks/frame_buffer.py --width 1920 --height 1080 --frames 600
+'''
+import argparse
+import copy
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from dms.benchmark.stubs import stub_config
+from dms.benchmark.synthetic import make_video
+from dms.handler import VideoHandler
+from dms.settings import config as default_config
+from dms.utils.metrics import metrics
+
+
+def run(handler_config, video_path, frames, enabled):
+    """обработка видео в текущем процессе
+
+    Returns:
+        dict: время обработки, число кадров, число выделенных массивов кадров,
+        пиковый RSS (Мб) и результаты обработчика
+    """
+    handler_config = copy.deepcopy(handler_config)
+    handler_config['processing']['cache'] = None
+    handler_config['processing']['frame_buffer'] = {'enabled': enabled}
+    metrics.configure({'enabled': True})
+    handler = VideoHandler(handler_config)
+
+    start = time.perf_counter()
+    handler.process_segment(video_path, stop_frame=frames, progress=False)
+    elapsed = time.perf_counter() - start
+
+    counters = {counter['name']: counter['value'] for counter in metrics.snapshot()['counters']}
+    return {
+        'seconds': elapsed,
+        'frames': len(handler.data['detection']),
+        'allocations': counters.get('frame_allocations_total', 0),
+        'buffer_mb': handler._ring.nbytes / 2 ** 20 if handler._ring is not None else 0.0,
+        # ru_maxrss в Linux задается в килобайтах
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'data': {task: [list(map(str, row)) for row in table] for task, table in handler.data.items()}
+    }
+
+
+def run_subprocess(args, video_path, enabled):
+    """запуск режима в отдельном процессе, чтобы пиковый RSS относился только к нему"""
+    command = [sys.executable, __file__, '--child', '--frames', str(args.frames), '--video-path', video_path,
+               '--latency-ms', str(args.latency_ms)]
+    if enabled:
+        command.append('--buffer')
+    if args.stub:
+        command.append('--stub')
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-v', '--video-path', type=str, default=None,
+                        help="Путь к видео, по умолчанию синтетическое видео с моделями-заглушками")
+    parser.add_argument('-n', '--frames', type=int, default=600, help="Число обрабатываемых кадров")
+    parser.add_argument('--width', type=int, default=1920, help="Ширина синтетического видео")
+    parser.add_argument('--height', type=int, default=1080, help="Высота синтетического видео")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Время инференса заглушки на кадр (мс)")
+    parser.add_argument('--stub', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--buffer', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        config = stub_config({'latency_ms': args.latency_ms}) if args.stub else default_config
+        print(json.dumps(run(config['handler'], args.video_path, args.frames, args.buffer)))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        args.stub = args.video_path is None
+        if args.stub:
+            video_path = make_video(os.path.join(tmp_dir, 'synthetic.avi'), args.frames, args.width, args.height)
+        else:
+            video_path = args.video_path
+        results = {'list': run_subprocess(args, video_path, False), 'buffer': run_subprocess(args, video_path, True)}
+
+    for task in results['list']['data']:
+        assert results['list']['data'][task] == results['buffer']['data'][task], f'результаты {task} не совпадают'
+
+    print(f'frames: {results["list"]["frames"]}')
+    for name, result in results.items():
+        print(f'{name:7s} {result["frames"] / result["seconds"]:7.1f} fps, '
+              f'frame allocations: {result["allocations"]:5d}, '
+              f'buffer: {result["buffer_mb"]:6.1f} MB, peak RSS: {result["peak_rss_mb"]:7.1f} MB')
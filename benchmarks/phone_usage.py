@@ -0,0 +1,82 @@
+'''
+    Микробенчмарк поиска кадров с использованием телефона (Analyzer._get_phone_usage_frames).
+    Сравнивает векторную реализацию с исходным вложенным циклом на синтетических данных
+    и проверяет совпадение результатов.
+
+    python benchmarks/phone_usage.py --frames 100000
+'''
+import argparse
+import time
+
+import numpy as np
+
+from dms.analysis import Analyzer
+from dms.handler.storage import DetectionTable, PoseTable
+from dms.settings import config
+
+
+def reference_phone_usage_frames(det, pos, max_wrist_dist):
+    """исходная реализация с вложенными циклами, используется для сравнения"""
+    phone_usage_frames = []
+    for frame_id, timestamp, detections in det:
+        for obj_name, bbox in detections:
+            if obj_name == 'cell phones':
+                for person, keys, _ in pos[frame_id - 1][2]:
+                    for wrist in keys[9:11]:
+                        if np.linalg.norm(Analyzer._get_center(bbox) - wrist) < max_wrist_dist:
+                            phone_usage_frames.append((frame_id, timestamp, person))
+                            break
+    return phone_usage_frames
+
+
+def make_data(frames, phone_rate, max_persons, seed=0):
+    """генерирует синтетические результаты обработки в формате записей [id кадра, временная метка, объекты]"""
+    rng = np.random.default_rng(seed)
+    det, pos = [], []
+    for frame_id in range(1, frames + 1):
+        timestamp = frame_id * 1000 / 30
+        detections = []
+        if rng.random() < phone_rate:
+            for _ in range(rng.integers(1, 3)):
+                detections.append(('cell phones', rng.uniform(0, 1000, 4).astype(np.float32).tolist()))
+        if rng.random() < 0.3:
+            detections.append(('cup', rng.uniform(0, 1000, 4).astype(np.float32).tolist()))
+        persons = [[i,
+                    rng.uniform(0, 1000, (17, 2)).astype(np.float32).tolist(),
+                    rng.uniform(0, 1000, 4).astype(np.float32).tolist()]
+                   for i in range(rng.integers(0, max_persons + 1))]
+        det.append([frame_id, timestamp, detections])
+        pos.append([frame_id, timestamp, persons])
+    return det, pos
+
+
+def measure(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=100000, help="Число кадров")
+    parser.add_argument('--phone-rate', type=float, default=0.3, help="Доля кадров с телефоном")
+    parser.add_argument('--max-persons', type=int, default=2, help="Максимальное число людей в кадре")
+    parser.add_argument('--repeat', type=int, default=3, help="Число повторов измерения")
+    args = parser.parse_args()
+
+    analyzer = Analyzer(config['analyser'])
+    max_wrist_dist = config['analyser']['wrist_phone_usage']['max_wrist_dist']
+    det, pos = make_data(args.frames, args.phone_rate, args.max_persons)
+
+    ref_time, ref = measure(lambda: reference_phone_usage_frames(det, pos, max_wrist_dist), args.repeat)
+    det_table, pos_table = DetectionTable.from_records(det), PoseTable.from_records(pos)
+    vec_time, vec = measure(lambda: analyzer._get_phone_usage_frames(det_table, pos_table), args.repeat)
+
+    assert ref == vec, 'результаты реализаций не совпадают'
+    print(f'frames: {args.frames}, matches: {len(vec)}')
+    print(f'loop:       {ref_time:.4f} s')
+    print(f'vectorized: {vec_time:.4f} s')
+    print(f'speedup:    {ref_time / vec_time:.1f}x')
@@ -0,0 +1,53 @@
+'''
+    Проверка и замер параллельной обработки одного видео по фрагментам.
+    Сравнивает результаты обработчика и найденные нарушения с последовательной
+    обработкой того же видео и выводит ускорение.
+
+    python benchmarks/segment_parallel.py --video-path data/test_short.mp4 --workers 4
+'''
+import argparse
+import copy
+import time
+
+from dms.analysis import Analyzer
+from dms.handler import VideoHandler
+from dms.settings import config
+
+
+def run(handler_config, video_path):
+    """обработка видео с заданной конфигурацией обработчика
+
+    Returns:
+        (float, dict, list): время обработки, результаты обработчика и нарушения
+    """
+    handler = VideoHandler(handler_config)
+    start = time.perf_counter()
+    data = handler.process_video(video_path)
+    elapsed = time.perf_counter() - start
+    violations = Analyzer(config['analyser']).violation_analysis(data, list(config['analyser'].keys()))
+    return elapsed, data, violations
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-v', '--video-path', type=str, default='data/test_short.mp4', help="Путь к видео")
+    parser.add_argument('-w', '--workers', type=int, default=4, help="Число фрагментов и процессов")
+    args = parser.parse_args()
+
+    serial_config = copy.deepcopy(config['handler'])
+    serial_config['processing']['cache'] = None
+    serial_config['processing']['segment_workers'] = 1
+    parallel_config = copy.deepcopy(serial_config)
+    parallel_config['processing']['segment_workers'] = args.workers
+
+    serial_time, serial_data, serial_violations = run(serial_config, args.video_path)
+    parallel_time, parallel_data, parallel_violations = run(parallel_config, args.video_path)
+
+    for task in serial_data:
+        assert list(serial_data[task]) == list(parallel_data[task]), f'результаты {task} не совпадают'
+    assert serial_violations == parallel_violations, 'нарушения не совпадают'
+
+    print(f'frames: {len(serial_data["detection"])}, violations: {len(serial_violations)}')
+    print(f'serial:   {serial_time:.2f} s')
+    print(f'parallel: {parallel_time:.2f} s ({args.workers} workers)')
+    print(f'speedup:  {serial_time / parallel_time:.2f}x')
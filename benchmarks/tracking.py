@@ -0,0 +1,99 @@
+'''
+    Соотношение точности и скорости при применении моделей к ключевым кадрам
+    с трекингом объектов между ними. Для каждого интервала ключевых кадров
+    сравнивает кадры использования телефона с обработкой всех кадров без
+    трекинга (точность, полнота, F1) и выводит скорость обработки и число
+    найденных нарушений.
+
+    python benchmarks/tracking.py --video-path data/test_short.mp4 --intervals 1 2 3 5 10
+
+    Без --video-path используется синтетическое видео с моделями-заглушками,
+    время инференса заглушек задается --latency-ms:
+
+    python benchmarks/tracking.py --frames 900 --latency-ms 5
+'''
+import argparse
+import copy
+import json
+import os
+import tempfile
+import time
+
+from dms.analysis import Analyzer
+from dms.benchmark.stubs import stub_config
+from dms.benchmark.synthetic import make_video
+from dms.handler import VideoHandler
+from dms.settings import config as default_config
+
+
+def run(config, video_path, interval=None):
+    """обработка видео с трекингом (interval - интервал ключевых кадров) или без него
+
+    Returns:
+        (float, set, list): время обработки, кадры использования телефона и нарушения
+    """
+    handler_config = copy.deepcopy(config['handler'])
+    handler_config['processing']['cache'] = None
+    tracking = dict(handler_config['processing'].get('tracking') or {})
+    tracking['enabled'] = interval is not None
+    if interval is not None:
+        tracking['keyframe_interval'] = interval
+    handler_config['processing']['tracking'] = tracking
+
+    handler = VideoHandler(handler_config)
+    start = time.perf_counter()
+    data = handler.process_video(video_path)
+    elapsed = time.perf_counter() - start
+
+    analyzer = Analyzer(config['analyser'])
+    usage_frames = {frame_id for frame_id, _, _ in analyzer._get_phone_usage_frames(data['detection'], data['pos_est'])}
+    violations = analyzer.violation_analysis(data, list(config['analyser'].keys()))
+    return elapsed, usage_frames, violations
+
+
+def compare(reference, frames):
+    """точность, полнота и F1 кадров использования телефона относительно эталона"""
+    hits = len(reference & frames)
+    precision = hits / len(frames) if frames else 1.0
+    recall = hits / len(reference) if reference else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-v', '--video-path', type=str, default=None,
+                        help="Путь к видео, по умолчанию синтетическое видео с моделями-заглушками")
+    parser.add_argument('-i', '--intervals', type=int, nargs='+', default=[1, 2, 3, 5, 10],
+                        help="Интервалы ключевых кадров")
+    parser.add_argument('-n', '--frames', type=int, default=900, help="Число кадров синтетического видео")
+    parser.add_argument('--latency-ms', type=float, default=5.0, help="Время инференса заглушки на кадр (мс)")
+    parser.add_argument('-o', '--output', type=str, default=None, help="Путь для сохранения результатов (json)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.video_path is None:
+            config = stub_config({'latency_ms': args.latency_ms})
+            video_path = make_video(os.path.join(tmp_dir, 'synthetic.avi'), args.frames)
+        else:
+            config = default_config
+            video_path = args.video_path
+
+        reference_time, reference_frames, reference_violations = run(config, video_path)
+        rows = [{'interval': None, 'seconds': reference_time, 'speedup': 1.0, 'precision': 1.0,
+                 'recall': 1.0, 'f1': 1.0, 'violations': len(reference_violations)}]
+        for interval in args.intervals:
+            elapsed, frames, violations = run(config, video_path, interval)
+            precision, recall, f1 = compare(reference_frames, frames)
+            rows.append({'interval': interval, 'seconds': elapsed, 'speedup': reference_time / elapsed,
+                         'precision': precision, 'recall': recall, 'f1': f1, 'violations': len(violations)})
+
+    print(f'{"interval":>8} {"seconds":>8} {"speedup":>8} {"precision":>9} {"recall":>7} {"f1":>6} {"violations":>10}')
+    for row in rows:
+        interval = 'off' if row['interval'] is None else row['interval']
+        print(f'{interval:>8} {row["seconds"]:>8.2f} {row["speedup"]:>7.2f}x {row["precision"]:>9.3f} '
+              f'{row["recall"]:>7.3f} {row["f1"]:>6.3f} {row["violations"]:>10}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
@@ -1,5 +1,10 @@
 import numpy as np
 
+from dms.analysis.intervals import person_intervals
+from dms.analysis.rules import get_evidence
+from dms.analysis.stream import StreamAnalyzer
+from dms.utils.metrics import metrics
+
 
 class Analyzer:
     """ Класс Analyzer сожержит все доступные методы анализа нарушений системы.
@@ -14,6 +19,8 @@ class Analyzer:
 
         self.config = config
         self.violations = []  # список зафиксированных нарушений
+        # интервалы нарушений правил в миллисекундах [начало, конец, человек, нарушение]
+        self.intervals = []
 
     @staticmethod
     def _get_center(bbox):
@@ -39,50 +46,162 @@ class Analyzer:
         millis = int(millis)
         seconds=(millis/1000)%60
         seconds = int(seconds)
-        minutes=(millis/(1000*60))%60
+        # Минуты не ограничиваются часом, иначе метки видео длиннее часа повторяются
+        minutes=millis/(1000*60)
         minutes = int(minutes)
         return f'{minutes}:{seconds:02}'
 
     @staticmethod
-    def _split_violations(phone_usage_frames):
-        """создает словарь, содержащий информацию о нарушениях 
-           по каждому человеку в кадре
+    def _collect_phones(det):
+        """вспомогательный метод для получения всех найденных телефонов в виде плоских массивов
 
         Args:
-            phone_usage_frames (list): список кадров на которых были зафиксированы нарушения
+            det (DetectionTable): данные, полученные с помощью моделей детекции
 
         Returns:
-            dict: словарь с нарушениями 
+            (np.array, np.array, np.array): id кадров, временные метки кадров и области телефонов
         """
-        person_violations = {}
-        for frame_id, timestamp, person in phone_usage_frames:
-            if person not in person_violations.keys():
-                person_violations[person] = []
-            person_violations[person].append((frame_id, timestamp))
-        return person_violations
-    
+        mask = det.label_mask('cell phones')
+        return (det.object_frame_ids[mask],
+                det.object_timestamps[mask],
+                det.column('box')[mask].astype(np.float64))
+
+    @staticmethod
+    def _collect_wrists(pos, frames):
+        """вспомогательный метод для получения координат запястий (ключевые точки 9 и 10)
+           всех людей на выбранных кадрах в виде плоских массивов. Отсутствующие точки
+           заполняются значением nan
+
+        Args:
+            pos (PoseTable): данные, полученные с помощью моделей определения позы
+            frames (np.array): id кадров, для которых нужны координаты запястий
+
+        Returns:
+            (np.array, np.array, np.array): id кадров, номера людей и координаты запястий
+        """
+        mask = np.isin(pos.object_frame_ids, frames)
+        if not mask.any():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, 2, 2))
+
+        keypoints = pos.column('keypoints')[mask]
+        wrists = np.full((len(keypoints), 2, 2), np.nan)
+        available = keypoints[:, 9:11, :2]
+        wrists[:, :available.shape[1], :available.shape[2]] = available
+        return (pos.object_frame_ids[mask],
+                pos.column('person')[mask].astype(np.int64),
+                wrists)
+
     def _get_phone_usage_frames(self, det, pos):
         """ метод для нахождения всех кадров где был использован телефон.
 
         Args:
-            det (list): данные, полученные с помощью моделей детекции
-            pos (list): данные, полученные с помощью моделей определения позы
+            det (DetectionTable): данные, полученные с помощью моделей детекции
+            pos (PoseTable): данные, полученные с помощью моделей определения позы
 
         Returns:
             list: список кадров на которых были зафиксированы нарушения
         """
-        phone_usage_frames = []
         max_wrist_dist = self.config['wrist_phone_usage']['max_wrist_dist']
+        return list(zip(*(values.tolist() for values in self._phone_usage_hits(det, pos, max_wrist_dist))))
+
+    def _phone_usage_hits(self, det, pos, max_wrist_dist):
+        """ метод для нахождения всех пар (телефон, человек), где телефон находится рядом
+            с запястьем человека.
+
+        Args:
+            det (DetectionTable): данные, полученные с помощью моделей детекции
+            pos (PoseTable): данные, полученные с помощью моделей определения позы
+            max_wrist_dist (float): максимальное расстояние от центра телефона до запястья
+
+        Returns:
+            (np.array, np.array, np.array): id кадров, временные метки кадров и номера людей
+            в порядке телефонов
+        """
+        frames, stamps, persons, dist = self._phone_wrist_distances(det, pos)
+        hits = dist < max_wrist_dist
+        return frames[hits], stamps[hits], persons[hits]
+
+    def _phone_wrist_distances(self, det, pos):
+        """ метод для вычисления расстояния от каждого телефона до ближайшего запястья
+            каждого человека того же кадра.
+
+            Все телефоны и все запястья собираются в плоские массивы, кадры
+            сопоставляются по frame_id, а расстояния до запястий для всех пар
+            (телефон, человек в том же кадре) вычисляются одной векторной операцией
+
+        Args:
+            det (DetectionTable): данные, полученные с помощью моделей детекции
+            pos (PoseTable): данные, полученные с помощью моделей определения позы
+
+        Returns:
+            (np.array, np.array, np.array, np.array): id кадров, временные метки кадров,
+            номера людей и расстояния (nan, если запястья не найдены) в порядке телефонов
+        """
+        phone_frames, phone_stamps, phone_boxes = self._collect_phones(det)
+        wrist_frames, persons, wrists = self._collect_wrists(pos, phone_frames)
+        if len(phone_frames) == 0 or len(wrist_frames) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int64), np.empty(0)
+
+        # Люди упорядочиваются по кадрам, для каждого телефона находится
+        # диапазон людей того же кадра
+        order = np.argsort(wrist_frames, kind='stable')
+        wrist_frames = wrist_frames[order]
+        starts = np.searchsorted(wrist_frames, phone_frames, side='left')
+        counts = np.searchsorted(wrist_frames, phone_frames, side='right') - starts
+
+        # Все пары (телефон, человек) с общим кадром
+        pair_phone = np.repeat(np.arange(len(phone_frames)), counts)
+        offsets = np.cumsum(counts) - counts
+        pair_person = order[starts[pair_phone] + np.arange(len(pair_phone)) - offsets[pair_phone]]
+
+        centers = self._get_center(phone_boxes.T).T
+        diff = centers[pair_phone, None, :] - wrists[pair_person]
+        dist = np.fmin.reduce(np.sqrt(np.sum(diff * diff, axis=-1)), axis=1)
+
+        return phone_frames[pair_phone], phone_stamps[pair_phone], persons[pair_person], dist
+
+    def rule_intervals(self, rule, unprocessed_data):
+        """метод для поиска интервалов нарушений по декларативному правилу: признак нарушения
+           вычисляется для каждого кадра и человека, затем метки с признаком объединяются
+           в интервалы с учетом допустимых разрывов и минимальной длительности
+
+        Args:
+            rule (dict): описание правила из конфигурации анализатора (признак 'evidence',
+            название нарушения 'violation', min_duration, max_short_diff, max_long_diff
+            и параметры признака)
+            unprocessed_data (list): данные полученные из обработчика
+
+        Returns:
+            list: интервалы нарушений [начало (мс), конец (мс), человек, нарушение]
+        """
+        timestamps, persons = get_evidence(rule['evidence'])(self, rule, *unprocessed_data)
+        intervals = person_intervals(timestamps, persons, rule['min_duration'],
+                                     rule['max_short_diff'], rule['max_long_diff'])
+        return [[start, end, person, rule['violation']] for person, start, end in intervals]
+
+    def format_violations(self, intervals):
+        """метод для перевода интервалов нарушений к формату минуты:секунды
+
+        Args:
+            intervals (list): интервалы нарушений [начало (мс), конец (мс), человек, нарушение]
+
+        Returns:
+            list: список нарушений
+        """
+        return [[self.convert_time(start), self.convert_time(end), person, violation]
+                for start, end, person, violation in intervals]
+
+    def apply_rule(self, rule, unprocessed_data):
+        """метод для поиска нарушений по декларативному правилу (см. rule_intervals)
+
+        Args:
+            rule (dict): описание правила из конфигурации анализатора
+            unprocessed_data (list): данные полученные из обработчика
 
-        for frame_id, timestamp ,detections in det:
-            for obj_name, bbox in detections:
-                if obj_name == 'cell phones':
-                    for person, keys, _ in pos[frame_id-1][2]:
-                        for wrist in keys[9:11]:
-                            if np.linalg.norm(self._get_center(bbox) - wrist) < max_wrist_dist:
-                                phone_usage_frames.append((frame_id, timestamp, person)) # + person
-                                break
-        return phone_usage_frames
+        Returns:
+            list: список нарушений
+        """
+        return self.format_violations(self.rule_intervals(rule, unprocessed_data))
 
     def wrist_phone_usage(self, unprocessed_data):
         """С помощью данных, полученных из испольщуемых моделей обработки
@@ -94,41 +213,15 @@ class Analyzer:
         Returns:
             list: список нарушений
         """
-        detection_data, pos_est_data = unprocessed_data
-        min_duratuin = self.config['wrist_phone_usage']['min_duration']
-        max_short_diff = self.config['wrist_phone_usage']['max_short_diff']
-        max_long_diff = self.config['wrist_phone_usage']['max_long_diff']
-        violations = []
-
-        phone_usage_frames = self._get_phone_usage_frames(detection_data, pos_est_data)
-        persons_violations = self._split_violations(phone_usage_frames)
-
-        for person in persons_violations.keys():
-            passed_time = 0
-            last_stamp = 0
-            start = 0
-
-            for index, data in enumerate(persons_violations[person]):
-                timestamp = data[1]
-                diff = timestamp - last_stamp
-                if start == 0:
-                    start = timestamp
-                elif (passed_time <= min_duratuin and diff <= max_short_diff) or (passed_time >= min_duratuin and diff <= max_long_diff):
-                    passed_time = timestamp - start
-                    last_stamp = timestamp
-                    if index == len(persons_violations[person]) - 1:
-                        violations.append([self.convert_time(start), self.convert_time(timestamp), person, 'использование телефона'])
-                else:
-                    if (passed_time > min_duratuin):
-                        violations.append([self.convert_time(start), self.convert_time(timestamp), person, 'использование телефона'])
-                    passed_time = 0
-                    last_stamp = 0
-                    start = 0
-                    
-        return violations
-    
+        rule = {'evidence': 'phone_near_wrist', 'violation': 'использование телефона',
+                **self.config['wrist_phone_usage']}
+        return self.apply_rule(rule, unprocessed_data)
+
     def violation_analysis(self, data, methods):
-        """метод для запуска анализаторов
+        """метод для запуска анализаторов. Методы с признаком нарушения ('evidence')
+           в конфигурации выполняются как декларативные правила, остальные - одноименными
+           методами класса. Интервалы нарушений правил в миллисекундах сохраняются
+           в intervals
 
         Args:
             data (dict): данные полученные из обработчика
@@ -138,13 +231,31 @@ class Analyzer:
             list: список нарушений
         """
         for method in methods:
-            func = getattr(self, method)
+            method_conf = self.config[method]
             unprocessed_data = []
-            for dtype in self.config[method]['required_data']:
+            for dtype in method_conf['required_data']:
                 unprocessed_data.append(data[dtype])
-            self.violations.extend(func(unprocessed_data))
+            with metrics.timer('analysis_seconds', method=method):
+                if 'evidence' in method_conf:
+                    intervals = self.rule_intervals(method_conf, unprocessed_data)
+                    self.intervals.extend(intervals)
+                    self.violations.extend(self.format_violations(intervals))
+                else:
+                    self.violations.extend(getattr(self, method)(unprocessed_data))
         return self.violations
 
+    def stream(self, methods):
+        """создание инкрементального анализатора для потоковой обработки
+
+        Args:
+            methods (list): список выбранных методов анализа
+
+        Returns:
+            StreamAnalyzer: инкрементальный анализатор
+        """
+        return StreamAnalyzer(self, methods)
+
     def clear_data(self):
         """удаление информации о найденных нарушениях"""
         self.violations = []
+        self.intervals = []
@@ -0,0 +1,211 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dms.analysis.analysis import Analyzer
+from dms.analysis.intervals import find_intervals, split_persons
+from dms.analysis.rules import get_evidence
+
+# Параметры поиска интервалов нарушения. Остальные параметры сетки - параметры
+# признака нарушения правила (например, max_wrist_dist)
+INTERVAL_PARAMS = ('min_duration', 'max_short_diff', 'max_long_diff')
+
+_evidence = None  # метки людей с признаком нарушения для всех видео в процессе-обработчике
+
+
+def evidence_params(grid):
+    """параметры признака нарушения в сетке
+
+    Args:
+        grid (dict): параметр -> список значений
+
+    Returns:
+        list: названия параметров
+    """
+    return [name for name in grid if name not in INTERVAL_PARAMS]
+
+
+def expand_grid(grid):
+    """все сочетания значений параметров. Сочетания упорядочены по параметрам признака
+       нарушения, чтобы признак вычислялся один раз для каждого набора их значений
+
+    Args:
+        grid (dict): параметр -> список значений (INTERVAL_PARAMS и параметры признака)
+
+    Returns:
+        list: словари значений параметров
+    """
+    missing = [name for name in INTERVAL_PARAMS if name not in grid]
+    if missing:
+        raise ValueError(f'Не заданы значения параметров: {", ".join(missing)}')
+    names = evidence_params(grid) + list(INTERVAL_PARAMS)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def rule_evidence(analyzer, rule, data, params=None):
+    """метки людей с признаком нарушения правила для результатов обработки видео
+
+    Args:
+        analyzer (Analyzer): анализатор
+        rule (dict): описание правила из конфигурации анализатора
+        data (dict): результаты обработки видео (VideoHandler.data)
+        params (dict, optional): значения параметров признака, заменяющие значения
+        правила. Defaults to None.
+
+    Returns:
+        list: пары (человек, временные метки человека)
+    """
+    unprocessed_data = [data[dtype] for dtype in rule['required_data']]
+    timestamps, persons = get_evidence(rule['evidence'])(analyzer, {**rule, **(params or {})}, *unprocessed_data)
+    return split_persons(timestamps, persons)
+
+
+def _merge(intervals):
+    """объединение пересекающихся интервалов"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _overlap(first, second):
+    """матрица длительностей пересечения интервалов"""
+    first = np.asarray(first, dtype=np.float64).reshape(-1, 2)
+    second = np.asarray(second, dtype=np.float64).reshape(-1, 2)
+    return np.clip(np.minimum(first[:, None, 1], second[None, :, 1]) -
+                   np.maximum(first[:, None, 0], second[None, :, 0]), 0, None)
+
+
+def match_intervals(predicted, truth, min_iou=0.0):
+    """сравнение найденных интервалов нарушений с размеченными
+
+    Args:
+        predicted (list): найденные интервалы (начало, конец) в мс
+        truth (list): размеченные интервалы (начало, конец) в мс
+        min_iou (float, optional): минимальный IoU интервалов для совпадения, 0 - любое
+        пересечение. Defaults to 0.0.
+
+    Returns:
+        dict: число совпавших найденных и размеченных интервалов и длительности
+        (найденных, размеченных и их пересечения) для оценки по времени
+    """
+    counts = {'predicted': len(predicted), 'truth': len(truth), 'matched_predicted': 0, 'matched_truth': 0}
+    if predicted and truth:
+        p = np.asarray(predicted, dtype=np.float64).reshape(-1, 2)
+        t = np.asarray(truth, dtype=np.float64).reshape(-1, 2)
+        # Интервалы считаются замкнутыми, поэтому интервал нулевой длины внутри размеченного совпадает
+        touches = (p[:, None, 0] <= t[None, :, 1]) & (t[None, :, 0] <= p[:, None, 1])
+        union = np.maximum(p[:, None, 1], t[None, :, 1]) - np.minimum(p[:, None, 0], t[None, :, 0])
+        iou = np.divide(_overlap(p, t), union, out=np.ones_like(union), where=union > 0)
+        matched = touches & (iou >= min_iou)
+        counts['matched_predicted'] = int(matched.any(axis=1).sum())
+        counts['matched_truth'] = int(matched.any(axis=0).sum())
+
+    predicted_union, truth_union = _merge(predicted), _merge(truth)
+    counts['predicted_ms'] = float(sum(end - start for start, end in predicted_union))
+    counts['truth_ms'] = float(sum(end - start for start, end in truth_union))
+    counts['overlap_ms'] = float(_overlap(predicted_union, truth_union).sum()) if predicted_union and truth_union else 0.0
+    return counts
+
+
+def _scores(counts):
+    """точность, полнота и F1 по интервалам и по времени"""
+    def ratio(a, b):
+        return a / b if b else 0.0
+
+    precision = ratio(counts['matched_predicted'], counts['predicted'])
+    recall = ratio(counts['matched_truth'], counts['truth'])
+    return {
+        'precision': precision,
+        'recall': recall,
+        'f1': ratio(2 * precision * recall, precision + recall),
+        'time_precision': ratio(counts['overlap_ms'], counts['predicted_ms']),
+        'time_recall': ratio(counts['overlap_ms'], counts['truth_ms'])
+    }
+
+
+def _evidence_key(setting):
+    """значения параметров признака нарушения сочетания"""
+    return tuple((name, value) for name, value in setting.items() if name not in INTERVAL_PARAMS)
+
+
+def evaluate(evidence, truths, settings, min_iou=0.0):
+    """оценка сочетаний параметров по всем видео
+
+    Args:
+        evidence (dict): значения параметров признака -> результаты rule_evidence
+        для каждого видео
+        truths (list): размеченные интервалы (начало, конец) в мс для каждого видео
+        settings (list): сочетания параметров
+        min_iou (float, optional): минимальный IoU интервалов для совпадения. Defaults to 0.0.
+
+    Returns:
+        list: для каждого сочетания параметры, суммарные счетчики и оценки
+    """
+    results = []
+    for setting in settings:
+        total = {}
+        for video_persons, truth in zip(evidence[_evidence_key(setting)], truths):
+            predicted = [interval for _, person_stamps in video_persons
+                         for interval in find_intervals(person_stamps, setting['min_duration'],
+                                                        setting['max_short_diff'], setting['max_long_diff'])]
+            for name, value in match_intervals(predicted, truth, min_iou).items():
+                total[name] = total.get(name, 0) + value
+        results.append({**setting, **total, **_scores(total)})
+    return results
+
+
+def _init_worker(evidence):
+    """инициализация процесса-обработчика: метки признака нарушения передаются один раз"""
+    global _evidence
+    _evidence = evidence
+
+
+def _evaluate_chunk(truths, settings, min_iou):
+    return evaluate(_evidence, truths, settings, min_iou)
+
+
+def calibrate(samples, rule, grid, workers=1, min_iou=0.0):
+    """подбор параметров правила по размеченным видео. Признак нарушения
+       (get_evidence(rule['evidence'])) вычисляется один раз для каждого набора
+       значений его параметров, сочетания параметров с общими значениями используют
+       общие метки людей, части сетки оцениваются в пуле процессов
+
+    Args:
+        samples (list): пары (результаты обработки видео, размеченные интервалы
+        нарушений (начало, конец) в мс)
+        rule (dict): описание правила из конфигурации анализатора, параметры вне сетки
+        берутся из него
+        grid (dict): параметр -> список значений (INTERVAL_PARAMS и параметры признака
+        нарушения правила, например max_wrist_dist)
+        workers (int, optional): число процессов. Defaults to 1.
+        min_iou (float, optional): минимальный IoU интервалов для совпадения. Defaults to 0.0.
+
+    Returns:
+        list: для каждого сочетания параметров значения параметров, счетчики интервалов
+        и оценки precision, recall, f1, time_precision, time_recall в порядке сетки
+    """
+    if 'evidence' not in rule:
+        raise ValueError('Калибровка доступна только для правил с признаком нарушения (evidence)')
+    settings = expand_grid(grid)
+    analyzer = Analyzer({})
+    evidence = {}
+    for setting in settings:
+        key = _evidence_key(setting)
+        if key not in evidence:
+            evidence[key] = [rule_evidence(analyzer, rule, data, dict(key)) for data, _ in samples]
+    truths = [[tuple(interval) for interval in truth] for _, truth in samples]
+
+    if workers <= 1:
+        return evaluate(evidence, truths, settings, min_iou)
+
+    # Метки признака передаются процессам один раз при их создании
+    chunk_size = max(len(settings) // (workers * 4), 1)
+    chunks = [settings[i:i + chunk_size] for i in range(0, len(settings), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(evidence,)) as executor:
+        parts = executor.map(_evaluate_chunk, [truths] * len(chunks), chunks, [min_iou] * len(chunks))
+        return [result for part in parts for result in part]
@@ -0,0 +1,229 @@
+import numpy as np
+
+
+def scan_intervals(timestamps, min_duration, max_short_diff, max_long_diff):
+    """поиск интервалов нарушения последовательным проходом по временным меткам
+       (эталонная реализация, используется для неупорядоченных меток)
+
+    Args:
+        timestamps (np.array): временные метки кадров с признаком нарушения одного человека
+        min_duration (float): минимальная длительность нарушения
+        max_short_diff (float): максимальный разрыв до достижения минимальной длительности
+        max_long_diff (float): максимальный разрыв после достижения минимальной длительности
+
+    Returns:
+        list: интервалы (начало, конец)
+    """
+    intervals = []
+    passed_time = 0
+    last_stamp = 0
+    start = 0
+    timestamps = np.asarray(timestamps).tolist()
+    for index, timestamp in enumerate(timestamps):
+        diff = timestamp - last_stamp
+        if start == 0:
+            start = timestamp
+        elif (passed_time <= min_duration and diff <= max_short_diff) or \
+                (passed_time >= min_duration and diff <= max_long_diff):
+            passed_time = timestamp - start
+            last_stamp = timestamp
+            if index == len(timestamps) - 1:
+                intervals.append((start, timestamp))
+        else:
+            if passed_time > min_duration:
+                intervals.append((start, timestamp))
+            passed_time = 0
+            last_stamp = 0
+            start = 0
+    return intervals
+
+
+def _first(positions, low, high):
+    """первая позиция из упорядоченного массива в диапазоне [low, high] или None"""
+    i = np.searchsorted(positions, low, side='left')
+    if i < len(positions) and positions[i] <= high:
+        return int(positions[i])
+    return None
+
+
+def find_intervals(timestamps, min_duration, max_short_diff, max_long_diff):
+    """поиск интервалов нарушения по упорядоченным временным меткам. Результат совпадает
+       с scan_intervals, но цепочки меток обрабатываются целиком: конец цепочки находится
+       двоичным поиском по заранее вычисленным позициям разрывов
+
+    Args:
+        timestamps (np.array): временные метки кадров с признаком нарушения одного человека
+        min_duration (float): минимальная длительность нарушения
+        max_short_diff (float): максимальный разрыв до достижения минимальной длительности
+        max_long_diff (float): максимальный разрыв после достижения минимальной длительности
+
+    Returns:
+        list: интервалы (начало, конец)
+    """
+    t = np.asarray(timestamps, dtype=np.float64)
+    n = len(t)
+    if n < 2:
+        return []
+    diff = np.diff(t)
+    if (diff < 0).any():
+        return scan_intervals(timestamps, min_duration, max_short_diff, max_long_diff)
+
+    # Второй элемент цепочки сравнивается с нулевой меткой (разрыв равен самой метке)
+    second_ok = ((0 <= min_duration) & (t <= max_short_diff)) | ((0 >= min_duration) & (t <= max_long_diff))
+    second_positions = np.flatnonzero(second_ok)
+    second_by_parity = (second_positions[second_positions % 2 == 0], second_positions[second_positions % 2 == 1])
+    emit_on_second = 0 > min_duration
+    # Позиции меток, разрыв перед которыми превышает порог
+    short_gaps = np.flatnonzero(diff > max_short_diff) + 1
+    long_gaps = np.flatnonzero(diff > max_long_diff) + 1
+    max_gaps = np.flatnonzero(diff > max(max_short_diff, max_long_diff)) + 1
+
+    intervals = []
+    s = 0
+    while s < n - 1:
+        if t[s] == 0:
+            # Нулевая метка не считается началом цепочки
+            s += 1
+            continue
+        if not second_ok[s + 1]:
+            if emit_on_second:
+                intervals.append((t[s], t[s + 1]))
+                s += 2
+                continue
+            # Цепочки из двух меток прерываются без нарушений до первой метки, которая
+            # может быть вторым элементом цепочки (позиции той же четности, что s + 1)
+            positions = second_by_parity[(s + 1) % 2]
+            i = np.searchsorted(positions, s + 1)
+            if i == len(positions):
+                break
+            s = int(positions[i]) - 1
+            continue
+        if s + 1 == n - 1:
+            intervals.append((t[s], t[s + 1]))
+            break
+
+        # Длительность цепочки перед меткой i меньше минимальной при i <= below,
+        # равна минимальной при below < i <= upto и больше при i > upto
+        below = int(np.searchsorted(t, t[s] + min_duration, side='left'))
+        upto = int(np.searchsorted(t, t[s] + min_duration, side='right'))
+        candidates = [
+            _first(short_gaps, s + 2, below),
+            _first(max_gaps, max(s + 2, below + 1), upto),
+            _first(long_gaps, max(s + 2, upto + 1), n - 1)
+        ]
+        candidates = [j for j in candidates if j is not None]
+        if not candidates:
+            intervals.append((t[s], t[n - 1]))
+            break
+        j = min(candidates)
+        if t[j - 1] - t[s] > min_duration:
+            intervals.append((t[s], t[j]))
+        s = j + 1
+    return [(float(start), float(end)) for start, end in intervals]
+
+
+class IntervalScanner:
+    """ Инкрементальный поиск интервалов нарушения одного человека.
+
+        Временные метки передаются по мере появления, хранится только состояние
+        последовательного прохода scan_intervals (начало интервала, длительность,
+        последняя метка). Для одних и тех же меток дает те же интервалы, что
+        scan_intervals и find_intervals
+    """
+
+    def __init__(self, min_duration, max_short_diff, max_long_diff):
+        """Инициализация объекта класса
+
+        Args:
+            min_duration (float): минимальная длительность нарушения
+            max_short_diff (float): максимальный разрыв до достижения минимальной длительности
+            max_long_diff (float): максимальный разрыв после достижения минимальной длительности
+        """
+        self.min_duration = min_duration
+        self.max_short_diff = max_short_diff
+        self.max_long_diff = max_long_diff
+        self.last_seen = None  # последняя переданная метка
+        self._reset()
+
+    def _reset(self):
+        self.start = 0
+        self.passed_time = 0
+        self.last_stamp = 0
+        self.extended = None  # метка, которой интервал продлен последней
+
+    def push(self, timestamps):
+        """добавление очередных временных меток
+
+        Args:
+            timestamps (np.array): временные метки кадров с признаком нарушения
+
+        Returns:
+            list: интервалы (начало, конец), закрывшиеся на этих метках
+        """
+        intervals = []
+        for timestamp in np.asarray(timestamps).tolist():
+            self.last_seen = timestamp
+            diff = timestamp - self.last_stamp
+            if self.start == 0:
+                self.start = timestamp
+                self.extended = None
+            elif (self.passed_time <= self.min_duration and diff <= self.max_short_diff) or \
+                    (self.passed_time >= self.min_duration and diff <= self.max_long_diff):
+                self.passed_time = timestamp - self.start
+                self.last_stamp = timestamp
+                self.extended = timestamp
+            else:
+                if self.passed_time > self.min_duration:
+                    intervals.append((self.start, timestamp))
+                self._reset()
+        return intervals
+
+    def close(self):
+        """завершение меток: интервал, продолжавшийся до последней метки
+
+        Returns:
+            tuple | None: интервал (начало, конец) или None
+        """
+        interval = (self.start, self.extended) if self.extended is not None else None
+        self._reset()
+        return interval
+
+
+def split_persons(timestamps, persons):
+    """разделение временных меток по людям
+
+    Args:
+        timestamps (np.array): временные метки кадров с признаком нарушения
+        persons (np.array): номера людей
+
+    Returns:
+        list: пары (человек, временные метки человека) в порядке первого появления людей
+    """
+    timestamps = np.asarray(timestamps)
+    persons = np.asarray(persons, dtype=np.int64)
+    if len(persons) == 0:
+        return []
+    order = np.argsort(persons, kind='stable')
+    unique, first, counts = np.unique(persons[order], return_index=True, return_counts=True)
+    # Порядок людей по первой метке, как при обходе меток
+    appearance = np.argsort(order[first], kind='stable')
+    return [(int(unique[k]), timestamps[order[first[k]:first[k] + counts[k]]]) for k in appearance.tolist()]
+
+
+def person_intervals(timestamps, persons, min_duration, max_short_diff, max_long_diff):
+    """поиск интервалов нарушения для каждого человека
+
+    Args:
+        timestamps (np.array): временные метки кадров с признаком нарушения
+        persons (np.array): номера людей
+        min_duration (float): минимальная длительность нарушения
+        max_short_diff (float): максимальный разрыв до достижения минимальной длительности
+        max_long_diff (float): максимальный разрыв после достижения минимальной длительности
+
+    Returns:
+        list: интервалы (человек, начало, конец). Люди упорядочены по первому появлению,
+        интервалы одного человека - по времени
+    """
+    return [(person, start, end)
+            for person, person_stamps in split_persons(timestamps, persons)
+            for start, end in find_intervals(person_stamps, min_duration, max_short_diff, max_long_diff)]
@@ -0,0 +1,45 @@
+def phone_near_wrist(analyzer, rule, det, pos):
+    """признак нарушения: центр телефона ближе max_wrist_dist к одному из запястий человека
+
+    Args:
+        analyzer (Analyzer): анализатор
+        rule (dict): описание правила
+        det (DetectionTable): данные, полученные с помощью моделей детекции
+        pos (PoseTable): данные, полученные с помощью моделей определения позы
+
+    Returns:
+        (np.array, np.array): временные метки кадров и номера людей с признаком нарушения
+    """
+    _, timestamps, persons = analyzer._phone_usage_hits(det, pos, rule['max_wrist_dist'])
+    return timestamps, persons
+
+
+# Реестр признаков нарушений: значение поля 'evidence' правила -> функция
+# (анализатор, правило, данные из required_data) -> (временные метки, номера людей)
+EVIDENCE = {
+    'phone_near_wrist': phone_near_wrist
+}
+
+
+def register_evidence(name, func):
+    """регистрация признака нарушения для правил анализатора
+
+    Args:
+        name (str): значение поля 'evidence' в описании правила
+        func (callable): функция вычисления признака
+    """
+    EVIDENCE[name] = func
+
+
+def get_evidence(name):
+    """функция признака нарушения по названию
+
+    Args:
+        name (str): название признака
+
+    Returns:
+        callable: функция вычисления признака
+    """
+    if name not in EVIDENCE:
+        raise ValueError(f'Неизвестный признак нарушения: {name}')
+    return EVIDENCE[name]
@@ -0,0 +1,136 @@
+from dms.analysis.intervals import IntervalScanner, split_persons
+from dms.analysis.rules import get_evidence
+from dms.utils.metrics import metrics
+
+
+class RuleStream:
+    """ Инкрементальный анализ нарушений по декларативному правилу.
+
+        Признак нарушения вычисляется функцией правила (см. dms.analysis.rules)
+        по данным батча, для каждого человека хранится только состояние поиска
+        интервалов (IntervalScanner), нарушение фиксируется, как только его
+        интервал закрывается. Состояние людей без признака нарушения дольше
+        допустимого разрыва удаляется, поэтому объем памяти не зависит от
+        длительности потока. Для одних и тех же данных дает те же нарушения, что
+        и Analyzer.apply_rule, кроме людей, признак которых появляется снова после
+        такого разрыва: их интервал завершается последней меткой перед разрывом,
+        а новые метки начинают новый поиск интервалов
+    """
+
+    def __init__(self, analyzer, rule):
+        """Инициализация объекта класса
+
+        Args:
+            analyzer (Analyzer): анализатор
+            rule (dict): описание правила из конфигурации анализатора
+        """
+        self.analyzer = analyzer
+        self.rule = rule
+        self.evidence = get_evidence(rule['evidence'])
+        self.persons = {}  # человек -> поиск интервалов человека
+
+    def _scanner(self, person):
+        scanner = self.persons.get(person)
+        if scanner is None:
+            scanner = IntervalScanner(self.rule['min_duration'], self.rule['max_short_diff'],
+                                      self.rule['max_long_diff'])
+            self.persons[person] = scanner
+        return scanner
+
+    def update(self, unprocessed_data):
+        """обработка очередного батча данных
+
+        Args:
+            unprocessed_data (list): данные батча, полученные из обработчика
+
+        Returns:
+            list: нарушения, интервалы которых закрылись на этом батче
+        """
+        timestamps, persons = self.evidence(self.analyzer, self.rule, *unprocessed_data)
+        intervals = [[start, end, person, self.rule['violation']]
+                     for person, person_stamps in split_persons(timestamps, persons)
+                     for start, end in self._scanner(person).push(person_stamps)]
+        last_timestamp = max((table.timestamps[-1] for table in unprocessed_data if len(table)), default=None)
+        if last_timestamp is not None:
+            intervals.extend(self._evict(last_timestamp))
+        return self.analyzer.format_violations(intervals)
+
+    def _evict(self, timestamp):
+        """удаление состояния людей, у которых признака нарушения нет дольше допустимого
+           разрыва: следующая метка такого человека все равно прервала бы интервал
+
+        Args:
+            timestamp (float): временная метка последнего кадра батча
+
+        Returns:
+            list: интервалы нарушений удаленных людей
+        """
+        max_gap = max(self.rule['max_short_diff'], self.rule['max_long_diff'])
+        intervals = []
+        for person in [person for person, scanner in self.persons.items()
+                       if timestamp - scanner.last_seen > max_gap]:
+            interval = self.persons.pop(person).close()
+            if interval is not None:
+                intervals.append([*interval, person, self.rule['violation']])
+        return intervals
+
+    def close(self):
+        """завершение потока: фиксация нарушений, интервалы которых продолжались до конца данных
+
+        Returns:
+            list: оставшиеся нарушения
+        """
+        intervals = []
+        for person, scanner in self.persons.items():
+            interval = scanner.close()
+            if interval is not None:
+                intervals.append([*interval, person, self.rule['violation']])
+        self.persons = {}
+        return self.analyzer.format_violations(intervals)
+
+
+class StreamAnalyzer:
+    """Инкрементальный анализ нарушений для потоковой обработки видео"""
+
+    def __init__(self, analyzer, methods):
+        """Инициализация объекта класса
+
+        Args:
+            analyzer (Analyzer): анализатор, содержащий параметры методов
+            methods (list): список выбранных методов анализа. Потоковый анализ доступен
+            для методов с признаком нарушения ('evidence') в конфигурации
+        """
+        self.analyzer = analyzer
+        self.streams = {}
+        for method in methods:
+            method_conf = analyzer.config[method]
+            if 'evidence' not in method_conf:
+                raise ValueError(f'Метод {method} не поддерживает потоковый анализ: не задан признак нарушения')
+            self.streams[method] = RuleStream(analyzer, method_conf)
+
+    def update(self, data):
+        """обработка очередного батча данных всеми выбранными методами
+
+        Args:
+            data (dict): данные батча, полученные из обработчика
+
+        Returns:
+            list: нарушения, интервалы которых закрылись на этом батче
+        """
+        violations = []
+        for method, stream in self.streams.items():
+            unprocessed_data = [data[dtype] for dtype in self.analyzer.config[method]['required_data']]
+            with metrics.timer('analysis_seconds', method=method):
+                violations.extend(stream.update(unprocessed_data))
+        return violations
+
+    def close(self):
+        """завершение потока
+
+        Returns:
+            list: нарушения, интервалы которых продолжались до конца данных
+        """
+        violations = []
+        for stream in self.streams.values():
+            violations.extend(stream.close())
+        return violations
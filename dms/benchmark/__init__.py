@@ -0,0 +1 @@
+from .suite import run_suite
\ No newline at end of file
@@ -0,0 +1,56 @@
+'''
+    Набор замеров производительности на синтетическом видео с моделями-заглушками.
+    Не требует весов моделей. Результаты записываются в json, при заданных порогах
+    (файл порогов или результаты предыдущего запуска) код возврата 1 означает регрессию.
+
+    python -m dms.benchmark --frames 900 --output results/benchmark.json
+    python -m dms.benchmark --baseline results/benchmark.json --tolerance 0.2
+'''
+import argparse
+import json
+import sys
+
+from dms.benchmark.suite import STAGES, check_thresholds, run_suite, thresholds_from_baseline
+
+parser = argparse.ArgumentParser(prog='python -m dms.benchmark')
+parser.add_argument('-n', '--frames', type=int, default=900, help="Число кадров синтетического видео")
+parser.add_argument('--width', type=int, default=640, help="Ширина кадра")
+parser.add_argument('--height', type=int, default=360, help="Высота кадра")
+parser.add_argument('--fps', type=int, default=30, help="Частота кадров")
+parser.add_argument('--codec', type=str, default='mp4v', help="Кодек синтетического видео (fourcc)")
+parser.add_argument('--period', type=int, default=300, help="Период шаблона использования телефона (кадры)")
+parser.add_argument('--usage', type=int, default=150, help="Число кадров с телефоном в руке в каждом периоде")
+parser.add_argument('--persons', type=int, default=1, help="Число людей на кадре")
+parser.add_argument('--latency-ms', type=float, default=0.0, help="Имитируемое время инференса на кадр (мс)")
+parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=STAGES, help="Замеряемые стадии")
+parser.add_argument('-o', '--output', type=str, default=None, help="Путь для сохранения результатов в json")
+parser.add_argument('--thresholds', type=str, default=None, help="json с порогами стадий")
+parser.add_argument('--baseline', type=str, default=None, help="json с результатами предыдущего запуска")
+parser.add_argument('--tolerance', type=float, default=0.2,
+                    help="Допустимое снижение пропускной способности относительно baseline")
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    pattern = {'period': args.period, 'usage': args.usage, 'persons': args.persons, 'latency_ms': args.latency_ms}
+    report = run_suite(frames=args.frames, width=args.width, height=args.height, fps=args.fps, codec=args.codec,
+                       pattern=pattern, stages=args.stages)
+
+    thresholds = {}
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            thresholds.update(thresholds_from_baseline(json.load(f), args.tolerance))
+    if args.thresholds:
+        with open(args.thresholds, 'r') as f:
+            thresholds.update(json.load(f))
+    report['failures'] = check_thresholds(report, thresholds)
+
+    for stage, result in report['stages'].items():
+        print(f'{stage:14} {result["throughput"]:10.1f} /s  ({result["items"]} за {result["seconds"]:.3f} с)')
+    for failure in report['failures']:
+        print(f'РЕГРЕССИЯ: {failure}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    sys.exit(1 if report['failures'] else 0)
@@ -0,0 +1,186 @@
+import copy
+import time
+
+import numpy as np
+
+from dms.benchmark.synthetic import read_marker
+from dms.handler.backends import YOLOBackend, register_backend
+from dms.settings import config as default_config
+
+# Параметры шаблона по умолчанию: телефон в руке первого человека на первых
+# usage кадрах каждого периода, на остальных кадрах телефон лежит далеко от рук
+DEFAULT_PATTERN = {
+    'period': 300,
+    'usage': 150,
+    'persons': 1,
+    'far_phone': True,
+    'latency_ms': 0.0
+}
+
+
+class StubBoxes:
+    """Рамки объектов кадра с интерфейсом результатов ultralytics"""
+
+    def __init__(self, data):
+        self.data = data  # x1, y1, x2, y2, уверенность, класс
+
+    @property
+    def xyxy(self):
+        return self.data[:, :4]
+
+    @property
+    def conf(self):
+        return self.data[:, 4]
+
+    @property
+    def cls(self):
+        return self.data[:, 5]
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self
+
+    def __len__(self):
+        return len(self.data)
+
+
+class StubKeypoints:
+    """Ключевые точки людей кадра с интерфейсом результатов ultralytics"""
+
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def xy(self):
+        return self.data[..., :2]
+
+    def __len__(self):
+        return len(self.data)
+
+
+class StubResult:
+    """Результат модели-заглушки для одного кадра"""
+
+    def __init__(self, boxes, keypoints=None):
+        self.boxes = StubBoxes(boxes)
+        self.keypoints = StubKeypoints(keypoints) if keypoints is not None and len(keypoints) else None
+
+    def __getitem__(self, mask):
+        keypoints = self.keypoints.data[mask] if self.keypoints is not None else None
+        return StubResult(self.boxes.data[mask], keypoints)
+
+
+class _Array(np.ndarray):
+    """массив numpy с методами cpu() и numpy(), как у тензоров torch"""
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.asarray(self)
+
+
+def _array(values):
+    return np.asarray(values, dtype=np.float32).view(_Array)
+
+
+class StubModel:
+    """ Детерминированная модель-заглушка.
+
+        Номер кадра читается из маркера синтетического видео, результат зависит
+        только от номера кадра и параметров шаблона, поэтому совпадает при любом
+        порядке и разбиении кадров на батчи
+    """
+
+    def __init__(self, task, pattern):
+        """Инициализация объекта класса
+
+        Args:
+            task (str): тип задачи ('detect' или 'pose')
+            pattern (dict): параметры шаблона (см. DEFAULT_PATTERN)
+        """
+        self.task = task
+        self.pattern = {**DEFAULT_PATTERN, **pattern}
+        self.names = {0: 'person'} if task == 'pose' else {0: 'cell phones', 1: 'cup'}
+
+    def wrists(self, index, person, width, height):
+        """координаты запястий человека на кадре"""
+        shift = (index % 7) - 3  # небольшое смещение между кадрами
+        x = width * (person + 1) / (self.pattern['persons'] + 1) + shift
+        y = height * 0.7
+        return np.array([[x - 40, y], [x + 40, y]], dtype=np.float32)
+
+    def person(self, index, person, width, height):
+        """рамка и ключевые точки человека на кадре"""
+        keypoints = np.zeros((17, 3), dtype=np.float32)
+        keypoints[:, 2] = 1.0
+        keypoints[9:11, :2] = self.wrists(index, person, width, height)
+        x = width * (person + 1) / (self.pattern['persons'] + 1)
+        box = [x - 100, height * 0.2, x + 100, height * 0.95, 0.9, 0]
+        return box, keypoints
+
+    def phones(self, index, width, height):
+        """рамки объектов детекции на кадре"""
+        boxes = []
+        if index % self.pattern['period'] < self.pattern['usage']:
+            wrist = self.wrists(index, 0, width, height)[1]
+            boxes.append([wrist[0] - 20, wrist[1] - 40, wrist[0] + 20, wrist[1] + 40, 0.9, 0])
+        elif self.pattern['far_phone']:
+            boxes.append([10, 10 + height * 0.1, 50, 90 + height * 0.1, 0.9, 0])
+        boxes.append([width - 60, height - 60, width - 20, height - 20, 0.9, 1])
+        return boxes
+
+    def __call__(self, frames, verbose=False, conf=0.25, **kwargs):
+        if self.pattern['latency_ms']:
+            time.sleep(self.pattern['latency_ms'] * len(frames) / 1000)
+
+        results = []
+        for frame in frames:
+            index = read_marker(frame)
+            height, width = frame.shape[:2]
+            if self.task == 'pose':
+                persons = [self.person(index, person, width, height) for person in range(self.pattern['persons'])]
+                boxes = _array([box for box, _ in persons]).reshape(-1, 6)
+                keypoints = _array([keypoints for _, keypoints in persons]).reshape(-1, 17, 3)
+            else:
+                boxes = _array(self.phones(index, width, height)).reshape(-1, 6)
+                keypoints = None
+            result = StubResult(boxes, keypoints)
+            results.append(result[result.boxes.conf >= conf])
+        return results
+
+
+class StubBackend(YOLOBackend):
+    """Бэкенд моделей-заглушек (формат 'Stub'), параметры шаблона задаются в specific_params"""
+
+    def load(self):
+        task = 'pose' if self.model_conf['task'] == 'pos_est' else 'detect'
+        pattern = {name: value for name, value in self.params.items() if name in DEFAULT_PATTERN}
+        return StubModel(task, pattern)
+
+    def predict(self, frames, conf, imgsz=None):
+        return self.model(frames, conf=conf)
+
+
+register_backend('Stub', StubBackend)
+
+
+def stub_config(pattern=None, config=default_config):
+    """конфигурация системы, в которой модели заменены заглушками, а кэш результатов отключен
+
+    Args:
+        pattern (dict, optional): параметры шаблона (см. DEFAULT_PATTERN). Defaults to None.
+        config (dict, optional): исходная конфигурация системы. Defaults to config.
+
+    Returns:
+        dict: конфигурация системы
+    """
+    config = copy.deepcopy(config)
+    for model_conf in config['handler']['models'].values():
+        model_conf['format'] = 'Stub'
+        model_conf['path'] = f'stub/{model_conf["task"]}'
+        model_conf['specific_params'] = {'conf': model_conf['specific_params']['conf'], **(pattern or {})}
+    config['handler']['processing']['cache'] = None
+    return config
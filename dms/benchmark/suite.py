@@ -0,0 +1,187 @@
+import os
+import platform
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from dms.benchmark.stubs import DEFAULT_PATTERN, stub_config
+from dms.benchmark.synthetic import make_video
+from dms.engine import Engine
+from dms.handler import VideoHandler
+from dms.utils import VideoRenderer
+
+STAGES = ('decode', 'process_batch', 'analysis', 'get_frame', 'end_to_end')
+
+
+def _result(items, seconds, **extra):
+    """результат замера стадии: число обработанных элементов, время и пропускная способность"""
+    return {'items': items, 'seconds': seconds, 'throughput': items / seconds if seconds else 0.0, **extra}
+
+
+def bench_decode(video_path, batch_size):
+    """декодирование видео батчами (VideoHandler.read_batches)"""
+    cap = cv2.VideoCapture(video_path)
+    frames = 0
+    start = time.perf_counter()
+    for batch, _, _ in VideoHandler.read_batches(cap, batch_size):
+        frames += len(batch)
+    seconds = time.perf_counter() - start
+    cap.release()
+    return _result(frames, seconds)
+
+
+def bench_process_batch(handler, video_path, batch_size, max_frames):
+    """инференс, постобработка и запись результатов для кадров, заранее прочитанных в память"""
+    cap = cv2.VideoCapture(video_path)
+    batches = list(VideoHandler.read_batches(cap, batch_size, max_frames))
+    cap.release()
+
+    handler.clear_data()
+    frames = 0
+    start = time.perf_counter()
+    for batch, timestamps, frame_ids in batches:
+        handler.process_batch(batch, timestamps, frame_ids)
+        frames += len(batch)
+    return _result(frames, time.perf_counter() - start)
+
+
+def bench_analysis(analyzer, data, methods, repeats):
+    """поиск нарушений по результатам обработки всего видео"""
+    frames = len(data['detection'])
+    start = time.perf_counter()
+    for _ in range(repeats):
+        # Нарушения накапливаются в анализаторе, поэтому каждый запуск начинается с пустого списка
+        analyzer.clear_data()
+        violations = analyzer.violation_analysis(data, methods)
+    seconds = time.perf_counter() - start
+    return _result(frames * repeats, seconds, calls=repeats, violations=len(violations))
+
+
+def bench_get_frame(renderer, video_path, timestamps, lookups, seed=0):
+    """получение кадров по случайным временным меткам (VideoRenderer.get_frame)"""
+    rng = np.random.default_rng(seed)
+    targets = rng.choice(timestamps, size=lookups)
+    start = time.perf_counter()
+    for timestamp in targets:
+        renderer.get_frame(timestamp, video_path)
+    seconds = time.perf_counter() - start
+    renderer.reader.close()
+    return _result(lookups, seconds)
+
+
+def bench_end_to_end(engine, video_path, frames):
+    """поиск нарушений в видео (Engine.violations_search)"""
+    start = time.perf_counter()
+    violations = engine.violations_search(video_path)
+    return _result(frames, time.perf_counter() - start, violations=len(violations))
+
+
+def run_suite(frames=900, width=640, height=360, fps=30, codec='mp4v', pattern=None, video_path=None,
+              stages=STAGES, max_frames=300, lookups=200, repeats=20, config=None):
+    """замер всех стадий обработки на синтетическом видео с моделями-заглушками
+
+    Args:
+        frames (int, optional): число кадров синтетического видео. Defaults to 900.
+        width (int, optional): ширина кадра. Defaults to 640.
+        height (int, optional): высота кадра. Defaults to 360.
+        fps (int, optional): частота кадров. Defaults to 30.
+        codec (str, optional): кодек синтетического видео (fourcc). Defaults to 'mp4v'.
+        pattern (dict, optional): параметры шаблона моделей-заглушек. Defaults to None.
+        video_path (str, optional): готовое синтетическое видео, по умолчанию создается
+        временное. Defaults to None.
+        stages (tuple, optional): замеряемые стадии. Defaults to STAGES.
+        max_frames (int, optional): число кадров для замера process_batch. Defaults to 300.
+        lookups (int, optional): число запросов кадров для замера get_frame. Defaults to 200.
+        repeats (int, optional): число повторов анализа. Defaults to 20.
+        config (dict, optional): конфигурация системы, по умолчанию исходная
+        конфигурация с моделями-заглушками. Defaults to None.
+
+    Returns:
+        dict: параметры запуска и результаты стадий
+    """
+    config = config or stub_config(pattern)
+    batch_size = config['handler']['processing']['BATCH_SIZE']
+    methods = list(config['analyser'].keys())
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if video_path is None:
+            video_path = make_video(os.path.join(tmp_dir, 'synthetic.avi'), frames, width, height, fps, codec)
+
+        engine = Engine(config)
+        data = engine.handler.process_video(video_path)
+        frame_count = len(data['detection'])
+        timestamps = data['detection'].timestamps.copy()
+
+        results = {}
+        for stage in stages:
+            if stage == 'decode':
+                results[stage] = bench_decode(video_path, batch_size)
+            elif stage == 'process_batch':
+                handler = VideoHandler(config['handler'])
+                results[stage] = bench_process_batch(handler, video_path, batch_size, max_frames)
+            elif stage == 'analysis':
+                results[stage] = bench_analysis(engine.analizer, data, methods, repeats)
+            elif stage == 'get_frame':
+                renderer = VideoRenderer(config.get('renderer'))
+                results[stage] = bench_get_frame(renderer, video_path, timestamps, lookups)
+            elif stage == 'end_to_end':
+                results[stage] = bench_end_to_end(engine, video_path, frame_count)
+            else:
+                raise ValueError(f'Неизвестная стадия: {stage}')
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__
+        },
+        'video': {'frames': frame_count, 'width': width, 'height': height, 'fps': fps, 'codec': codec},
+        'pattern': {**DEFAULT_PATTERN, **(pattern or {})},
+        'stages': results
+    }
+
+
+def thresholds_from_baseline(baseline, tolerance=0.2):
+    """пороги регрессии по результатам предыдущего запуска
+
+    Args:
+        baseline (dict): результаты предыдущего запуска
+        tolerance (float, optional): допустимое снижение пропускной способности. Defaults to 0.2.
+
+    Returns:
+        dict: для каждой стадии минимальная пропускная способность и ожидаемое число нарушений
+    """
+    thresholds = {}
+    for stage, result in baseline['stages'].items():
+        thresholds[stage] = {'min_throughput': result['throughput'] * (1 - tolerance)}
+        if 'violations' in result:
+            thresholds[stage]['violations'] = result['violations']
+    return thresholds
+
+
+def check_thresholds(report, thresholds):
+    """проверка результатов по порогам регрессии
+
+    Args:
+        report (dict): результаты запуска
+        thresholds (dict): пороги стадий ('min_throughput', 'violations')
+
+    Returns:
+        list: описания нарушенных порогов
+    """
+    failures = []
+    for stage, limits in thresholds.items():
+        result = report['stages'].get(stage)
+        if result is None:
+            continue
+        if 'min_throughput' in limits and result['throughput'] < limits['min_throughput']:
+            failures.append(f'{stage}: пропускная способность {result["throughput"]:.1f} '
+                            f'ниже порога {limits["min_throughput"]:.1f}')
+        if 'violations' in limits and result.get('violations') != limits['violations']:
+            failures.append(f'{stage}: найдено нарушений {result.get("violations")}, '
+                            f'ожидалось {limits["violations"]}')
+    return failures
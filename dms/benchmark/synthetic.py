@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+
+# Номер кадра записывается в левый верхний угол кадра блоками MARKER_BLOCK x MARKER_BLOCK
+# (черный - 0, белый - 1), поэтому он переживает сжатие и читается моделями-заглушками
+MARKER_BLOCK = 8
+MARKER_BITS = 24
+
+
+def marker_columns(width):
+    """число блоков маркера в строке кадра заданной ширины"""
+    return max(width // MARKER_BLOCK, 1)
+
+
+def write_marker(frame, index):
+    """запись номера кадра в маркер
+
+    Args:
+        frame (np.array): кадр
+        index (int): номер кадра
+    """
+    columns = marker_columns(frame.shape[1])
+    for bit in range(MARKER_BITS):
+        row, column = divmod(bit, columns)
+        value = 255 if (index >> bit) & 1 else 0
+        frame[row * MARKER_BLOCK:(row + 1) * MARKER_BLOCK,
+              column * MARKER_BLOCK:(column + 1) * MARKER_BLOCK] = value
+
+
+def read_marker(frame):
+    """чтение номера кадра из маркера
+
+    Args:
+        frame (np.array): кадр
+
+    Returns:
+        int: номер кадра
+    """
+    columns = marker_columns(frame.shape[1])
+    index = 0
+    half = MARKER_BLOCK // 2
+    for bit in range(MARKER_BITS):
+        row, column = divmod(bit, columns)
+        # Значение берется в центре блока, где искажения сжатия минимальны
+        if frame[row * MARKER_BLOCK + half, column * MARKER_BLOCK + half].mean() > 127:
+            index |= 1 << bit
+    return index
+
+
+def make_video(path, frames=900, width=640, height=360, fps=30, codec='MJPG'):
+    """создание синтетического видео с номерами кадров в маркерах
+
+    Args:
+        path (str): путь к видео
+        frames (int, optional): число кадров. Defaults to 900.
+        width (int, optional): ширина кадра. Defaults to 640.
+        height (int, optional): высота кадра. Defaults to 360.
+        fps (int, optional): частота кадров. Defaults to 30.
+        codec (str, optional): кодек (fourcc). Defaults to 'MJPG'.
+
+    Returns:
+        str: путь к видео
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f'Не удалось создать видео {path}')
+
+    rng = np.random.default_rng(0)
+    # Сглаженный шум на фоне, чтобы размер и время декодирования были близки к реальному видео
+    background = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (9, 9), 0)
+    try:
+        for index in range(frames):
+            frame = np.roll(background, index * 4, axis=1)
+            write_marker(frame, index)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
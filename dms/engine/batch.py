@@ -0,0 +1,167 @@
+import glob
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+
+import cv2
+import pandas as pd
+
+from dms.settings import config as default_config
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v')
+COLUMNS = ['Начало', 'Конец', 'Человек', 'Нарушение']
+
+_engine = None  # объект Engine процесса-обработчика, модели загружаются один раз
+
+
+def collect_videos(inputs):
+    """составление списка видео для обработки
+
+    Args:
+        inputs (list): каталоги, шаблоны путей (glob) или файлы-манифесты
+        (.txt/.csv, один путь к видео в строке)
+
+    Returns:
+        list: пути к видео без повторов
+    """
+    videos = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    videos.append(os.path.join(item, name))
+        elif os.path.isfile(item) and item.lower().endswith(('.txt', '.csv')):
+            base = os.path.dirname(item)
+            with open(item, 'r') as f:
+                for line in f:
+                    path = line.strip().split(',')[0]
+                    if path and not path.startswith('#'):
+                        videos.append(path if os.path.isabs(path) else os.path.join(base, path))
+        else:
+            videos.extend(sorted(glob.glob(item)) or [item])
+    return list(dict.fromkeys(os.path.abspath(video) for video in videos))
+
+
+def video_frame_count(video_path):
+    """число кадров видео
+
+    Args:
+        video_path (str): путь к видео
+
+    Returns:
+        int: число кадров
+    """
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return frame_count
+
+
+def result_path(video_path, output_dir):
+    """путь к файлу с нарушениями видео. Имя содержит хэш пути,
+       чтобы видео с одинаковыми именами из разных каталогов не пересекались
+
+    Args:
+        video_path (str): путь к видео
+        output_dir (str): каталог результатов
+
+    Returns:
+        str: путь к csv файлу
+    """
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    suffix = hashlib.blake2b(video_path.encode(), digest_size=4).hexdigest()
+    return os.path.join(output_dir, f'{stem}_{suffix}.csv')
+
+
+def _init_worker(config, threads):
+    """инициализация процесса-обработчика: загрузка моделей"""
+    global _engine
+    import torch
+    from dms.engine import Engine
+
+    if threads:
+        torch.set_num_threads(threads)
+    _engine = Engine(config)
+
+
+def _process_video(video_path, output_dir):
+    """обработка одного видео в процессе-обработчике, результат записывается в csv
+
+    Returns:
+        (str, list): путь к видео и список нарушений
+    """
+    violations = _engine.violations_search(video_path)
+    save_path = result_path(video_path, output_dir)
+    tmp_path = f'{save_path}.tmp'
+    pd.DataFrame(violations, columns=COLUMNS).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, save_path)  # частично записанные файлы не считаются готовыми
+    return video_path, violations
+
+
+def process_videos(videos, output_dir, workers=1, threads=None, config=default_config):
+    """обработка набора видео пулом процессов. Видео обрабатываются от самых длинных
+       к самым коротким, уже обработанные видео (с готовым csv) пропускаются
+
+    Args:
+        videos (list): пути к видео
+        output_dir (str): каталог результатов
+        workers (int, optional): число процессов-обработчиков. Defaults to 1.
+        threads (int, optional): число потоков torch на процесс, по умолчанию
+        ядра делятся поровну между процессами. Defaults to None.
+        config (dict, optional): конфигурация системы. Defaults to config.
+
+    Returns:
+        pd.DataFrame: общая таблица нарушений всех успешно обработанных видео
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(workers, 1)
+    if threads is None:
+        threads = max((os.cpu_count() or 1) // workers, 1)
+
+    frame_counts = {video: video_frame_count(video) for video in videos}
+    pending = [video for video in videos if not os.path.exists(result_path(video, output_dir))]
+    pending.sort(key=lambda video: frame_counts[video], reverse=True)
+    print(f'Видео: {len(videos)}, уже обработано: {len(videos) - len(pending)}')
+
+    start = time.time()
+    failed = set()
+    if pending and workers == 1:
+        _init_worker(config, threads)
+        for video in pending:
+            try:
+                _process_video(video, output_dir)
+            except Exception as e:
+                failed.add(video)
+                print(f'{video}: ошибка обработки: {e!r}')
+    elif pending:
+        context = mp.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(config, threads)) as executor:
+            futures = {executor.submit(_process_video, video, output_dir): video for video in pending}
+            for future in as_completed(futures):
+                try:
+                    video_path, violations = future.result()
+                    print(f'{video_path}: нарушений {len(violations)}')
+                except Exception as e:
+                    failed.add(futures[future])
+                    print(f'{futures[future]}: ошибка обработки: {e!r}')
+    elapsed = time.time() - start
+
+    done = [video for video in pending if video not in failed]
+    if done:
+        frames = sum(frame_counts[video] for video in done)
+        print(f'Обработано видео: {len(done)} за {elapsed:.1f} с, '
+              f'{len(done) / elapsed * 3600:.1f} видео/час, {frames / elapsed:.1f} кадров/с')
+
+    tables = []
+    for video in videos:
+        if video in failed:
+            continue
+        table = pd.read_csv(result_path(video, output_dir))
+        table.insert(0, 'Видео', video)
+        tables.append(table)
+    combined = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=['Видео'] + COLUMNS)
+    combined.to_csv(os.path.join(output_dir, 'violations.csv'), index=False)
+    return combined
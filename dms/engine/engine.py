@@ -1,6 +1,9 @@
 from dms.analysis import Analyzer
+from dms.analysis.calibration import calibrate
+from dms.engine.export import VideoExporter
 from dms.handler import VideoHandler
 from dms.utils import VideoRenderer
+from dms.utils.metrics import metrics
 from dms.settings import config
 
 class Engine:
@@ -20,7 +23,10 @@ class Engine:
         self.config = config
         self.handler = VideoHandler(self.config['handler'])
         self.analizer = Analyzer(self.config['analyser'])
-        self.renderer = VideoRenderer()
+        self.renderer = VideoRenderer(self.config.get('renderer'))
+        self.exporter = VideoExporter(self.config['handler']['processing'].get('export'), self.renderer)
+        if 'metrics' in self.config:
+            metrics.configure(self.config['metrics'])
 
     def violations_search(self, video_path, methods=None):
         """метод для поиска нарушений на видео. 
@@ -41,24 +47,136 @@ class Engine:
 
         model_process_res = self.handler.process_video(video_path)
         violations = self.analizer.violation_analysis(model_process_res, methods)
+        metrics.flush()
         print(f'Найденные нарушения: {violations}')
+
+        if self.config['handler']['processing'].get('save_path'):
+            self.export_video(video_path, self.analizer.intervals)
         return violations
+
+    def export_video(self, video_path, intervals=None, output_dir=None, clips=None):
+        """метод для сохранения видео с разметкой результатов обработки за один проход
+           по видео. Используются результаты последней обработки видео
+
+        Args:
+            video_path (str): путь к видео
+            intervals (list, optional): интервалы нарушений в миллисекундах, кадры нарушений
+            выделяются рамкой, по умолчанию интервалы последнего анализа. Defaults to None.
+            output_dir (str, optional): каталог для сохранения, по умолчанию save_path из
+            параметров обработки. Defaults to None.
+            clips (bool, optional): сохранение только фрагментов вокруг нарушений, по
+            умолчанию значение из конфигурации экспорта. Defaults to None.
+
+        Returns:
+            list: пути к сохраненным видео
+        """
+        output_dir = output_dir or self.config['handler']['processing'].get('save_path')
+        if not output_dir:
+            raise ValueError('Не задан каталог для сохранения видео (save_path)')
+        intervals = self.analizer.intervals if intervals is None else intervals
+        return self.exporter.export(video_path, self.handler.data, output_dir, intervals, clips)
     
-    def show_violations(self, timestamp, video_path):
+    def iter_violations(self, source, methods=None):
+        """генератор нарушений для потоковой обработки длинных видео и живых источников.
+           Нарушение выдается сразу после закрытия его интервала, информация о кадрах
+           старше самого длинного допустимого разрыва (max_long_diff) удаляется,
+           поэтому объем памяти не зависит от длительности потока
+
+        Args:
+            source (str | int | iterable): путь к видео, номер камеры или последовательность
+            кадров (см. VideoHandler.read_frames)
+            methods (list, optional): выбраные методы анализа видео, при отсутствии
+            параметра будут использованы все доступные методы
+
+        Yields:
+            list: нарушение
+        """
+        self.handler.clear_data()
+        self.analizer.clear_data()
+
+        if not methods:
+            methods = list(self.config['analyser'].keys())
+        window = max(self.config['analyser'][method].get('max_long_diff', 0) for method in methods)
+        stream = self.analizer.stream(methods)
+
+        for batch_data in self.handler.process_stream(source):
+            yield from stream.update(batch_data)
+            last_timestamp = max((table.timestamps[-1] for table in batch_data.values() if len(table)),
+                                 default=None)
+            if last_timestamp is not None:
+                self.handler.drop_data_before(last_timestamp - window)
+        yield from stream.close()
+        metrics.flush()
+
+    def calibrate(self, videos, grid, workers=1, min_iou=0.0, method='wrist_phone_usage'):
+        """метод для подбора параметров правила анализатора по размеченным видео.
+           Каждое видео обрабатывается один раз (или загружается из кэша результатов),
+           затем оцениваются все сочетания параметров сетки
+
+        Args:
+            videos (list): пары (путь к видео, размеченные интервалы нарушений (начало, конец) в мс)
+            grid (dict): параметр -> список значений (min_duration, max_short_diff, max_long_diff
+            и параметры признака нарушения правила, например max_wrist_dist)
+            workers (int, optional): число процессов для оценки сетки. Defaults to 1.
+            min_iou (float, optional): минимальный IoU интервалов для совпадения. Defaults to 0.0.
+            method (str, optional): калибруемое правило анализатора. Defaults to 'wrist_phone_usage'.
+
+        Returns:
+            list: для каждого сочетания параметров значения параметров и оценки
+            precision, recall, f1, time_precision, time_recall
+        """
+        samples = []
+        for video_path, truth in videos:
+            self.handler.clear_data()
+            samples.append((self.handler.process_video(video_path), truth))
+        return calibrate(samples, self.config['analyser'][method], grid, workers, min_iou)
+
+    @staticmethod
+    def _frame_objects(data, timestamp, task):
+        """объекты первого кадра с временной меткой не меньше заданной или None"""
+        table = data.get(task)
+        if table is None:
+            return None
+        index = table.search(timestamp)
+        return table.frame(index) if index is not None else None
+
+    def show_violations(self, timestamp, video_path, data=None):
         """метод для получения кадра со всеми метками использованных моделей обработки
 
         Args:
             timestamp (_type_): временная метка кадра
             video_path (_type_): путь к видео
+            data (dict, optional): результаты обработки видео, по умолчанию результаты
+            последней обработки. Defaults to None.
 
         Returns:
             np.array: кадр со всеми метками использованных моделей
         """
-        frame = self.renderer.get_frame(timestamp, video_path)
-        
-        frame_detections_data = self.handler.get_frame_data(timestamp, 'detection')
-        frame = self.renderer.plot_boxes(frame, frame_detections_data, 'detection')
+        data = self.handler.data if data is None else data
+        frame_detections_data = self._frame_objects(data, timestamp, 'detection')
+        frame_pos_data = self._frame_objects(data, timestamp, 'pos_est')
+
+        frame_data = frame_detections_data if frame_detections_data is not None else frame_pos_data
+        if frame_data is not None:
+            # Кадр, соответствующий найденным данным обработчика, читается по id
+            frame = self.renderer.get_frame_by_id(frame_data.frame_id, video_path)
+        else:
+            frame = self.renderer.get_frame(timestamp, video_path)
 
-        frame_pos_data = self.handler.get_frame_data(timestamp, 'pos_est')
-        frame = self.renderer.plot_boxes(frame, frame_pos_data, 'pos_est')
+        if frame_detections_data is not None:
+            frame = self.renderer.plot_boxes(frame, frame_detections_data, 'detection')
+        if frame_pos_data is not None:
+            frame = self.renderer.plot_boxes(frame, frame_pos_data, 'pos_est')
         return frame
+
+    def get_violation_data(self, start, end):
+        """метод для получения результатов всех моделей обработки за временной интервал нарушения
+
+        Args:
+            start (float): временная метка начала нарушения
+            end (float): временная метка конца нарушения
+
+        Returns:
+            dict: кадры интервала для каждого типа обработки
+        """
+        return {task: self.handler.get_range_data(start, end, task) for task in self.handler.data}
@@ -0,0 +1,181 @@
+import bisect
+import os
+
+import cv2
+
+from dms.handler.pipeline import run_pipeline
+from dms.utils import VideoRenderer
+
+# Параметры экспорта видео с разметкой по умолчанию
+DEFAULT_EXPORT = {
+    'clips': False,
+    'padding': 1000,
+    'codec': 'mp4v',
+    'batch_size': 16,
+    'queue_size': 4
+}
+
+
+def violation_windows(intervals, padding=0):
+    """объединение пересекающихся интервалов нарушений
+
+    Args:
+        intervals (list): интервалы нарушений [начало (мс), конец (мс), ...]
+        (см. Analyzer.intervals)
+        padding (int, optional): расширение интервалов в обе стороны (мс). Defaults to 0.
+
+    Returns:
+        list: интервалы (начало, конец) в миллисекундах
+    """
+    intervals = sorted((interval[0] - padding, interval[1] + padding) for interval in intervals)
+    windows = []
+    for start, end in intervals:
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([max(start, 0), end])
+    return [tuple(window) for window in windows]
+
+
+class VideoExporter:
+    """ Экспорт видео с разметкой результатов обработки за один проход по видео.
+
+        Кадры декодируются, размечаются по сохраненным результатам обработчика
+        и кодируются в отдельных потоках конвейера. Видео экспортируется целиком
+        или фрагментами вокруг нарушений. Перед каждым фрагментом видео
+        перематывается к его началу, поэтому кадры между фрагментами
+        декодируются только от ближайшего предшествующего ключевого кадра
+    """
+
+    def __init__(self, config=None, renderer=None):
+        """Инициализация объекта класса
+
+        Args:
+            config (dict, optional): параметры экспорта (см. DEFAULT_EXPORT). Defaults to None.
+            renderer (VideoRenderer, optional): объект отрисовки разметки. Defaults to None.
+        """
+        self.config = {**DEFAULT_EXPORT, **(config or {})}
+        self.renderer = renderer or VideoRenderer()
+
+    def _read(self, cap, windows):
+        """генератор батчей кадров (кадр, id кадра, временная метка, номер фрагмента).
+           Перед фрагментом, начинающимся после текущего кадра, видео перематывается
+           к началу фрагмента
+        """
+        batch = []
+        window = 0
+        sought = None  # номер фрагмента, к началу которого выполнена перемотка
+        timestamp = None
+        while windows is None or window < len(windows):
+            if windows is not None and sought != window and (timestamp is None or timestamp < windows[window][0]):
+                cap.set(cv2.CAP_PROP_POS_MSEC, windows[window][0])
+                sought = window
+            if not cap.grab():
+                break
+            # id кадра соответствует id обработчика и после перемотки
+            frame_id = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+            timestamp = cap.get(cv2.CAP_PROP_POS_MSEC)
+            if windows is not None:
+                while window < len(windows) and timestamp > windows[window][1]:
+                    window += 1
+                if window == len(windows) or timestamp < windows[window][0]:
+                    continue
+            success, frame = cap.retrieve()
+            if not success:
+                break
+            batch.append((frame, frame_id, timestamp, window))
+            if len(batch) == self.config['batch_size']:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def annotate(self, frame, data, rows, frame_id, marked=False):
+        """отрисовка результатов обработки кадра
+
+        Args:
+            frame (np.array): кадр
+            data (dict): результаты обработчика
+            rows (dict): для каждого типа обработки соответствие id кадра номеру строки таблицы
+            frame_id (int): id кадра
+            marked (bool, optional): кадр входит в интервал нарушения и выделяется
+            рамкой. Defaults to False.
+
+        Returns:
+            np.array: кадр с разметкой
+        """
+        for task, table in data.items():
+            row = rows[task].get(frame_id)
+            if row is None:
+                continue
+            objects = table.frame(row)
+            if not objects:
+                continue
+            frame = self.renderer.plot_boxes(frame, objects, task)
+            if task == 'pos_est':
+                frame = self.renderer.plot_keypoints(frame, objects['keypoints'])
+        if marked:
+            height, width = frame.shape[:2]
+            frame = cv2.rectangle(frame, (0, 0), (width - 1, height - 1), (0, 0, 255), 8)
+        return frame
+
+    def export(self, video_path, data, output_dir, intervals=None, clips=None):
+        """экспорт видео с разметкой
+
+        Args:
+            video_path (str): путь к видео
+            data (dict): результаты обработки видео (VideoHandler.data)
+            output_dir (str): каталог для сохранения
+            intervals (list, optional): интервалы нарушений в миллисекундах (Analyzer.intervals),
+            кадры нарушений выделяются рамкой. Defaults to None.
+            clips (bool, optional): экспорт только фрагментов вокруг нарушений, по умолчанию
+            значение из конфигурации. Defaults to None.
+
+        Returns:
+            list: пути к сохраненным видео
+        """
+        clips = self.config['clips'] if clips is None else clips
+        intervals = intervals or []
+        marks = violation_windows(intervals)
+        mark_starts = [start for start, _ in marks]
+        windows = violation_windows(intervals, self.config['padding']) if clips else None
+        if clips and not windows:
+            return []
+
+        os.makedirs(output_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(video_path))[0]
+        rows = {task: dict(zip(table.frame_ids.tolist(), range(len(table)))) for task, table in data.items()}
+
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        fourcc = cv2.VideoWriter_fourcc(*self.config['codec'])
+        paths = []
+        writer = {'window': None, 'writer': None}
+
+        def draw(batch):
+            annotated = []
+            for frame, frame_id, timestamp, window in batch:
+                index = bisect.bisect_right(mark_starts, timestamp) - 1
+                marked = index >= 0 and timestamp <= marks[index][1]
+                annotated.append((self.annotate(frame, data, rows, frame_id, marked), window))
+            return annotated
+
+        def encode(batch):
+            for frame, window in batch:
+                if writer['writer'] is None or writer['window'] != window:
+                    if writer['writer'] is not None:
+                        writer['writer'].release()
+                    name = f'{stem}_violation_{window + 1}.mp4' if clips else f'{stem}_annotated.mp4'
+                    paths.append(os.path.join(output_dir, name))
+                    writer['writer'] = cv2.VideoWriter(paths[-1], fourcc, fps, size)
+                    writer['window'] = window
+                writer['writer'].write(frame)
+
+        try:
+            run_pipeline(self._read(cap, windows), [draw, encode], queue_size=self.config['queue_size'])
+        finally:
+            cap.release()
+            if writer['writer'] is not None:
+                writer['writer'].release()
+        return paths
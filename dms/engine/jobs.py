@@ -0,0 +1,272 @@
+import itertools
+import queue
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from dms.engine.engine import Engine
+from dms.handler.cache import file_hash
+from dms.settings import config as default_config
+from dms.utils.metrics import metrics
+
+# Параметры очереди заданий по умолчанию
+DEFAULT_SERVING = {
+    'workers': 2,
+    'max_pending': 8,
+    'max_jobs': 32,
+    'concurrency_limit': 16,
+    'poll_interval': 0.5
+}
+
+
+class Job:
+    """ Задание обработки одного видео.
+
+        Состояние задания ('queued', 'running', 'done', 'failed'), прогресс и
+        найденные нарушения обновляются обработчиком очереди. Пока видео
+        обрабатывается, нарушения содержат только закрывшиеся интервалы, после
+        завершения - результат анализа всего видео
+    """
+
+    def __init__(self, job_id, video_path, key):
+        """Инициализация объекта класса
+
+        Args:
+            job_id (int): номер задания
+            video_path (str): путь к видео
+            key (str): хэш содержимого видео для поиска повторных загрузок
+        """
+        self.id = job_id
+        self.video_path = video_path
+        self.key = key
+        self.status = 'queued'
+        self.frames = 0
+        self.total_frames = 0
+        self.violations = []
+        self.data = None  # результаты обработчика после завершения задания
+        self.error = None
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    def begin(self, total_frames):
+        """начало обработки видео задания
+
+        Args:
+            total_frames (int): число кадров видео
+        """
+        with self._lock:
+            self.total_frames = total_frames
+            self.status = 'running'
+
+    @property
+    def progress(self):
+        """доля обработанных кадров"""
+        if self.status == 'done':
+            return 1.0
+        return min(self.frames / self.total_frames, 1.0) if self.total_frames else 0.0
+
+    def update(self, frames, violations):
+        """добавление результатов очередного батча
+
+        Args:
+            frames (int): число обработанных кадров батча
+            violations (list): нарушения, интервалы которых закрылись
+        """
+        with self._lock:
+            self.frames += frames
+            self.violations.extend(violations)
+
+    def finish(self, violations, data):
+        """завершение задания
+
+        Args:
+            violations (list): нарушения всего видео
+            data (dict): результаты обработчика
+        """
+        with self._lock:
+            self.violations = violations
+            self.data = data
+            self.status = 'done'
+        self.done.set()
+
+    def fail(self, error):
+        """завершение задания с ошибкой
+
+        Args:
+            error (Exception): ошибка обработки
+        """
+        with self._lock:
+            self.error = f'{type(error).__name__}: {error}'
+            self.status = 'failed'
+        self.done.set()
+
+    def snapshot(self):
+        """согласованное состояние задания для отображения
+
+        Returns:
+            dict: состояние, прогресс, нарушения и ошибка
+        """
+        with self._lock:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'progress': self.progress,
+                'violations': list(self.violations),
+                'error': self.error
+            }
+
+
+class JobQueue:
+    """ Очередь заданий обработки видео для демонстрационного интерфейса.
+
+        Задания выполняются ограниченным числом обработчиков, у каждого свой объект
+        Engine с общими моделями из реестра, поэтому результаты разных видео не
+        смешиваются. Повторная загрузка видео с тем же содержимым возвращает уже
+        созданное задание. Результаты завершенных заданий хранятся отдельно от
+        обработчиков, поэтому кадры с разметкой можно получать во время обработки
+        других видео
+    """
+
+    def __init__(self, config=default_config):
+        """Инициализация объекта класса
+
+        Args:
+            config (dict, optional): конфигурация системы, параметры очереди в разделе
+            'serving' (см. DEFAULT_SERVING). Defaults to config.
+        """
+        self.config = config
+        self.serving = {**DEFAULT_SERVING, **config.get('serving', {})}
+        self.engines = [Engine(config) for _ in range(self.serving['workers'])]
+
+        self._queue = queue.Queue(maxsize=self.serving['max_pending'])
+        self._jobs = OrderedDict()  # номер задания -> задание
+        self._keys = {}  # хэш видео -> задание
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """запуск обработчиков очереди"""
+        if self._threads:
+            return
+        for index, engine in enumerate(self.engines):
+            thread = threading.Thread(target=self._work, args=(engine,), name=f'dms-job-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """остановка обработчиков после выполнения заданий в очереди"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, video_path):
+        """постановка видео в очередь. Для видео с тем же содержимым возвращается
+           существующее задание, если оно не завершилось ошибкой
+
+        Args:
+            video_path (str): путь к видео
+
+        Returns:
+            Job: задание
+        """
+        self.start()
+        key = file_hash(video_path)
+        with self._lock:
+            job = self._keys.get(key)
+            if job is not None and job.status != 'failed':
+                self._jobs.move_to_end(job.id)
+                return job
+            job = Job(next(self._ids), video_path, key)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise RuntimeError('Очередь заданий заполнена, повторите попытку позже') from None
+            self._jobs[job.id] = job
+            self._keys[key] = job
+            self._evict()
+        return job
+
+    def _evict(self):
+        """удаление самых старых завершенных заданий сверх max_jobs"""
+        finished = [job for job in self._jobs.values() if job.done.is_set()]
+        for job in finished[:max(len(self._jobs) - self.serving['max_jobs'], 0)]:
+            del self._jobs[job.id]
+            if self._keys.get(job.key) is job:
+                del self._keys[job.key]
+
+    def get(self, job_id):
+        """задание по номеру или None, если задание удалено
+
+        Args:
+            job_id (int): номер задания
+
+        Returns:
+            Job: задание
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def show_frame(self, job, timestamp):
+        """кадр видео задания с разметкой. До завершения задания возвращается
+           кадр без разметки
+
+        Args:
+            job (Job): задание
+            timestamp (float): временная метка кадра (мс)
+
+        Returns:
+            np.array: кадр с разметкой
+        """
+        # Используются только сохраненные результаты задания и потокобезопасное
+        # чтение кадров, обработчик объекта Engine не затрагивается
+        data = job.data if job.done.is_set() and job.data is not None else {}
+        return self.engines[0].show_violations(timestamp, job.video_path, data)
+
+    def _work(self, engine):
+        """цикл обработчика очереди"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            try:
+                self._run(engine, job)
+            except Exception as e:
+                job.fail(e)
+            finally:
+                metrics.flush()
+
+    def _run(self, engine, job):
+        """обработка видео задания с передачей прогресса и закрывшихся нарушений"""
+        handler = engine.handler
+        handler.clear_data()
+        engine.analizer.clear_data()
+        methods = list(self.config['analyser'].keys())
+
+        cap = cv2.VideoCapture(job.video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        job.begin(total_frames)
+
+        try:
+            stream = engine.analizer.stream(methods)
+        except ValueError:
+            # Методы без потокового анализа: нарушения появятся после обработки всего видео
+            stream = None
+
+        def update(batch_data):
+            violations = stream.update(batch_data) if stream is not None else []
+            job.update(len(next(iter(batch_data.values()))), violations)
+
+        # Видео обрабатывается так же, как Engine.violations_search (кэш, конвейер,
+        # фрагменты, буфер кадров), результаты батчей передаются заданию
+        data = handler.process_video(job.video_path, callback=update)
+        violations = engine.analizer.violation_analysis(data, methods)
+        if self.config['handler']['processing'].get('save_path'):
+            engine.export_video(job.video_path, engine.analizer.intervals)
+        # Следующее задание обработчика создает новые таблицы, результаты остаются у задания
+        handler.clear_data()
+        job.finish(violations, data)
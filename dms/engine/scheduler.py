@@ -0,0 +1,325 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from dms.analysis import Analyzer
+from dms.handler import VideoHandler
+from dms.settings import config as default_config
+
+
+class _Request:
+    """Кадр потока, ожидающий обработки. Запрос без кадра закрывает поток"""
+    __slots__ = ('session', 'frame', 'timestamp', 'frame_id', 'submit_time')
+
+    def __init__(self, session, frame=None, timestamp=None, frame_id=None):
+        self.session = session
+        self.frame = frame
+        self.timestamp = timestamp
+        self.frame_id = frame_id
+        self.submit_time = time.perf_counter()
+
+
+class StreamSession:
+    """ Состояние одного потока (камеры): собственный обработчик с общими
+        моделями, инкрементальный анализатор и статистика задержек
+    """
+
+    def __init__(self, name, handler, analyzer, methods, window, max_latencies=10000):
+        """Инициализация объекта класса
+
+        Args:
+            name (str): название потока
+            handler (VideoHandler): обработчик потока
+            analyzer (Analyzer): анализатор потока
+            methods (list): выбранные методы анализа
+            window (float): время хранения информации о кадрах (мс)
+            max_latencies (int, optional): число последних задержек для статистики. Defaults to 10000.
+        """
+        self.name = name
+        self.handler = handler
+        self.stream = analyzer.stream(methods)
+        self.window = window
+        self.violations = []
+        self.frames = 0
+        self.error = None  # ошибка чтения кадров источника
+        self.latencies = deque(maxlen=max_latencies)
+        self.closed = threading.Event()
+
+    def receive(self, raw_results, requests):
+        """постобработка результатов моделей для кадров потока и инкрементальный анализ
+
+        Args:
+            raw_results (list): необработанные результаты моделей для кадров потока
+            requests (list): запросы потока в порядке кадров
+
+        Returns:
+            list: нарушения, интервалы которых закрылись
+        """
+        timestamps = [request.timestamp for request in requests]
+        frame_ids = [request.frame_id for request in requests]
+        batch_data = self.handler.convert_results(raw_results, len(requests))
+        self.handler.save_batch(batch_data, timestamps, frame_ids)
+
+        violations = self.stream.update({task: table.tail(len(requests)) for task, table in self.handler.data.items()})
+        self.violations.extend(violations)
+        self.handler.drop_data_before(max(timestamps) - self.window)
+
+        now = time.perf_counter()
+        self.frames += len(requests)
+        self.latencies.extend((now - request.submit_time) * 1000 for request in requests)
+        return violations
+
+    def finish(self):
+        """завершение потока: фиксация нарушений, продолжавшихся до конца потока"""
+        self.violations.extend(self.stream.close())
+        self.closed.set()
+
+
+class InferenceScheduler:
+    """ Общий планировщик инференса для множества потоков.
+
+        Кадры всех потоков собираются в динамические батчи, размер которых ограничен
+        max_batch_size, а ожидание первого кадра батча - max_delay. Каждая модель
+        применяется один раз к общему батчу, результаты распределяются по потокам,
+        постобработка и анализ выполняются в состоянии каждого потока.
+
+        Модели применяются ко всем кадрам общего батча, параметры обработки
+        'tracking' и 'motion_gating' в планировщике не используются
+    """
+
+    def __init__(self, config=default_config, max_batch_size=16, max_delay=0.05, queue_size=64):
+        """Инициализация объекта класса
+
+        Args:
+            config (dict, optional): конфигурация системы. Defaults to config.
+            max_batch_size (int, optional): максимальный размер общего батча. Defaults to 16.
+            max_delay (float, optional): максимальное время ожидания кадра в очереди (с). Defaults to 0.05.
+            queue_size (int, optional): максимальное число кадров в очереди. Defaults to 64.
+        """
+        self.config = config
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.handler = VideoHandler(self.config['handler'])
+        self.sessions = {}
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._running = False
+        self._frames = 0
+        self._batches = 0
+        self._start_time = None
+        self._busy_time = 0.0
+        self._error = None
+
+    def open_stream(self, name, methods=None):
+        """регистрация нового потока
+
+        Args:
+            name (str): название потока
+            methods (list, optional): выбраные методы анализа, при отсутствии
+            параметра будут использованы все доступные методы
+
+        Returns:
+            StreamSession: состояние потока
+        """
+        if not methods:
+            methods = list(self.config['analyser'].keys())
+        window = max(self.config['analyser'][method].get('max_long_diff', 0) for method in methods)
+        handler = VideoHandler(self.config['handler'], models=self.handler.models)
+        session = StreamSession(name, handler, Analyzer(self.config['analyser']), methods, window)
+        self.sessions[name] = session
+        return session
+
+    def submit(self, session, frame, timestamp, frame_id):
+        """постановка кадра в очередь. При заполненной очереди вызов блокируется
+
+        Args:
+            session (StreamSession): состояние потока
+            frame (np.array): кадр
+            timestamp (float): временная метка кадра
+            frame_id (int): id кадра
+        """
+        self._queue.put(_Request(session, frame, timestamp, frame_id))
+
+    def close_stream(self, session):
+        """закрытие потока после обработки всех его кадров
+
+        Args:
+            session (StreamSession): состояние потока
+        """
+        self._queue.put(_Request(session))
+        session.closed.wait()
+
+    def start(self):
+        """запуск потока планировщика"""
+        self._running = True
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """остановка планировщика после обработки всех кадров в очереди"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+
+    def _collect(self):
+        """сбор батча: до max_batch_size кадров или до истечения max_delay
+           с момента поступления первого кадра. Запрос закрытия потока завершает сбор
+
+        Returns:
+            (list, _Request | None): запросы батча и запрос закрытия потока
+        """
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return [], None
+        if first.frame is None:
+            return [], first
+
+        batch = [first]
+        deadline = first.submit_time + self.max_delay
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request.frame is None:
+                return batch, request
+            batch.append(request)
+        return batch, None
+
+    @staticmethod
+    def _split_results(raw_results, positions):
+        """выбор результатов моделей для кадров одного потока
+
+        Args:
+            raw_results (list): необработанные результаты моделей для общего батча
+            positions (list): позиции кадров потока в общем батче
+
+        Returns:
+            list: необработанные результаты моделей для кадров потока
+        """
+        stream_results = []
+        for task, model_name, batch, names, indices in raw_results:
+            if indices is None:
+                stream_results.append((task, model_name, batch.select(positions), names, None))
+                continue
+            result_index = {frame: k for k, frame in enumerate(indices)}
+            selected = [(i, result_index[p]) for i, p in enumerate(positions) if p in result_index]
+            if selected:
+                stream_results.append((task, model_name, batch.select([k for _, k in selected]), names,
+                                       [i for i, _ in selected]))
+        return stream_results
+
+    def _process(self, batch):
+        """инференс общего батча и распределение результатов по потокам"""
+        start = time.perf_counter()
+        raw_results = self.handler.run_models([request.frame for request in batch])
+
+        positions = {}
+        for position, request in enumerate(batch):
+            positions.setdefault(request.session, []).append(position)
+        for session, session_positions in positions.items():
+            session.receive(self._split_results(raw_results, session_positions),
+                            [batch[p] for p in session_positions])
+
+        self._frames += len(batch)
+        self._batches += 1
+        self._busy_time += time.perf_counter() - start
+
+    def _loop(self):
+        # После ошибки очередь продолжает разбираться, чтобы не блокировать источники
+        while self._running or not self._queue.empty():
+            batch, close_request = self._collect()
+            if batch and self._error is None:
+                try:
+                    self._process(batch)
+                except Exception as e:
+                    self._error = e
+            if close_request is not None:
+                if self._error is None:
+                    close_request.session.finish()
+                else:
+                    close_request.session.closed.set()
+
+    def run(self, sources, methods=None):
+        """обработка нескольких источников до их завершения
+
+        Args:
+            sources (dict): название потока -> путь к видео, номер камеры или
+            последовательность кадров (см. VideoHandler.read_frames)
+            methods (list, optional): выбраные методы анализа видео
+
+        Returns:
+            dict: нарушения каждого потока
+        """
+        def feed(session, source):
+            cap = None
+            try:
+                if isinstance(source, (str, int)):
+                    cap = cv2.VideoCapture(source)
+                    if not cap.isOpened():
+                        raise ValueError(f'Не удалось открыть источник {source}')
+                    frames = session.handler.read_batches(cap, 1) if isinstance(source, str) else \
+                        session.handler.read_frames(session.handler._capture_frames(cap), 1)
+                else:
+                    frames = session.handler.read_frames(source, 1)
+                for (frame,), (timestamp,), (frame_id,) in frames:
+                    # После ошибки инференса чтение прекращается, иначе источник
+                    # без конца (камера) не позволил бы завершить run
+                    if self._error is not None:
+                        break
+                    self.submit(session, frame, timestamp, frame_id)
+            except Exception as e:  # ошибка передается в вызывающий поток
+                session.error = e
+            finally:
+                if cap is not None:
+                    cap.release()
+                self.close_stream(session)
+
+        sessions = {name: self.open_stream(name, methods) for name in sources}
+        feeders = [threading.Thread(target=feed, args=(sessions[name], source), daemon=True)
+                   for name, source in sources.items()]
+        self.start()
+        for feeder in feeders:
+            feeder.start()
+        for feeder in feeders:
+            feeder.join()
+        self.stop()
+        if self._error is not None:
+            raise self._error
+        for session in sessions.values():
+            if session.error is not None:
+                raise session.error
+        return {name: session.violations for name, session in sessions.items()}
+
+    def stats(self):
+        """статистика обработки: задержки потоков и общая пропускная способность
+
+        Returns:
+            dict: статистика
+        """
+        elapsed = time.perf_counter() - self._start_time if self._start_time else 0.0
+        streams = {}
+        for name, session in self.sessions.items():
+            latencies = np.array(session.latencies)
+            streams[name] = {
+                'frames': session.frames,
+                'latency_mean_ms': float(latencies.mean()) if len(latencies) else 0.0,
+                'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                'latency_p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+            }
+        return {
+            'streams': streams,
+            'frames': self._frames,
+            'batches': self._batches,
+            'mean_batch_size': self._frames / self._batches if self._batches else 0.0,
+            'throughput_fps': self._frames / elapsed if elapsed else 0.0,
+            'utilization': self._busy_time / elapsed if elapsed else 0.0,
+        }
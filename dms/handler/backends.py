@@ -0,0 +1,248 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+from ultralytics import YOLO
+
+# Типы обработки системы -> типы задач ultralytics
+TASKS = {
+    'detection': 'detect',
+    'pos_est': 'pose'
+}
+
+PRECISIONS = ('fp32', 'fp16', 'int8')
+
+
+class YOLOBackend:
+    """ Модель формата YOLO, исполняемая PyTorch (ultralytics).
+
+        Все бэкенды возвращают результаты ultralytics (Results), поэтому
+        преобразование результатов обработчиком не зависит от бэкенда
+    """
+
+    def __init__(self, model_conf, device='cpu'):
+        """Инициализация объекта класса
+
+        Args:
+            model_conf (dict): описание модели из конфигурации обработчика
+            device (str, optional): устройство исполнения ('cpu' или 'cuda'). Defaults to 'cpu'.
+        """
+        self.model_conf = model_conf
+        self.params = model_conf.get('specific_params', {})
+        self.precision = self.params.get('precision', 'fp32')
+        if self.precision not in PRECISIONS:
+            raise ValueError(f'Неизвестная точность модели: {self.precision}')
+        self.device = device
+        self.model = self.load()
+        # Модель из реестра может использоваться обработчиками разных потоков,
+        # вызовы модели выполняются по очереди
+        self.lock = threading.Lock()
+
+    @property
+    def names(self):
+        """названия классов модели"""
+        return self.model.names
+
+    @property
+    def task(self):
+        """тип задачи ultralytics, которую решает модель"""
+        return self.model.task
+
+    def load(self):
+        """метод для загрузки модели
+
+        Returns:
+            YOLO: модель ultralytics
+        """
+        if self.precision == 'int8':
+            raise ValueError('Бэкенд YOLO не поддерживает точность int8, используйте ONNX или OpenVINO')
+        model = YOLO(self.model_conf['path'])
+        if self.device == 'cuda':
+            model.to('cuda')
+        return model
+
+    def predict(self, frames, conf, imgsz=None):
+        """метод для применения модели к набору кадров
+
+        Args:
+            frames (list | np.array): кадры для обработки
+            conf (float): параметр уверенности модели
+            imgsz (int, optional): размер входа модели, кадры приводятся к нему с сохранением
+            пропорций. Координаты результатов соответствуют исходным кадрам. Defaults to None.
+
+        Returns:
+            list: результаты ultralytics для каждого кадра
+        """
+        # ultralytics принимает батч списком кадров, массив батча передается
+        # представлениями кадров без копирования
+        return self.model(list(frames), verbose=False, conf=conf, half=self.precision == 'fp16',
+                          **self._size(imgsz))
+
+    def set_threads(self, threads):
+        """метод для ограничения числа потоков исполнения модели
+
+        Args:
+            threads (int): число потоков
+
+        Returns:
+            bool: ограничение задано для модели. False, если модель использует общее
+            для процесса число потоков PyTorch (torch.set_num_threads)
+        """
+        return False
+
+    @staticmethod
+    def _size(imgsz):
+        return {'imgsz': imgsz} if imgsz else {}
+
+    def __call__(self, frames, verbose=False, conf=None):
+        return self.predict(frames, conf)
+
+
+class ExportedBackend(YOLOBackend, ABC):
+    """ Модель, экспортированная из весов PyTorch в формат другого движка исполнения.
+
+        Если в конфигурации указан путь к весам .pt, модель экспортируется один раз
+        и сохраняется рядом с весами с суффиксом точности, например
+        70_7_x_best_int8_onnx.onnx. Экспортированная модель загружается через
+        ultralytics, который выполняет подготовку кадров и подавление пересечений
+    """
+
+    export_format = None  # формат экспорта ultralytics
+    suffix = ''  # расширение экспортированной модели
+
+    def exported_path(self):
+        """путь к экспортированной модели с учетом точности"""
+        stem = os.path.splitext(self.model_conf['path'])[0]
+        return f'{stem}_{self.precision}_{self.export_format}{self.suffix}'
+
+    def export(self, path):
+        """метод для экспорта весов PyTorch
+
+        Args:
+            path (str): путь к экспортированной модели
+        """
+        export_params = {'dynamic': True, **self.params.get('export', {})}
+        model = YOLO(self.model_conf['path'])
+        exported = model.export(format=self.export_format, half=self.precision == 'fp16',
+                                int8=self.precision == 'int8', **export_params)
+        os.replace(exported, path)
+
+    def load(self):
+        path = self.model_conf['path']
+        if path.endswith('.pt'):
+            path = self.exported_path()
+            if not os.path.exists(path):
+                self.export(path)
+        self.path = path
+        return YOLO(path, task=TASKS[self.model_conf['task']])
+
+    def predict(self, frames, conf, imgsz=None):
+        return self.model(list(frames), verbose=False, conf=conf, **self._size(imgsz))
+
+    def _engine(self):
+        """модель движка исполнения ultralytics (AutoBackend). Сессия движка
+           создается ultralytics при первом применении модели
+        """
+        if self.model.predictor is None:
+            self.model(np.zeros((64, 64, 3), dtype=np.uint8), verbose=False)
+        return self.model.predictor.model
+
+    def set_threads(self, threads):
+        if self.device != 'cpu':
+            # Вычисления выполняются на GPU, потоки процессора не ограничиваются
+            return True
+        self._set_session_threads(self._engine(), threads)
+        return True
+
+    @abstractmethod
+    def _set_session_threads(self, engine, threads):
+        """пересоздание сессии движка исполнения с заданным числом потоков"""
+
+
+class ONNXBackend(ExportedBackend):
+    """ Модель, исполняемая ONNX Runtime.
+
+        Точность fp16 доступна только при экспорте на GPU. Для int8 экспортированная
+        модель fp32 квантуется динамически средствами onnxruntime
+    """
+
+    export_format = 'onnx'
+    suffix = '.onnx'
+
+    def export(self, path):
+        if self.precision != 'int8':
+            return super().export(path)
+
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        fp32_path = f'{path}.fp32.onnx'
+        export_params = {'dynamic': True, **self.params.get('export', {})}
+        exported = YOLO(self.model_conf['path']).export(format='onnx', **export_params)
+        os.replace(exported, fp32_path)
+        try:
+            quantize_dynamic(fp32_path, path, weight_type=QuantType.QUInt8)
+        finally:
+            os.remove(fp32_path)
+
+    def _set_session_threads(self, engine, threads):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        engine.session = onnxruntime.InferenceSession(self.path, sess_options=options,
+                                                      providers=engine.session.get_providers())
+
+
+class OpenVINOBackend(ExportedBackend):
+    """ Модель, исполняемая OpenVINO.
+
+        Для int8 выполняется квантование после обучения, калибровочный набор
+        задается параметром export.data (по умолчанию набор ultralytics)
+    """
+
+    export_format = 'openvino'
+    suffix = '_model'
+
+    def _set_session_threads(self, engine, threads):
+        import openvino
+
+        core = openvino.Core()
+        model = core.read_model(next(Path(self.path).glob('*.xml')))
+        engine.ov_compiled_model = core.compile_model(
+            model, 'CPU', {'PERFORMANCE_HINT': 'LATENCY', 'INFERENCE_NUM_THREADS': threads})
+
+
+# Реестр бэкендов исполнения моделей: значение поля 'format' конфигурации -> класс
+BACKENDS = {
+    'YOLO': YOLOBackend,
+    'ONNX': ONNXBackend,
+    'OpenVINO': OpenVINOBackend
+}
+
+
+def register_backend(model_format, backend_cls):
+    """регистрация бэкенда исполнения моделей
+
+    Args:
+        model_format (str): значение поля 'format' в описании модели
+        backend_cls (type): класс бэкенда
+    """
+    BACKENDS[model_format] = backend_cls
+
+
+def load_backend(model_conf, device='cpu'):
+    """загрузка модели бэкендом, соответствующим ее формату
+
+    Args:
+        model_conf (dict): описание модели из конфигурации обработчика
+        device (str, optional): устройство исполнения. Defaults to 'cpu'.
+
+    Returns:
+        YOLOBackend: загруженная модель
+    """
+    model_format = model_conf['format']
+    if model_format not in BACKENDS:
+        raise ValueError(f'Неизвестный формат модели: {model_format}')
+    return BACKENDS[model_format](model_conf, device)
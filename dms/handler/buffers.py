@@ -0,0 +1,158 @@
+import queue
+import threading
+
+import numpy as np
+
+# Параметры буфера кадров по умолчанию
+DEFAULT_FRAME_BUFFER = {
+    'enabled': True,
+    'slots': 3
+}
+
+
+class FrameRing:
+    """ Кольцевой буфер батчей кадров.
+
+        Содержит непрерывные массивы (размер батча, высота, ширина, каналы), кадры
+        декодируются сразу в массив текущего батча (cap.read(image=...)). Массив
+        принадлежит батчу, пока обработчик не вернет его в буфер (release) после
+        обработки батча. Свободные массивы хранятся в очереди, новый массив
+        выделяется, пока их меньше slots, затем чтение ждет освобождения массива.
+        Поэтому объем памяти под кадры ограничен slots массивами и не зависит от
+        длительности видео
+    """
+
+    def __init__(self, batch_size, slots=3):
+        """Инициализация объекта класса
+
+        Args:
+            batch_size (int): максимальное число кадров в батче
+            slots (int, optional): максимальное число массивов батчей. Для конвейерной
+            обработки нужно не меньше трех (декодирование, инференс, постобработка).
+            Defaults to 3.
+        """
+        self.batch_size = batch_size
+        self.slots = max(slots, 1)
+        self.buffers = []  # массивы батчей для текущего размера кадров
+        self.allocations = 0  # число выделенных массивов батчей
+        self._free = queue.Queue()  # свободные массивы, None - отмена ожидания
+        self._busy = set()  # id массивов, занятых батчами
+        self._lock = threading.Lock()
+        self._shape = None
+        self._slot = None  # массив текущего батча
+
+    @property
+    def nbytes(self):
+        """объем памяти массивов буфера"""
+        return sum(buffer.nbytes for buffer in self.buffers)
+
+    def reset(self):
+        """возврат всех массивов в буфер перед чтением нового видео. Массивы батчей,
+           не возвращенных после ошибки обработки, снова становятся свободными
+        """
+        with self._lock:
+            self._free = queue.Queue()
+            for buffer in self.buffers:
+                self._free.put(buffer)
+            self._busy = set()
+            self._slot = None
+
+    def cancel(self):
+        """прерывание ожидания свободного массива (например, при ошибке обработки),
+           чтение батчей завершается
+        """
+        self._free.put(None)
+
+    def _resize(self, shape, dtype):
+        """удаление массивов при изменении размера кадров. Массивы обрабатываемых
+           батчей остаются у батчей и не возвращаются в буфер
+        """
+        with self._lock:
+            self._shape = (shape, dtype)
+            self.buffers = []
+            self._free = queue.Queue()
+            self._busy = set()
+
+    def _take(self):
+        """свободный массив, новый массив или ожидание освобождения массива
+
+        Returns:
+            np.array | None: массив батча или None, если ожидание отменено
+        """
+        try:
+            buffer = self._free.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if len(self.buffers) < self.slots:
+                    buffer = np.empty((self.batch_size, *self._shape[0]), dtype=self._shape[1])
+                    self.buffers.append(buffer)
+                    self.allocations += 1
+                else:
+                    buffer = None
+            if buffer is None:
+                buffer = self._free.get()
+        if buffer is not None:
+            with self._lock:
+                self._busy.add(id(buffer))
+        return buffer
+
+    def release(self, frames):
+        """возврат массива батча в буфер после обработки батча. Кадры батча после
+           этого перезаписываются следующими батчами
+
+        Args:
+            frames (np.array): кадры батча, полученные из batch. Кадры не из буфера
+            (например, список кадров) пропускаются
+        """
+        # Кадры батча - срез массива буфера, массив доступен через base
+        buffer = getattr(frames, 'base', None)
+        with self._lock:
+            if buffer is None or id(buffer) not in self._busy or \
+                    not any(buffer is current for current in self.buffers):
+                return
+            self._busy.discard(id(buffer))
+        self._free.put(buffer)
+
+    def read(self, cap, position):
+        """декодирование очередного кадра видео в позицию текущего батча. Для первого
+           кадра батча выбирается свободный массив
+
+        Args:
+            cap (cv2.VideoCapture): открытое видео
+            position (int): позиция кадра в батче
+
+        Returns:
+            bool: кадр прочитан
+        """
+        if position == 0:
+            self._slot = self._take() if self._shape is not None else None
+            if self._shape is not None and self._slot is None:
+                return False
+        target = self._slot[position] if self._slot is not None else None
+        if target is None:
+            success, frame = cap.read()
+        else:
+            success, frame = cap.read(image=target)
+        if not success:
+            if position == 0 and self._slot is not None:
+                self.release(self._slot[:0])
+            return False
+        if target is None or frame.ctypes.data != target.ctypes.data:
+            # Первый кадр или изменился размер кадров: массивы выделяются заново
+            if position:
+                raise ValueError(f'Размер кадров изменился внутри батча: {frame.shape}')
+            self._resize(frame.shape, frame.dtype)
+            self._slot = self._take()
+            self._slot[position] = frame
+        return True
+
+    def batch(self, count):
+        """кадры текущего батча
+
+        Args:
+            count (int): число прочитанных кадров
+
+        Returns:
+            np.array: кадры (представление массива буфера без копирования)
+        """
+        return self._slot[:count]
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+# Версия формата записей кэша, увеличивается при изменении формата таблиц результатов,
+# чтобы записи старого формата не загружались
+FORMAT_VERSION = 1
+
+# Параметры обработки, влияющие на результаты и входящие в ключ кэша. Число процессов
+# segment_workers не входит: обработка фрагментами совпадает с последовательной
+PROCESSING_PARAMS = ('BATCH_SIZE', 'cascade', 'preprocessing', 'tracking', 'motion_gating')
+
+
+def file_hash(path, chunk_size=1 << 22):
+    """хэш содержимого файла
+
+    Args:
+        path (str): путь к файлу
+        chunk_size (int, optional): размер блока чтения файла. Defaults to 4 Мб.
+
+    Returns:
+        str: хэш файла
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """ Постоянный кэш результатов обработки видео на диске.
+
+        Ключ строится по хэшу содержимого видео и параметрам обработки (модели,
+        параметры моделей, размер батча, предобработка кадров), поэтому повторный
+        анализ того же видео с другими порогами анализатора не требует повторного инференса.
+        Результаты хранятся в формате npz, при превышении размера кэша удаляются
+        записи, к которым дольше всего не обращались (LRU)
+    """
+
+    def __init__(self, path, max_size_mb=2048):
+        """Инициализация объекта класса
+
+        Args:
+            path (str): каталог кэша
+            max_size_mb (int, optional): максимальный размер кэша в мегабайтах. Defaults to 2048.
+        """
+        self.path = path
+        self.max_size = max_size_mb * 1024 * 1024
+        self._hashes = {}  # (путь, mtime, размер) -> хэш содержимого видео
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def video_hash(self, video_path, chunk_size=1 << 22):
+        """хэш содержимого видео. Для неизменившегося файла берется из памяти
+
+        Args:
+            video_path (str): путь к видео
+            chunk_size (int, optional): размер блока чтения файла. Defaults to 4 Мб.
+
+        Returns:
+            str: хэш видео
+        """
+        stat = os.stat(video_path)
+        file_key = (os.path.abspath(video_path), stat.st_mtime_ns, stat.st_size)
+        if file_key not in self._hashes:
+            self._hashes[file_key] = file_hash(video_path, chunk_size)
+        return self._hashes[file_key]
+
+    @staticmethod
+    def _model_signature(model_conf):
+        """параметры модели, влияющие на результат, включая размер и время изменения весов"""
+        signature = dict(model_conf)
+        if os.path.exists(model_conf['path']):
+            stat = os.stat(model_conf['path'])
+            signature['weights'] = (stat.st_size, stat.st_mtime_ns)
+        return signature
+
+    def key(self, video_path, config):
+        """ключ кэша для видео и параметров обработки
+
+        Args:
+            video_path (str): путь к видео
+            config (dict): конфигурация обработчика
+
+        Returns:
+            str: ключ кэша
+        """
+        processing = config['processing']
+        signature = {
+            'format': FORMAT_VERSION,
+            'video': self.video_hash(video_path),
+            'models': {name: self._model_signature(model_conf) for name, model_conf in config['models'].items()},
+            'processing': {name: processing.get(name) for name in PROCESSING_PARAMS}
+        }
+        data = json.dumps(signature, sort_keys=True, default=str).encode()
+        return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, f'{key}.npz')
+
+    def load(self, key, tables):
+        """загрузка результатов обработки из кэша
+
+        Args:
+            key (str): ключ кэша
+            tables (dict): классы таблиц результатов для каждого типа обработки
+
+        Returns:
+            dict | None: таблицы результатов или None, если записи нет в кэше
+        """
+        path = self._file(key)
+        try:
+            with np.load(path, allow_pickle=False) as archive:
+                arrays = {name: archive[name] for name in archive.files}
+            os.utime(path)  # время последнего обращения для LRU
+        except (OSError, ValueError):
+            # Записи нет или она удалена другим процессом
+            return None
+
+        data = {}
+        for task, table_cls in tables.items():
+            prefix = f'{task}/'
+            data[task] = table_cls.from_arrays(
+                {name[len(prefix):]: array for name, array in arrays.items() if name.startswith(prefix)})
+        return data
+
+    def save(self, key, data):
+        """запись результатов обработки в кэш
+
+        Args:
+            key (str): ключ кэша
+            data (dict): таблицы результатов для каждого типа обработки
+        """
+        arrays = {}
+        for task, table in data.items():
+            for name, array in table.to_arrays().items():
+                arrays[f'{task}/{name}'] = array
+
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez(f, **arrays)
+                os.replace(tmp_path, self._file(key))
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            self._evict()
+
+    def _evict(self):
+        """удаление записей, к которым дольше всего не обращались, до допустимого размера кэша"""
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith('.npz'):
+                try:
+                    stat = os.stat(os.path.join(self.path, name))
+                except FileNotFoundError:  # запись удалена другим процессом
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """удаление всех записей кэша"""
+        with self._lock:
+            for name in os.listdir(self.path):
+                if name.endswith('.npz'):
+                    os.remove(os.path.join(self.path, name))
@@ -0,0 +1,121 @@
+import cv2
+import numpy as np
+
+from dms.handler.results import ResultBatch
+
+# Параметры отбора кадров по движению по умолчанию
+DEFAULT_GATING = {
+    'threshold': 2.0,
+    'width': 64,
+    'max_skip': 30
+}
+
+
+class MotionGate:
+    """ Отбор кадров для инференса по изменению изображения.
+
+        Кадр сравнивается в уменьшенном виде в градациях серого с последним кадром,
+        к которому применялись модели. Если среднее абсолютное отличие меньше порога,
+        модели к кадру не применяются, а результаты предыдущего кадра повторяются,
+        поэтому все кадры и их временные метки сохраняются в результатах обработки
+    """
+
+    def __init__(self, config=None):
+        """Инициализация объекта класса
+
+        Args:
+            config (dict, optional): параметры отбора (см. DEFAULT_GATING). Defaults to None.
+        """
+        self.config = {**DEFAULT_GATING, **(config or {})}
+        self.reset()
+
+    def reset(self):
+        """сброс опорного кадра и повторяемых результатов (например, перед новым видео)"""
+        self.reference = None  # уменьшенный последний кадр, к которому применялись модели
+        self.since_inferred = 0
+        self.last = {}  # название модели -> (тип обработки, результаты последнего кадра, названия классов)
+        self.skipped = 0
+        self.total = 0
+
+    def _thumbnail(self, frame):
+        """уменьшенный кадр в градациях серого"""
+        height, width = frame.shape[:2]
+        size = (self.config['width'], max(round(height * self.config['width'] / width), 1))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def select(self, frames):
+        """выбор кадров батча, к которым применяются модели
+
+        Args:
+            frames (np.array): кадры батча
+
+        Returns:
+            list: номера кадров батча для инференса
+        """
+        positions = []
+        for position, frame in enumerate(frames):
+            thumbnail = self._thumbnail(frame)
+            changed = self.reference is None or np.abs(thumbnail - self.reference).mean() >= self.config['threshold']
+            # Результаты не повторяются дольше max_skip кадров подряд
+            if changed or self.since_inferred >= self.config['max_skip']:
+                positions.append(position)
+                self.reference = thumbnail
+                self.since_inferred = 0
+            else:
+                self.since_inferred += 1
+        self.total += len(frames)
+        self.skipped += len(frames) - len(positions)
+        return positions
+
+    def expand(self, raw_results, positions, frame_count, model_names):
+        """распространение результатов моделей на пропущенные кадры батча: пропущенный
+           кадр получает результаты последнего предшествующего кадра с инференсом
+           (в том числе из предыдущего батча)
+
+        Args:
+            raw_results (list): необработанные результаты моделей для кадров positions
+            positions (list): номера кадров батча, к которым применялись модели
+            frame_count (int): число кадров батча
+            model_names (list): названия моделей в порядке применения
+
+        Returns:
+            list: необработанные результаты моделей для всех кадров батча
+        """
+        # Источник результатов кадра: номер кадра с инференсом в positions, -1 - предыдущий батч
+        sources = np.full(frame_count, -1, dtype=np.int64)
+        sources[positions] = np.arange(len(positions))
+        sources = np.maximum.accumulate(sources)
+
+        entries = {model_name: (task, batch, names, indices)
+                   for task, model_name, batch, names, indices in raw_results}
+        expanded = []
+        for model_name in model_names:
+            parts = []
+            rows = {}  # источник -> номер кадра в объединенных результатах
+            if model_name in self.last:
+                task, batch, names = self.last[model_name]
+                rows[-1] = 0
+                parts.append(batch)
+            if model_name in entries:
+                task, batch, names, indices = entries[model_name]
+                # Кадры результатов батча следуют за кадрами предыдущих частей
+                offset = sum(len(part) for part in parts)
+                for row, source in enumerate(range(len(positions)) if indices is None else indices):
+                    rows[source] = offset + row
+                parts.append(batch)
+            if not parts:
+                continue
+
+            combined = ResultBatch.concat(parts)
+            frames = [frame for frame in range(frame_count) if sources[frame] in rows]
+            if frames:
+                model_batch = combined.select([rows[sources[frame]] for frame in frames])
+                expanded.append((task, model_name, model_batch, names, None if len(frames) == frame_count else frames))
+
+            if sources[-1] in rows:
+                self.last[model_name] = (task, combined.select([rows[sources[-1]]]), names)
+            else:
+                # Модель не применялась к последнему кадру с инференсом (каскадный режим)
+                self.last.pop(model_name, None)
+        return expanded
@@ -1,8 +1,22 @@
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+
 import torch
 import cv2
+import numpy as np
 from tqdm import tqdm
-from ultralytics import YOLO
+
+from dms.handler.buffers import DEFAULT_FRAME_BUFFER, FrameRing
+from dms.handler.cache import ResultCache
+from dms.handler.gating import MotionGate
+from dms.handler.parallel import process_video_segments
+from dms.handler.pipeline import run_pipeline
+from dms.handler.registry import registry
+from dms.handler.results import ResultBatch
+from dms.handler.storage import DetectionTable, PoseTable
+from dms.handler.tracking import KeyframeTracker
+from dms.utils.metrics import metrics
 
 
 class VideoHandler():
@@ -10,12 +24,14 @@ class VideoHandler():
         Применяет ряд моделей к видео и записывает результат обработки
     """
 
-    def __init__(self, config) -> None:
+    def __init__(self, config, models=None) -> None:
         """Инициализация объекта класса
 
         Args:
             config (_type_): чать конфигурационного файла системы, содержащая информацию
             об используемых моделях и параметрах обработки видео
+            models (dict, optional): уже загруженные модели другого обработчика. Модели
+            используются совместно, без повторной загрузки. Defaults to None.
         """
 
         self.config = config
@@ -25,25 +41,57 @@ class VideoHandler():
             'pos_est': []
         }
 
-        self.data = {
-            'detection': [],
-            'pos_est': []
+        self.tables = {
+            'detection': DetectionTable,
+            'pos_est': PoseTable
         }
+        self.data = {task: table_cls() for task, table_cls in self.tables.items()}
+
+        cache_conf = self.config['processing'].get('cache')
+        self.cache = ResultCache(**cache_conf) if cache_conf else None
 
         self.cuda_status = torch.cuda.is_available()
-        self.load_models()
+        if models is None:
+            self.load_models()
+        else:
+            self.models = models
+
+        self._pool = None  # пул потоков параллельного применения моделей
+
+        # Применение моделей к ключевым кадрам с трекингом объектов между ними
+        tracking_conf = self.config['processing'].get('tracking') or {}
+        self.tracker = KeyframeTracker(self, tracking_conf) if tracking_conf.get('enabled', False) else None
+        # Повтор результатов предыдущего кадра для статичных кадров
+        gating_conf = self.config['processing'].get('motion_gating') or {}
+        self.gate = MotionGate(gating_conf) if gating_conf.get('enabled', False) else None
+        if self.config['processing'].get('segment_workers', 1) > 1 and (self.tracker is not None or self.gate is not None):
+            # Фрагменты обрабатываются независимо: состояние трекера и отбора по движению
+            # начиналось бы заново на каждой границе, а номера треков разных фрагментов совпадали бы
+            raise ValueError('Параллельная обработка фрагментов (segment_workers > 1) несовместима '
+                             'с трекингом и отбором кадров по движению')
+        self._ring = None  # кольцевой буфер кадров декодирования видео
+
+    def frame_ring(self):
+        """кольцевой буфер кадров для декодирования видео. Буфер используется повторно
+           для всех видео обработчика, при выключенном буфере возвращается None
+
+        Returns:
+            FrameRing: буфер кадров
+        """
+        processing = self.config['processing']
+        buffer_conf = {**DEFAULT_FRAME_BUFFER, **(processing.get('frame_buffer') or {})}
+        if not buffer_conf['enabled']:
+            return None
+        if self._ring is None or self._ring.batch_size != processing['BATCH_SIZE']:
+            self._ring = FrameRing(processing['BATCH_SIZE'], buffer_conf['slots'])
+        return self._ring
 
     def load_models(self):
-        """метод для инициализации моделей обработки
+        """метод для инициализации моделей обработки. Модели берутся из общего реестра
+           процесса, поэтому каждая модель загружается один раз
         """
-        init_models = []
-        for model_name, model_conf in self.config['models'].items():
-            if model_conf['format'] == 'YOLO':
-                init_models.append(YOLO(model_conf['path']))
-            for model in init_models:
-                if self.cuda_status:
-                    model.to('cuda')
-                self.models[model_conf['task']].append((model_name, model))
+        device = 'cuda' if self.cuda_status else 'cpu'
+        self.models = registry.load(self.config['models'], device)
 
     def handle_yolo_detection(self, model, frames, conf):
         """метод для обработки результата модели детекции формата YOLO
@@ -57,22 +105,21 @@ class VideoHandler():
             list: результат обработки
         """
         results = model(frames, verbose=False, conf=conf)  # TODO добавить conf в конфиг
-        names = model.names
-        detection_data = []
-
-        for _, res in enumerate(results):
-            detected_objects = []
-            boxes = res.boxes.cpu().numpy()
-            for box in boxes:
-                class_name = names[int(box.cls)]
-                xyxy = box.xyxy[0]
-                detected_objects.append((class_name, xyxy.tolist()))
-            
-            if detected_objects:
-                detection_data.append(detected_objects)
-            else:
-                detection_data.append([])
-        return detection_data
+        return self.convert_yolo_detection(results, model.names)
+
+    @staticmethod
+    def convert_yolo_detection(results, names):
+        """метод для преобразования результата модели детекции формата YOLO
+           в формат списков (для совместимости)
+
+        Args:
+            results (list): результат работы модели детекции
+            names (dict): названия классов модели
+
+        Returns:
+            list: результат обработки
+        """
+        return ResultBatch.from_results(results).to_detection_lists(names)
 
     def handle_yolo_pos_est(self, model, frames, conf):
         """етод для обработки результата модели определения позы формата YOLO
@@ -86,23 +133,339 @@ class VideoHandler():
             list: результат обработки
         """
         results = model(frames, verbose=False, conf=conf)
-        pos_est_data = []
-
-        for _, res in enumerate(results):
-            objects_pos = []
-            if res.keypoints:
-                boxes = res.boxes.cpu().numpy()
-                keypoints = res.keypoints.xy.cpu().numpy().tolist()
-                for i, box in enumerate(boxes):
-                    xyxy = box.xyxy[0]
-                    keys = keypoints[i]
-                    objects_pos.append([i, keys, xyxy.tolist()])
-
-            if objects_pos:
-                pos_est_data.append(objects_pos)
-            else:
-                pos_est_data.append([])
-        return pos_est_data
+        return self.convert_yolo_pos_est(results)
+
+    @staticmethod
+    def convert_yolo_pos_est(results):
+        """метод для преобразования результата модели определения позы формата YOLO
+           в формат списков (для совместимости)
+
+        Args:
+            results (list): результат работы модели определения позы
+
+        Returns:
+            list: результат обработки
+        """
+        return ResultBatch.from_results(results, pose=True).to_pos_est_lists()
+
+    def yolo_detection_columns(self, batch, names):
+        """метод для преобразования результатов модели детекции для батча
+           в столбцы таблицы результатов
+
+        Args:
+            batch (ResultBatch): результаты модели детекции
+            names (dict): названия классов модели
+
+        Returns:
+            dict: столбцы объектов ('cls', 'box') всех кадров подряд
+        """
+        table = self.data['detection']
+        label_ids = np.full(max(names) + 1, -1, dtype=np.int32)
+        for cls, name in names.items():
+            label_ids[cls] = table.label_id(name)
+        return {
+            'cls': label_ids[batch.cls.astype(np.int64)],
+            'box': batch.xyxy
+        }
+
+    @staticmethod
+    def yolo_pos_est_columns(batch):
+        """метод для преобразования результатов модели определения позы для батча
+           в столбцы таблицы результатов
+
+        Args:
+            batch (ResultBatch): результаты модели определения позы
+
+        Returns:
+            dict: столбцы объектов ('person', 'keypoints', 'box') всех кадров подряд
+        """
+        if batch.ids is not None:
+            # При трекинге номер человека - номер трека, постоянный между кадрами
+            person = batch.ids.astype(np.int32)
+        else:
+            offsets = np.cumsum(batch.counts) - batch.counts
+            person = (np.arange(batch.counts.sum()) - np.repeat(offsets, batch.counts)).astype(np.int32)
+        return {
+            'person': person,
+            'keypoints': batch.keypoints[..., :2],
+            'box': batch.xyxy
+        }
+
+    def preprocessing_params(self, model_name):
+        """параметры предобработки кадров для модели. Параметры модели из раздела
+           'models' дополняют общие параметры камеры
+
+        Args:
+            model_name (str): название модели
+
+        Returns:
+            (tuple | None, int | None): область интереса [x1, y1, x2, y2] и размер входа модели
+        """
+        preprocessing = self.config['processing'].get('preprocessing') or {}
+        params = {**preprocessing, **preprocessing.get('models', {}).get(model_name, {})}
+        roi = params.get('roi')
+        return (tuple(int(v) for v in roi) if roi else None), params.get('imgsz')
+
+    @staticmethod
+    def crop_frames(frames, roi):
+        """вырезание области интереса из кадров (без копирования)
+
+        Args:
+            frames (list | np.array): кадры или массив кадров батча
+            roi (tuple | None): область интереса [x1, y1, x2, y2], None - весь кадр
+
+        Returns:
+            list | np.array: области интереса кадров
+        """
+        if roi is None:
+            return frames
+        x1, y1, x2, y2 = roi
+        if isinstance(frames, np.ndarray):
+            return frames[:, y1:y2, x1:x2]
+        return [frame[y1:y2, x1:x2] for frame in frames]
+
+    @staticmethod
+    def to_frame_coords(batch, roi):
+        """перевод рамок и ключевых точек результатов модели из координат области интереса
+           в координаты исходного кадра. Невидимые ключевые точки (0, 0) не изменяются
+
+        Args:
+            batch (ResultBatch): результаты модели
+            roi (tuple | None): область интереса [x1, y1, x2, y2]
+        """
+        if roi is not None:
+            batch.shift(*roi[:2])
+
+    @staticmethod
+    def _triggered_frames(raw_results, trigger):
+        """вспомогательный метод для определения кадров, на которых вышестоящая модель
+           нашла объекты, необходимые для запуска зависимой модели
+
+        Args:
+            raw_results (list): необработанные результаты уже примененных моделей
+            trigger (dict): условие запуска модели (тип обработки и список классов)
+
+        Returns:
+            list: индексы кадров батча, удовлетворяющих условию
+        """
+        fired = set()
+        for task, _, batch, names, indices in raw_results:
+            if task != trigger['task']:
+                continue
+            class_ids = [cls for cls, name in names.items() if name in trigger['classes']]
+            frames = batch.frames_with_classes(class_ids)
+            if indices is not None:
+                frames = np.asarray(indices)[frames]
+            fired.update(frames.tolist())
+        return sorted(fired)
+
+    def run_models(self, frames):
+        """метод для применения моделей обработки к набору кадров (стадия инференса).
+
+           В каскадном режиме модель с условием запуска ('trigger') применяется только
+           к тем кадрам батча, на которых вышестоящая модель нашла указанные объекты.
+           Модели получают область интереса кадров в заданном размере входа, координаты
+           результатов переводятся обратно в координаты исходных кадров. При включенном
+           параллельном режиме независимые модели применяются одновременно в пуле потоков
+
+        Args:
+            frames (np.array): кадры для обработки
+
+        Returns:
+            list: необработанные результаты моделей в виде (тип обработки, название модели,
+            результаты батча (ResultBatch), названия классов, индексы обработанных кадров
+            или None для всех кадров)
+        """
+        cascade = self.config['processing'].get('cascade', False)
+        plan = []
+        for task in ('detection', 'pos_est'):
+            # Описания моделей с общим экземпляром модели и одинаковой предобработкой
+            # применяются одним вызовом
+            groups = {}
+            for model_name, model in self.models[task]:
+                roi, imgsz = self.preprocessing_params(model_name)
+                groups.setdefault((id(model), roi, imgsz), (task, model, roi, imgsz, []))[4].append(model_name)
+            plan.extend(groups.values())
+
+        # Группы без условия запуска не зависят от результатов других моделей
+        independent = [not (cascade and any('trigger' in self.config['models'][model_name] for model_name in group[4]))
+                       for group in plan]
+        futures = {}
+        pool = self._model_pool([group for i, group in enumerate(plan) if independent[i]])
+        if pool is not None:
+            for i, group in enumerate(plan):
+                if independent[i]:
+                    entries = self._model_entries(group[4], [], False)
+                    futures[i] = pool.submit(self._run_group, group, entries, frames)
+
+        raw_results = []
+        for i, group in enumerate(plan):
+            if i in futures:
+                raw_results.extend(futures[i].result())
+                continue
+            entries = self._model_entries(group[4], raw_results, cascade)
+            if entries:
+                raw_results.extend(self._run_group(group, entries, frames))
+        return raw_results
+
+    def _model_entries(self, model_names, raw_results, cascade):
+        """описания моделей группы: название, уверенность и индексы кадров (None - все кадры).
+           Модели, условие запуска которых не выполнено ни на одном кадре, пропускаются
+        """
+        entries = []
+        for model_name in model_names:
+            model_conf = self.config['models'][model_name]
+            indices = None
+            if cascade and 'trigger' in model_conf:
+                indices = self._triggered_frames(raw_results, model_conf['trigger'])
+                if not indices:
+                    continue
+            entries.append((model_name, model_conf['specific_params']['conf'], indices))
+        return entries
+
+    def _run_group(self, group, entries, frames):
+        """применение модели одним вызовом для всех описаний группы
+
+        Returns:
+            list: необработанные результаты описаний моделей группы
+        """
+        task, model, roi, imgsz, _ = group
+        # Модель применяется к объединению кадров всех описаний с наименьшей уверенностью
+        if any(indices is None for _, _, indices in entries):
+            run_indices = None
+        else:
+            run_indices = sorted(set().union(*(indices for _, _, indices in entries)))
+        model_frames = frames if run_indices is None else [frames[i] for i in run_indices]
+        min_conf = min(conf for _, conf, _ in entries)
+        label = ','.join(model_name for model_name, _, _ in entries)
+        with metrics.timer('model_seconds', model=label):
+            inputs = self.crop_frames(model_frames, roi)
+            with model.lock:
+                results = model.predict(inputs, min_conf, imgsz)
+            # Результаты батча переносятся в память хоста одной операцией
+            batch = ResultBatch.from_results(results, pose=task == 'pos_est')
+        metrics.inc('model_frames_total', len(model_frames), model=label)
+        self.to_frame_coords(batch, roi)
+
+        raw_results = []
+        positions = {frame: k for k, frame in enumerate(run_indices or range(len(frames)))}
+        for model_name, conf, indices in entries:
+            model_batch = batch if indices == run_indices else batch.select([positions[i] for i in indices])
+            if conf > min_conf:
+                model_batch = model_batch.filter(model_batch.conf >= conf)
+            raw_results.append((task, model_name, model_batch, model.names, indices))
+        return raw_results
+
+    @staticmethod
+    def _set_threads(groups, threads_conf):
+        """ограничение числа потоков независимых моделей перед запуском пула. По умолчанию
+           ядра делятся поровну между моделями. Модели ONNX Runtime и OpenVINO получают
+           собственное ограничение, число потоков PyTorch общее для процесса, поэтому
+           задается один раз - наибольшее из значений для моделей PyTorch
+
+        Args:
+            groups (list): группы независимых моделей
+            threads_conf (dict): число потоков для моделей: название модели -> число
+        """
+        budget = max((os.cpu_count() or 1) // len(groups), 1)
+        torch_threads = []
+        for _, model, _, _, model_names in groups:
+            threads = max(threads_conf.get(model_name, budget) for model_name in model_names)
+            if not model.set_threads(threads):
+                torch_threads.append(threads)
+        if torch_threads:
+            torch.set_num_threads(max(torch_threads))
+
+    def _model_pool(self, groups):
+        """пул потоков для параллельного применения независимых моделей или None,
+           если параллельный режим выключен или независимая модель одна. При создании
+           пула задается число потоков моделей
+
+        Args:
+            groups (list): группы независимых моделей
+        """
+        concurrency = self.config['processing'].get('concurrency') or {}
+        if not concurrency.get('enabled', False) or len(groups) < 2:
+            return None
+        if self._pool is None:
+            self._set_threads(groups, concurrency.get('threads') or {})
+            self._pool = ThreadPoolExecutor(max_workers=concurrency.get('workers') or len(groups),
+                                            thread_name_prefix='dms-model')
+        return self._pool
+
+    def infer(self, frames):
+        """метод для получения результатов моделей для набора кадров: применение моделей
+           ко всем кадрам или, при включенном трекинге, только к ключевым кадрам. При
+           включенном отборе по движению модели применяются только к изменившимся кадрам,
+           остальные кадры получают результаты предыдущего кадра
+
+        Args:
+            frames (np.array): кадры для обработки
+
+        Returns:
+            list: необработанные результаты моделей в формате run_models
+        """
+        if self.gate is None:
+            return self._infer(frames)
+        positions = self.gate.select(frames)
+        metrics.inc('frames_skipped_total', len(frames) - len(positions))
+        raw_results = self._infer([frames[i] for i in positions]) if positions else []
+        model_names = [model_name for task in ('detection', 'pos_est') for model_name, _ in self.models[task]]
+        return self.gate.expand(raw_results, positions, len(frames), model_names)
+
+    def _infer(self, frames):
+        if self.tracker is not None:
+            return self.tracker.run(frames)
+        return self.run_models(frames)
+
+    def convert_results(self, raw_results, frame_count):
+        """метод для преобразования результатов моделей к формату хранения (стадия постобработки).
+           Кадры, пропущенные в каскадном режиме, остаются без объектов
+
+        Args:
+            raw_results (list): необработанные результаты моделей, полученные из run_models
+            frame_count (int): число кадров в батче
+
+        Returns:
+            dict: для каждого типа обработки число объектов на кадрах и столбцы объектов батча
+        """
+        with metrics.timer('convert_seconds'):
+            parts = {task: [] for task, models in self.models.items() if models}
+            for task, _, batch, names, indices in raw_results:
+                if not batch.counts.sum():
+                    continue
+                if task == 'detection':
+                    columns = self.yolo_detection_columns(batch, names)
+                elif task == 'pos_est':
+                    columns = self.yolo_pos_est_columns(batch)
+                frames = np.arange(frame_count) if indices is None else np.asarray(indices, dtype=np.int64)
+                parts[task].append((np.repeat(frames, batch.counts), columns))
+
+            batch_data = {}
+            for task, task_parts in parts.items():
+                if not task_parts:
+                    batch_data[task] = (np.zeros(frame_count, dtype=np.int64), {})
+                    continue
+                object_frames = np.concatenate([frames for frames, _ in task_parts])
+                columns = {name: np.concatenate([part[name] for _, part in task_parts]) for name in task_parts[0][1]}
+                if len(task_parts) > 1:
+                    # Объекты нескольких моделей упорядочиваются по кадрам, внутри кадра - в порядке моделей
+                    order = np.argsort(object_frames, kind='stable')
+                    columns = {name: values[order] for name, values in columns.items()}
+                batch_data[task] = (np.bincount(object_frames, minlength=frame_count), columns)
+        return batch_data
+
+    def save_batch(self, batch_data, timestamps, frame_ids):
+        """метод для записи результатов обработки набора кадров
+
+        Args:
+            batch_data (dict): результаты обработки батча, полученные из convert_results
+            timestamps (list): список с временными метками кадров
+            frame_ids (list): список с id кадров
+        """
+        for task, (counts, columns) in batch_data.items():
+            self.data[task].append(frame_ids, timestamps, counts, **columns)
+        metrics.inc('frames_processed_total', len(frame_ids))
 
     # Метод для обработки набора кадров выбранными моделями и записи результата
     def process_batch(self, frames, timestamps, frame_ids):
@@ -113,104 +476,316 @@ class VideoHandler():
             timestamps (list): список с временными метками кадров 
             frame_ids (list): список с id кадров 
         """
-        detection_models = self.models['detection']
-        pos_est_models = self.models['pos_est']
-        batch_det_data = []
-        batch_pos_data = []
-
-        # Обработка кадров моделями детекции
-        if detection_models:
-            batch_det_data = [[frame_ids[i], timestamps[i], []] for i, _ in enumerate(frames)]
-            for model_name, model in detection_models:
-                det_data = None
-                # Обработка моделей формата YOLO
-                if self.config['models'][model_name]['format'] == 'YOLO':
-                    conf = self.config['models'][model_name]['specific_params']['conf']
-                    det_data = self.handle_yolo_detection(model, frames, conf)
-
-                if det_data:
-                    for i, _ in enumerate(frames):
-                        batch_det_data[i][2].extend(det_data[i])
-        
-        # Обработка кадров моделями определения позы
-        if pos_est_models:
-            batch_pos_data = [[frame_ids[i], timestamps[i], []] for i, _ in enumerate(frames)]
-            for model_name, model in pos_est_models:
-                pos_est_data = None
-                # Обработка моделей формата YOLO
-                if self.config['models'][model_name]['format'] == 'YOLO':
-                    conf = self.config['models'][model_name]['specific_params']['conf']
-                    pos_est_data = self.handle_yolo_pos_est(model, frames, conf)
-                if pos_est_data:
-                    for i, _ in enumerate(frames):
-                        batch_pos_data[i][2].extend(pos_est_data[i])
-
-        # Запись результатов обработки
-        self.data['detection'].extend(batch_det_data)
-        self.data['pos_est'].extend(batch_pos_data)
-
-
-    def process_video(self, video_path):
-        """метод обработки видео
+        with metrics.timer('batch_seconds'):
+            raw_results = self.infer(frames)
+            self.save_batch(self.convert_results(raw_results, len(frame_ids)), timestamps, frame_ids)
+
+    @staticmethod
+    def read_batches(cap, batch_size, limit=None, ring=None):
+        """генератор батчей кадров видео (стадия декодирования)
 
         Args:
-            video_path (str): путьк видео
+            cap (cv2.VideoCapture): открытое видео
+            batch_size (int): размер батча
+            limit (int, optional): максимальное число читаемых кадров. Defaults to None.
+            ring (FrameRing, optional): буфер кадров. Кадры декодируются в массивы буфера
+            и передаются одним массивом батча без копирования, после обработки батча
+            массив возвращается в буфер (FrameRing.release). Defaults to None.
+
+        Yields:
+            (list | np.array, list, list): кадры, временные метки кадров и id кадров
+        """
+        remaining = limit
+        if ring is not None:
+            ring.reset()
+        while cap.isOpened() and (remaining is None or remaining > 0):
+            frames = []
+            frame_ids = []
+            timestamps = []
+            allocations = ring.allocations if ring is not None else 0
+            # Собираем кадры в батч для обработки
+            with metrics.timer('decode_seconds'):
+                for position in range(batch_size if remaining is None else min(batch_size, remaining)):
+                    if ring is not None:
+                        success, frame = ring.read(cap, position), None
+                    else:
+                        success, frame = cap.read()
+                    frame_id = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+                    if not success:
+                        break
+                    timestamps.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+                    frame_ids.append(frame_id)
+                    frames.append(frame)
+            metrics.inc('frames_decoded_total', len(frames))
+            # Без буфера массив каждого кадра выделяется при декодировании
+            metrics.inc('frame_allocations_total', ring.allocations - allocations if ring is not None else len(frames))
+
+            if len(frames) != 0:
+                yield (ring.batch(len(frames)) if ring is not None else frames), timestamps, frame_ids
+
+            if not success:
+                break
+            if remaining is not None:
+                remaining -= len(frames)
+
+    @staticmethod
+    def read_frames(frames, batch_size):
+        """генератор батчей из последовательности кадров (например, живого потока)
+
+        Args:
+            frames (iterable): кадры или пары (временная метка в мс, кадр). Для кадров
+            без временной метки используется время их получения от начала потока
+            batch_size (int): размер батча
+
+        Yields:
+            (list, list, list): кадры, временные метки кадров и id кадров
+        """
+        start = time.monotonic()
+        batch = ([], [], [])
+        for frame_id, item in enumerate(frames, 1):
+            if isinstance(item, tuple):
+                timestamp, frame = item
+            else:
+                timestamp, frame = (time.monotonic() - start) * 1000, item
+            batch[0].append(frame)
+            batch[1].append(timestamp)
+            batch[2].append(frame_id)
+            if len(batch[0]) == batch_size:
+                yield batch
+                batch = ([], [], [])
+        if batch[0]:
+            yield batch
+
+    @staticmethod
+    def _capture_frames(cap):
+        """генератор кадров открытого потока (камеры)"""
+        while cap.isOpened():
+            success, frame = cap.read()
+            if not success:
+                break
+            yield frame
+
+    def process_stream(self, source):
+        """генератор потоковой обработки видео. Результаты каждого батча записываются
+           в self.data и сразу передаются вызывающему коду
+
+        Args:
+            source (str | int | iterable): путь к видео, номер камеры или последовательность
+            кадров (см. read_frames)
+
+        Yields:
+            dict: результаты обработки батча для каждого типа обработки
+        """
+        batch_size = self.config['processing']['BATCH_SIZE']
+        cap = None
+        if isinstance(source, str):
+            cap = cv2.VideoCapture(source)
+            batches = self.read_batches(cap, batch_size, ring=self.frame_ring())
+        elif isinstance(source, int):
+            cap = cv2.VideoCapture(source)
+            batches = self.read_frames(self._capture_frames(cap), batch_size)
+        else:
+            batches = self.read_frames(source, batch_size)
+
+        try:
+            for frames, timestamps, frame_ids in batches:
+                self.process_batch(frames, timestamps, frame_ids)
+                self._release_frames(frames)
+                yield {task: table.tail(len(frame_ids)) for task, table in self.data.items()}
+        finally:
+            if cap is not None:
+                cap.release()
+
+    def drop_data_before(self, timestamp):
+        """удаление информации о кадрах с временной меткой меньше заданной
+
+        Args:
+            timestamp (float): временная метка
+        """
+        for table in self.data.values():
+            table.drop_before(timestamp)
+
+    def _release_frames(self, frames):
+        """возврат массива кадров обработанного батча в буфер кадров"""
+        if self._ring is not None:
+            self._ring.release(frames)
+
+    def _batch_done(self, count, pbar, callback):
+        """отображение прогресса и передача результатов обработанного батча"""
+        pbar.update(count)
+        if callback is not None:
+            callback({task: table.tail(count) for task, table in self.data.items()})
+
+    def _process_serial(self, batches, pbar, callback=None):
+        """последовательная обработка батчей в одном потоке"""
+        for frames, timestamps, frame_ids in batches:
+            # Отправляем собранный батч на обработку
+            self.process_batch(frames, timestamps, frame_ids)
+            self._release_frames(frames)
+            self._batch_done(len(frame_ids), pbar, callback)
+
+    def _process_pipelined(self, batches, pbar, callback=None):
+        """конвейерная обработка батчей: декодирование, инференс и постобработка
+           выполняются в отдельных потоках, связанных очередями ограниченного размера
+        """
+        queue_size = self.config['processing'].get('queue_size', 4)
+
+        def infer(batch):
+            frames, timestamps, frame_ids = batch
+            start = time.perf_counter()
+            return self.infer(frames), frames, timestamps, frame_ids, start
+
+        def postprocess(batch):
+            raw_results, frames, timestamps, frame_ids, start = batch
+            self.save_batch(self.convert_results(raw_results, len(frame_ids)), timestamps, frame_ids)
+            # Массив кадров возвращается в буфер только после записи результатов батча
+            self._release_frames(frames)
+            # Задержка батча от начала инференса до записи, включая ожидание в очереди
+            metrics.observe('batch_seconds', time.perf_counter() - start)
+            self._batch_done(len(frame_ids), pbar, callback)
+
+        # При ошибке стадии чтение, ожидающее свободный массив буфера, прерывается
+        on_error = self._ring.cancel if self._ring is not None else None
+        run_pipeline(batches, [infer, postprocess], queue_size=queue_size, on_error=on_error)
+
+    def process_segment(self, video_path, start_frame=0, stop_frame=None, progress=True, callback=None):
+        """метод обработки фрагмента видео [start_frame, stop_frame)
+
+        Args:
+            video_path (str): путь к видео
+            start_frame (int, optional): номер первого кадра фрагмента (с 0). Defaults to 0.
+            stop_frame (int, optional): номер кадра, следующего за фрагментом, None - до конца
+            видео. Defaults to None.
+            progress (bool, optional): отображение прогресса обработки. Defaults to True.
+            callback (callable, optional): функция, получающая результаты каждого обработанного
+            батча для каждого типа обработки. Defaults to None.
 
         Returns:
-            dict: результат обработки видео выбранными моделями
+            dict: результат обработки фрагмента выбранными моделями
         """
         batch_size = self.config['processing']['BATCH_SIZE']
-        
+
         # Информация о видео
         cap = cv2.VideoCapture(video_path)
         frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if stop_frame is not None:
+            frame_count = min(frame_count, stop_frame)
+        if start_frame:
+            # Перемотка к ближайшему предшествующему ключевому кадру и декодирование до start_frame
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        limit = None if stop_frame is None else stop_frame - start_frame
+
+        try:
+            with tqdm(total=frame_count - start_frame, disable=not progress) as pbar:
+                batches = self.read_batches(cap, batch_size, limit, self.frame_ring())
+                if self.config['processing'].get('pipeline', False):
+                    self._process_pipelined(batches, pbar, callback)
+                else:
+                    self._process_serial(batches, pbar, callback)
+        finally:
+            cap.release()
+        return self.data
 
-        # Цикл обработки видео
-        start = time.time()
-        with tqdm(total=frame_count) as pbar:
-            while cap.isOpened():
-                frames = []
-                frame_ids = []
-                timestamps = []
-                # Собираем кадры в батч для обработки
-                for _ in range(batch_size):
-                    success, frame = cap.read()
-                    frame_id = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    def _process_segments(self, video_path, workers, callback=None):
+        """параллельная обработка видео по временным фрагментам. Результаты фрагментов
+           добавляются в порядке кадров, поэтому совпадают с последовательной обработкой.
+           Функция callback получает результаты каждого фрагмента
+        """
+        for segment_data in process_video_segments(video_path, self.config, workers):
+            counts = {}
+            for task, arrays in segment_data.items():
+                table = self.tables[task].from_arrays(arrays)
+                self.data[task].extend(table)
+                counts[task] = len(table)
+            if callback is not None:
+                callback({task: self.data[task].tail(count) for task, count in counts.items()})
+
+    def _with_cache(self, video_path, process):
+        """обработка видео с кэшем результатов. Результаты для уже обработанного видео
+           с теми же параметрами обработки загружаются с диска и заменяют текущие данные,
+           иначе видео обрабатывается и результаты сохраняются в кэш
 
-                    if not success:
-                        break
-                    timestamps.append(cap.get(cv2.CAP_PROP_POS_MSEC))
-                    frame_ids.append(frame_id)
-                    frames.append(frame)
+        Args:
+            video_path (str): путь к видео
+            process (callable): функция обработки видео без аргументов
 
-                if len(frames) != 0:
-                    # Отправляем собранный батч на обработку
-                    self.process_batch(frames, timestamps, frame_ids)
+        Returns:
+            bool: результаты загружены из кэша
+        """
+        cache_key = self.cache.key(video_path, self.config) if self.cache is not None else None
+        cached_data = self.cache.load(cache_key, self.tables) if cache_key is not None else None
+        if cached_data is not None:
+            self.data = cached_data
+            return True
+        process()
+        if cache_key is not None:
+            self.cache.save(cache_key, self.data)
+        return False
+
+    def process_video(self, video_path, callback=None):
+        """метод обработки видео. При включенном кэше результаты для уже обработанного
+           видео с теми же параметрами обработки загружаются с диска и заменяют текущие данные
 
-                if not success:
-                    break
-                pbar.update(len(frames))
-        end = time.time() - start
-        print(f"Time: {end}")
+        Args:
+            video_path (str): путьк видео
+            callback (callable, optional): функция, получающая результаты каждого обработанного
+            батча (при параллельной обработке фрагментами - фрагмента) для каждого типа
+            обработки. Для результатов из кэша не вызывается. Defaults to None.
 
+        Returns:
+            dict: результат обработки видео выбранными моделями
+        """
+        self._with_cache(video_path, lambda: self._process_video(video_path, callback))
         return self.data
 
-    def get_frame_data(self, timestamp, task):
+    def _process_video(self, video_path, callback=None):
+        """обработка видео без кэша: фрагментами в пуле процессов или целиком"""
+        # Цикл обработки видео
+        start = time.time()
+        segment_workers = self.config['processing'].get('segment_workers', 1)
+        if segment_workers > 1:
+            self._process_segments(video_path, segment_workers, callback)
+        else:
+            self.process_segment(video_path, callback=callback)
+        end = time.time() - start
+        print(f"Time: {end}")
+        metrics.observe('video_seconds', end)
+
+    def get_frame_data(self, timestamp, task, nearest=False):
         """метд для полученния информации по обработанному кадру
 
         Args:
             timestamp (float): временная метка кадра
             task (str): тип обработки
+            nearest (bool, optional): искать кадр с ближайшей временной меткой вместо
+            первого кадра с меткой не меньше заданной. Defaults to False.
+
+        Returns:
+            FrameObjects: объекты найденного кадра или None
+        """
+        table = self.data[task]
+        index = table.nearest(timestamp) if nearest else table.search(timestamp)
+        if index is not None:
+            return table.frame(index)
+
+    def get_range_data(self, start, end, task):
+        """метод для получения информации по всем обработанным кадрам временного интервала
+
+        Args:
+            start (float): временная метка начала интервала
+            end (float): временная метка конца интервала
+            task (str): тип обработки
 
         Returns:
-            _type_: _description_
+            TableView: кадры интервала
         """
-        for _, time, obj_data in self.data[task]:
-            if time >= timestamp:
-                return obj_data
+        return self.data[task].between(start, end)
 
     def clear_data(self):
-        """удаление информации об обработанных кадрах"""
-        for key in self.data.keys():
-            self.data[key] = []
-        
\ No newline at end of file
+        """удаление информации об обработанных кадрах, треков объектов и опорного кадра"""
+        self.data = {task: table_cls() for task, table_cls in self.tables.items()}
+        if self.tracker is not None:
+            self.tracker.reset()
+        if self.gate is not None:
+            self.gate.reset()
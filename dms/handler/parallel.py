@@ -0,0 +1,81 @@
+import copy
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+_handler = None  # обработчик процесса, модели загружаются один раз
+
+
+def split_segments(frame_count, segments):
+    """разбиение видео на фрагменты примерно равной длины
+
+    Args:
+        frame_count (int): число кадров видео
+        segments (int): число фрагментов
+
+    Returns:
+        list: границы фрагментов в виде (первый кадр, кадр после фрагмента). Последний
+        фрагмент продолжается до конца видео, так как число кадров в метаданных может быть неточным
+    """
+    if frame_count <= 0:
+        return [(0, None)]
+    segments = max(min(segments, frame_count), 1)
+    bounds = [round(i * frame_count / segments) for i in range(segments)] + [None]
+    return [(bounds[i], bounds[i + 1]) for i in range(segments)]
+
+
+def _init_worker(config, threads):
+    """инициализация процесса-обработчика: загрузка моделей"""
+    global _handler
+    import torch
+    from dms.handler import VideoHandler
+
+    if threads:
+        torch.set_num_threads(threads)
+    _handler = VideoHandler(config)
+
+
+def _process_segment(video_path, start_frame, stop_frame):
+    """обработка одного фрагмента в процессе-обработчике
+
+    Returns:
+        dict: массивы таблиц результатов фрагмента для каждого типа обработки
+    """
+    _handler.clear_data()
+    data = _handler.process_segment(video_path, start_frame, stop_frame, progress=False)
+    return {task: table.to_arrays() for task, table in data.items()}
+
+
+def process_video_segments(video_path, config, workers, threads=None):
+    """параллельная обработка фрагментов одного видео пулом процессов, у каждого
+       процесса свой объект захвата видео и свои модели
+
+    Args:
+        video_path (str): путь к видео
+        config (dict): конфигурация обработчика
+        workers (int): число процессов-обработчиков (и фрагментов)
+        threads (int, optional): число потоков torch на процесс, по умолчанию
+        ядра делятся поровну между процессами. Defaults to None.
+
+    Returns:
+        list: массивы таблиц результатов каждого фрагмента в порядке кадров
+    """
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if threads is None:
+        threads = max((os.cpu_count() or 1) // workers, 1)
+
+    # Процессы-обработчики обрабатывают свой фрагмент целиком, без кэша и вложенного разбиения
+    worker_config = copy.deepcopy(config)
+    worker_config['processing']['segment_workers'] = 1
+    worker_config['processing']['cache'] = None
+
+    context = mp.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context,
+                             initializer=_init_worker, initargs=(worker_config, threads)) as executor:
+        futures = [executor.submit(_process_segment, video_path, start, stop)
+                   for start, stop in split_segments(frame_count, workers)]
+        return [future.result() for future in futures]
@@ -0,0 +1,116 @@
+import queue
+import threading
+
+
+_STOP = object()  # маркер завершения потока данных
+
+
+class _Stage(threading.Thread):
+    """Поток одной стадии конвейера. Забирает элементы из входной очереди,
+       обрабатывает их и передает результат в выходную очередь
+    """
+
+    def __init__(self, target, inbox, outbox, failed, poll_interval, on_error=None):
+        """Инициализация объекта класса
+
+        Args:
+            target (callable | iterable): функция обработки элемента или, для первой
+            стадии, итерируемый источник данных
+            inbox (queue.Queue | None): входная очередь, None для источника
+            outbox (queue.Queue | None): выходная очередь, None для последней стадии
+            failed (threading.Event): общий флаг ошибки конвейера
+            poll_interval (float): период проверки флага ошибки при ожидании очереди
+            on_error (callable, optional): функция, вызываемая при ошибке. Defaults to None.
+        """
+        super().__init__(daemon=True)
+        self.target = target
+        self.inbox = inbox
+        self.outbox = outbox
+        self.failed = failed
+        self.poll_interval = poll_interval
+        self.on_error = on_error
+        self.error = None
+
+    def _get(self):
+        while True:
+            try:
+                return self.inbox.get(timeout=self.poll_interval)
+            except queue.Empty:
+                if self.failed.is_set():
+                    return _STOP
+
+    def _put(self, item):
+        while True:
+            try:
+                self.outbox.put(item, timeout=self.poll_interval)
+                return True
+            except queue.Full:
+                if self.failed.is_set():
+                    return False
+
+    def _items(self):
+        if self.inbox is None:
+            yield from self.target
+            return
+        while True:
+            item = self._get()
+            if item is _STOP:
+                return
+            yield self.target(item)
+
+    def run(self):
+        try:
+            for item in self._items():
+                if self.failed.is_set():
+                    return
+                if self.outbox is not None and not self._put(item):
+                    return
+        except BaseException as e:  # ошибка передается в вызывающий поток
+            self.error = e
+            self.failed.set()
+            if self.on_error is not None:
+                self.on_error()
+        finally:
+            if self.outbox is not None and not self.failed.is_set():
+                self._put(_STOP)
+
+
+def run_pipeline(source, stages, queue_size=4, poll_interval=0.1, on_error=None):
+    """запускает источник данных и стадии обработки в отдельных потоках,
+       связанных очередями ограниченного размера. Порядок элементов сохраняется.
+
+       Заполненная очередь блокирует предыдущую стадию (backpressure). Ошибка
+       в любой стадии останавливает весь конвейер и пробрасывается вызывающему коду.
+
+    Args:
+        source (iterable): источник данных (например, генератор батчей кадров)
+        stages (list): функции обработки, каждая принимает результат предыдущей стадии
+        queue_size (int, optional): максимальное число элементов в очереди между стадиями.
+        Defaults to 4.
+        poll_interval (float, optional): период проверки флага ошибки. Defaults to 0.1.
+        on_error (callable, optional): функция без аргументов, вызываемая при ошибке, например
+        для прерывания источника, ожидающего ресурс, который освобождает следующая стадия.
+        Defaults to None.
+    """
+    failed = threading.Event()
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    threads = [_Stage(source, None, queues[0], failed, poll_interval, on_error)]
+    for i, stage in enumerate(stages):
+        outbox = queues[i + 1] if i + 1 < len(stages) else None
+        threads.append(_Stage(stage, queues[i], outbox, failed, poll_interval, on_error))
+
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(poll_interval)
+    except BaseException:
+        failed.set()
+        if on_error is not None:
+            on_error()
+        raise
+
+    for thread in threads:
+        if thread.error is not None:
+            raise thread.error
@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+
+from dms.handler.backends import TASKS, load_backend
+
+# Параметры модели, которые применяются при каждом вызове и не влияют на загрузку
+CALL_PARAMS = ('conf',)
+
+
+class ModelRegistry:
+    """ Реестр загруженных моделей.
+
+        Каждая модель загружается один раз на процесс: описания моделей с одинаковыми
+        весами, форматом и параметрами загрузки получают общий экземпляр, в том числе
+        в разных обработчиках и объектах Engine. При загрузке проверяется, что тип
+        головы модели соответствует типу обработки из конфигурации
+    """
+
+    def __init__(self):
+        """Инициализация объекта класса"""
+        self._models = {}  # ключ загрузки -> модель
+        self._users = {}  # ключ загрузки -> названия описаний моделей, использующих модель
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_conf, device):
+        """ключ загрузки модели: путь к весам, формат, тип обработки, параметры
+           загрузки и устройство исполнения
+
+        Args:
+            model_conf (dict): описание модели из конфигурации обработчика
+            device (str): устройство исполнения
+
+        Returns:
+            str: ключ загрузки
+        """
+        params = {name: value for name, value in model_conf.get('specific_params', {}).items()
+                  if name not in CALL_PARAMS}
+        signature = {
+            'path': os.path.abspath(model_conf['path']),
+            'format': model_conf['format'],
+            'task': model_conf['task'],
+            'params': params,
+            'device': device
+        }
+        return json.dumps(signature, sort_keys=True, default=str)
+
+    @staticmethod
+    def validate(model_name, model_conf, model):
+        """проверка соответствия головы модели типу обработки
+
+        Args:
+            model_name (str): название модели в конфигурации
+            model_conf (dict): описание модели
+            model (YOLOBackend): загруженная модель
+        """
+        if model_conf['task'] not in TASKS:
+            raise ValueError(f'Модель {model_name}: неизвестный тип обработки {model_conf["task"]}')
+        expected = TASKS[model_conf['task']]
+        if model.task != expected:
+            raise ValueError(f'Модель {model_name}: тип обработки {model_conf["task"]} требует '
+                             f'модель {expected}, загружена модель {model.task}')
+
+    def get(self, model_name, model_conf, device='cpu'):
+        """получение модели: загруженной ранее или новой
+
+        Args:
+            model_name (str): название модели в конфигурации
+            model_conf (dict): описание модели
+            device (str, optional): устройство исполнения. Defaults to 'cpu'.
+
+        Returns:
+            YOLOBackend: модель
+        """
+        key = self.key(model_conf, device)
+        with self._lock:
+            if key not in self._models:
+                model = load_backend(model_conf, device)
+                self.validate(model_name, model_conf, model)
+                self._models[key] = model
+                self._users[key] = []
+            if model_name not in self._users[key]:
+                self._users[key].append(model_name)
+            return self._models[key]
+
+    def load(self, models_conf, device='cpu'):
+        """загрузка всех моделей конфигурации
+
+        Args:
+            models_conf (dict): описания моделей (config['handler']['models'])
+            device (str, optional): устройство исполнения. Defaults to 'cpu'.
+
+        Returns:
+            dict: для каждого типа обработки список пар (название модели, модель)
+        """
+        models = {task: [] for task in TASKS}
+        for model_name, model_conf in models_conf.items():
+            model = self.get(model_name, model_conf, device)
+            models[model_conf['task']].append((model_name, model))
+        return models
+
+    def inventory(self):
+        """описание загруженных моделей
+
+        Returns:
+            list: для каждой загруженной модели путь, формат, точность, тип головы,
+            устройство, число классов и названия описаний, использующих модель
+        """
+        with self._lock:
+            inventory = []
+            for key, model in self._models.items():
+                signature = json.loads(key)
+                inventory.append({
+                    'path': signature['path'],
+                    'format': signature['format'],
+                    'precision': model.precision,
+                    'task': model.task,
+                    'device': signature['device'],
+                    'classes': len(model.names),
+                    'used_by': list(self._users[key])
+                })
+            return inventory
+
+    def clear(self):
+        """удаление всех загруженных моделей из реестра"""
+        with self._lock:
+            self._models = {}
+            self._users = {}
+
+
+# Общий реестр процесса
+registry = ModelRegistry()
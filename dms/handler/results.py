@@ -0,0 +1,195 @@
+import numpy as np
+import torch
+
+
+def to_host(arrays):
+    """объединение массивов батча и перенос в память хоста одной операцией
+
+    Args:
+        arrays (list): тензоры torch (в том числе на GPU) или массивы numpy одинаковой формы,
+        кроме первой оси
+
+    Returns:
+        np.array: объединенный массив
+    """
+    if isinstance(arrays[0], torch.Tensor):
+        return torch.cat(arrays).cpu().numpy()
+    return np.concatenate([np.asarray(array) for array in arrays])
+
+
+class ResultBatch:
+    """ Результаты модели для батча кадров в памяти хоста.
+
+        Объекты всех кадров хранятся подряд: рамки в формате
+        (x1, y1, x2, y2, уверенность, класс) и ключевые точки (для моделей
+        определения позы), число объектов каждого кадра - в counts. Выбор кадров,
+        фильтрация объектов и перевод координат выполняются над массивами целиком
+    """
+
+    def __init__(self, counts, boxes, keypoints=None, ids=None):
+        """Инициализация объекта класса
+
+        Args:
+            counts (np.array): число объектов на каждом кадре
+            boxes (np.array): рамки объектов, форма (N, 6)
+            keypoints (np.array, optional): ключевые точки объектов, форма (N, K, 2 или 3). Defaults to None.
+            ids (np.array, optional): номера треков объектов. Defaults to None.
+        """
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.boxes = boxes
+        self.keypoints = keypoints
+        self.ids = ids
+
+    @classmethod
+    def concat(cls, batches):
+        """объединение результатов нескольких наборов кадров одной модели (кадры идут подряд)
+
+        Args:
+            batches (list): результаты наборов кадров
+
+        Returns:
+            ResultBatch: объединенные результаты
+        """
+        keypoints = [batch.keypoints for batch in batches if batch.keypoints is not None and len(batch.keypoints)]
+        ids = [batch.ids for batch in batches if batch.ids is not None]
+        return cls(np.concatenate([batch.counts for batch in batches]),
+                   np.concatenate([batch.boxes for batch in batches]),
+                   np.concatenate(keypoints) if keypoints else batches[0].keypoints,
+                   np.concatenate(ids) if len(ids) == len(batches) else None)
+
+    @classmethod
+    def from_results(cls, results, pose=False):
+        """перенос результатов ultralytics для батча в память хоста: рамки и ключевые
+           точки всех кадров объединяются и копируются один раз
+
+        Args:
+            results (list): результаты модели для каждого кадра
+            pose (bool, optional): результаты модели определения позы. Кадры без ключевых
+            точек считаются кадрами без людей. Defaults to False.
+
+        Returns:
+            ResultBatch: результаты батча
+        """
+        if pose:
+            present = [bool(res.keypoints) for res in results]
+            used = [res for res, has_keypoints in zip(results, present) if has_keypoints]
+            counts = [len(res.boxes) if has_keypoints else 0 for res, has_keypoints in zip(results, present)]
+        else:
+            used = results
+            counts = [len(res.boxes) for res in results]
+
+        if not used:
+            return cls(counts, np.empty((0, 6), dtype=np.float32), np.empty((0, 0, 2), dtype=np.float32) if pose else None)
+        boxes = to_host([res.boxes.data for res in used])
+        if boxes.shape[1] > 6:
+            # Результаты трекинга содержат номер трека перед уверенностью и классом
+            boxes = boxes[:, [0, 1, 2, 3, -2, -1]]
+        keypoints = to_host([res.keypoints.data for res in used]) if pose else None
+        return cls(counts, boxes, keypoints)
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def xyxy(self):
+        return self.boxes[:, :4]
+
+    @property
+    def conf(self):
+        return self.boxes[:, 4]
+
+    @property
+    def cls(self):
+        return self.boxes[:, 5]
+
+    @property
+    def object_frames(self):
+        """номер кадра батча для каждого объекта"""
+        return np.repeat(np.arange(len(self.counts)), self.counts)
+
+    def select(self, positions):
+        """выбор кадров батча
+
+        Args:
+            positions (list): номера кадров батча
+
+        Returns:
+            ResultBatch: результаты выбранных кадров
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(self.counts)))
+        counts = self.counts[positions]
+        rows = np.repeat(offsets[positions] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return self._rows(counts, rows)
+
+    def _rows(self, counts, rows):
+        """результаты с выбранными объектами (номерами или маской)"""
+        keypoints = self.keypoints[rows] if self.keypoints is not None and len(self.keypoints) else self.keypoints
+        ids = self.ids[rows] if self.ids is not None else None
+        return ResultBatch(counts, self.boxes[rows], keypoints, ids)
+
+    def filter(self, mask):
+        """выбор объектов батча
+
+        Args:
+            mask (np.array): маска объектов
+
+        Returns:
+            ResultBatch: результаты с выбранными объектами
+        """
+        counts = np.bincount(self.object_frames[mask], minlength=len(self.counts))
+        return self._rows(counts, mask)
+
+    def shift(self, x, y):
+        """сдвиг рамок и ключевых точек (перевод координат). Невидимые ключевые
+           точки (0, 0) не изменяются
+
+        Args:
+            x (float): сдвиг по горизонтали
+            y (float): сдвиг по вертикали
+        """
+        self.boxes[:, 0:4:2] += x
+        self.boxes[:, 1:4:2] += y
+        if self.keypoints is not None and len(self.keypoints):
+            visible = (self.keypoints[..., :2] != 0).any(-1)
+            self.keypoints[..., 0] += x * visible
+            self.keypoints[..., 1] += y * visible
+
+    def frames_with_classes(self, class_ids):
+        """кадры батча, на которых найдены объекты указанных классов
+
+        Args:
+            class_ids (list): номера классов модели
+
+        Returns:
+            np.array: номера кадров батча
+        """
+        return np.unique(self.object_frames[np.isin(self.cls, class_ids)])
+
+    def to_detection_lists(self, names):
+        """результаты в формате списков [(название класса, [x1, y1, x2, y2]), ...] для каждого кадра
+           (для совместимости)
+
+        Args:
+            names (dict): названия классов модели
+
+        Returns:
+            list: объекты каждого кадра
+        """
+        labels = [names[int(cls)] for cls in self.cls.tolist()]
+        boxes = self.xyxy.tolist()
+        offsets = np.concatenate(([0], np.cumsum(self.counts))).tolist()
+        return [list(zip(labels[start:stop], boxes[start:stop])) for start, stop in zip(offsets[:-1], offsets[1:])]
+
+    def to_pos_est_lists(self):
+        """результаты в формате списков [[номер человека, ключевые точки, [x1, y1, x2, y2]], ...]
+           для каждого кадра (для совместимости)
+
+        Returns:
+            list: объекты каждого кадра
+        """
+        keypoints = self.keypoints[..., :2].tolist() if self.keypoints is not None else []
+        boxes = self.xyxy.tolist()
+        offsets = np.concatenate(([0], np.cumsum(self.counts))).tolist()
+        return [[[i, keypoints[start + i], boxes[start + i]] for i in range(stop - start)]
+                for start, stop in zip(offsets[:-1], offsets[1:])]
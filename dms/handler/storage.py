@@ -0,0 +1,550 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+class FrameObjects:
+    """Представление объектов одного кадра таблицы результатов.
+       Содержит срезы столбцов таблицы без копирования данных
+    """
+
+    def __init__(self, table, index):
+        """Инициализация объекта класса
+
+        Args:
+            table (ResultTable): таблица результатов
+            index (int): номер строки (кадра) в таблице
+        """
+        self.table = table
+        self.index = index
+        self.frame_id = int(table.frame_ids[index])
+        self.timestamp = float(table.timestamps[index])
+        self.start, self.stop = table.offsets[index:index + 2].tolist()
+
+    def __getitem__(self, name):
+        return self.table.column(name)[self.start:self.stop]
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        """объекты кадра в формате записей (для совместимости)"""
+        return iter(self.table.object_records(self.start, self.stop))
+
+    def __bool__(self):
+        return len(self) > 0
+
+
+class TableView:
+    """Представление набора кадров таблицы результатов (например, временного окна).
+       Для непрерывного диапазона кадров столбцы объектов возвращаются без копирования
+    """
+
+    def __init__(self, table, rows):
+        """Инициализация объекта класса
+
+        Args:
+            table (ResultTable): таблица результатов
+            rows (np.array): номера строк (кадров) таблицы в порядке времени
+        """
+        self.table = table
+        self.rows = np.asarray(rows, dtype=np.int64)
+        offsets = table.offsets
+        if len(self.rows) == 0:
+            self._objects = slice(0, 0)
+        elif self.rows[-1] - self.rows[0] + 1 == len(self.rows) and np.all(np.diff(self.rows) == 1):
+            self._objects = slice(int(offsets[self.rows[0]]), int(offsets[self.rows[-1] + 1]))
+        else:
+            counts = offsets[self.rows + 1] - offsets[self.rows]
+            starts = np.repeat(offsets[self.rows] - np.cumsum(counts) + counts, counts)
+            self._objects = starts + np.arange(len(starts))
+
+    @property
+    def frame_ids(self):
+        """np.array: id кадров"""
+        return self.table.frame_ids[self.rows]
+
+    @property
+    def timestamps(self):
+        """np.array: временные метки кадров"""
+        return self.table.timestamps[self.rows]
+
+    @property
+    def counts(self):
+        """np.array: число объектов на каждом кадре"""
+        offsets = self.table.offsets
+        return offsets[self.rows + 1] - offsets[self.rows]
+
+    @property
+    def object_frame_ids(self):
+        """np.array: id кадра для каждого объекта"""
+        return np.repeat(self.frame_ids, self.counts)
+
+    @property
+    def object_timestamps(self):
+        """np.array: временная метка кадра для каждого объекта"""
+        return np.repeat(self.timestamps, self.counts)
+
+    def label_mask(self, name):
+        """маска объектов заданного класса (для таблиц детекции)
+
+        Args:
+            name (str): название класса
+
+        Returns:
+            np.array: булева маска объектов представления
+        """
+        label = self.table.label_index(name)
+        if label is None:
+            return np.zeros(len(self.column('cls')), dtype=bool)
+        return self.column('cls') == label
+
+    def column(self, name):
+        """столбец объектов выбранных кадров
+
+        Args:
+            name (str): название столбца
+
+        Returns:
+            np.array: значения столбца
+        """
+        return self.table.column(name)[self._objects]
+
+    def frames(self):
+        """объекты каждого кадра
+
+        Returns:
+            list: список FrameObjects
+        """
+        return [self.table.frame(row) for row in self.rows.tolist()]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        """кадры в формате записей (для совместимости)"""
+        for row in self.rows.tolist():
+            yield self.table[row]
+
+
+class ResultTable(ABC):
+    """ Столбцовое хранилище результатов обработки одного типа (формат CSR).
+
+        Для каждого кадра хранятся id, временная метка и смещение его объектов,
+        для объектов - столбцы numpy массивов. Массивы растут блоками с удвоением
+        емкости, поэтому добавление батча имеет амортизированную стоимость O(размер батча)
+    """
+    columns = {}  # название столбца объектов -> тип данных
+
+    def __init__(self, capacity=1024):
+        """Инициализация объекта класса
+
+        Args:
+            capacity (int, optional): начальная емкость таблицы. Defaults to 1024.
+        """
+        self._num_frames = 0
+        self._num_objects = 0
+        self._frame_ids = np.empty(capacity, dtype=np.int64)
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self._columns = {}  # создаются при первом добавлении, форма берется из данных
+        self._in_order = True  # строки добавлены в порядке возрастания временных меток
+        self._time_index = None  # (порядок строк, отсортированные метки), если порядок нарушен
+
+    @staticmethod
+    def _grow(array, size):
+        """увеличивает емкость массива не менее чем до size с удвоением"""
+        if len(array) >= size:
+            return array
+        new_array = np.empty((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+        new_array[:len(array)] = array
+        return new_array
+
+    @property
+    def frame_ids(self):
+        """np.array: id кадров"""
+        return self._frame_ids[:self._num_frames]
+
+    @property
+    def timestamps(self):
+        """np.array: временные метки кадров"""
+        return self._timestamps[:self._num_frames]
+
+    @property
+    def offsets(self):
+        """np.array: смещения объектов кадров, объекты кадра i лежат в [offsets[i], offsets[i + 1])"""
+        return self._offsets[:self._num_frames + 1]
+
+    @property
+    def counts(self):
+        """np.array: число объектов на каждом кадре"""
+        return np.diff(self.offsets)
+
+    @property
+    def object_frame_ids(self):
+        """np.array: id кадра для каждого объекта"""
+        return np.repeat(self.frame_ids, self.counts)
+
+    @property
+    def object_timestamps(self):
+        """np.array: временная метка кадра для каждого объекта"""
+        return np.repeat(self.timestamps, self.counts)
+
+    def column(self, name):
+        """столбец объектов таблицы
+
+        Args:
+            name (str): название столбца
+
+        Returns:
+            np.array: значения столбца для всех объектов таблицы
+        """
+        if name not in self._columns:
+            return np.empty(0, dtype=self.columns[name])
+        return self._columns[name][:self._num_objects]
+
+    def append(self, frame_ids, timestamps, counts, **columns):
+        """добавление батча кадров в таблицу
+
+        Args:
+            frame_ids (list): список с id кадров
+            timestamps (list): список с временными метками кадров
+            counts (list): число объектов на каждом кадре
+            columns (np.array): значения столбцов для объектов всех кадров батча подряд
+        """
+        start = self._num_frames
+        num_frames = self._num_frames + len(frame_ids)
+        num_objects = self._num_objects + int(np.sum(counts, dtype=np.int64))
+
+        self._frame_ids = self._grow(self._frame_ids, num_frames)
+        self._timestamps = self._grow(self._timestamps, num_frames)
+        self._offsets = self._grow(self._offsets, num_frames + 1)
+        self._frame_ids[self._num_frames:num_frames] = frame_ids
+        self._timestamps[self._num_frames:num_frames] = timestamps
+        self._offsets[self._num_frames + 1:num_frames + 1] = self._num_objects + np.cumsum(counts)
+
+        if num_objects > self._num_objects:
+            for name, dtype in self.columns.items():
+                values = np.asarray(columns[name], dtype=dtype)
+                if name not in self._columns:
+                    capacity = max(len(self._frame_ids), num_objects)
+                    self._columns[name] = np.empty((capacity,) + values.shape[1:], dtype=dtype)
+                self._columns[name] = self._grow(self._columns[name], num_objects)
+                self._columns[name][self._num_objects:num_objects] = values
+
+        self._num_frames = num_frames
+        self._num_objects = num_objects
+
+        # Индексом временных меток служит сам массив меток, пока кадры
+        # добавляются по возрастанию времени. Иначе индекс строится при запросе
+        new_timestamps = self._timestamps[start:num_frames]
+        if self._in_order and len(new_timestamps):
+            if (start and self._timestamps[start - 1] > new_timestamps[0]) \
+                    or np.any(new_timestamps[1:] < new_timestamps[:-1]):
+                self._in_order = False
+        self._time_index = None
+
+    def _sorted_timestamps(self):
+        """временные метки по возрастанию и соответствующий порядок строк
+
+        Returns:
+            (np.array, np.array | None): метки и номера строк (None, если порядок строк совпадает с временным)
+        """
+        if self._in_order:
+            return self.timestamps, None
+        if self._time_index is None:
+            order = np.argsort(self.timestamps, kind='stable')
+            self._time_index = (order, self.timestamps[order])
+        order, timestamps = self._time_index
+        return timestamps, order
+
+    def search(self, timestamp):
+        """поиск первого кадра с временной меткой не меньше заданной за O(log n)
+
+        Args:
+            timestamp (float): временная метка
+
+        Returns:
+            int | None: номер строки (кадра) или None, если такого кадра нет
+        """
+        timestamps, order = self._sorted_timestamps()
+        pos = int(np.searchsorted(timestamps, timestamp, side='left'))
+        if pos == len(timestamps):
+            return None
+        return pos if order is None else int(order[pos])
+
+    def nearest(self, timestamp):
+        """поиск кадра с ближайшей временной меткой за O(log n)
+
+        Args:
+            timestamp (float): временная метка
+
+        Returns:
+            int | None: номер строки (кадра) или None для пустой таблицы
+        """
+        timestamps, order = self._sorted_timestamps()
+        if len(timestamps) == 0:
+            return None
+        pos = int(np.searchsorted(timestamps, timestamp, side='left'))
+        if pos == len(timestamps) or (pos > 0 and timestamp - timestamps[pos - 1] <= timestamps[pos] - timestamp):
+            pos -= 1
+        return pos if order is None else int(order[pos])
+
+    def between(self, start, end):
+        """все кадры с временными метками в интервале [start, end]
+
+        Args:
+            start (float): начало интервала
+            end (float): конец интервала
+
+        Returns:
+            TableView: представление кадров интервала
+        """
+        timestamps, order = self._sorted_timestamps()
+        lo = np.searchsorted(timestamps, start, side='left')
+        hi = max(lo, np.searchsorted(timestamps, end, side='right'))
+        rows = np.arange(lo, hi) if order is None else order[lo:hi]
+        return TableView(self, rows)
+
+    def extend(self, other):
+        """добавление всех кадров другой таблицы того же типа в конец таблицы
+
+        Args:
+            other (ResultTable): таблица результатов
+        """
+        columns = {name: other.column(name) for name in other._columns}
+        self.append(other.frame_ids, other.timestamps, other.counts, **columns)
+
+    def tail(self, count):
+        """последние добавленные кадры
+
+        Args:
+            count (int): число кадров
+
+        Returns:
+            TableView: представление последних кадров
+        """
+        return TableView(self, np.arange(max(self._num_frames - count, 0), self._num_frames))
+
+    def drop_before(self, timestamp):
+        """удаление кадров с временной меткой меньше заданной (для ограничения памяти при потоковой обработке)
+
+        Args:
+            timestamp (float): временная метка
+        """
+        keep = TableView(self, np.flatnonzero(self.timestamps >= timestamp))
+        if len(keep) == self._num_frames:
+            return
+        frame_ids, timestamps, counts = keep.frame_ids, keep.timestamps, keep.counts
+        columns = {name: keep.column(name).copy() for name in self._columns}
+        self._num_frames = 0
+        self._num_objects = 0
+        self._in_order = True
+        self.append(frame_ids, timestamps, counts, **columns)
+
+    def frame(self, index):
+        """объекты кадра по номеру строки таблицы
+
+        Args:
+            index (int): номер строки (кадра)
+
+        Returns:
+            FrameObjects: представление объектов кадра
+        """
+        return FrameObjects(self, index)
+
+    @abstractmethod
+    def object_records(self, start, stop):
+        """объекты таблицы в формате записей (для совместимости)
+
+        Args:
+            start (int): номер первого объекта
+            stop (int): номер объекта, следующего за последним
+
+        Returns:
+            list: список записей объектов
+        """
+
+    def __len__(self):
+        return self._num_frames
+
+    def __getitem__(self, index):
+        """кадр в формате записи [id кадра, временная метка, объекты] (для совместимости)"""
+        if index < 0:
+            index += self._num_frames
+        if not 0 <= index < self._num_frames:
+            raise IndexError('frame index out of range')
+        frame = self.frame(index)
+        return [frame.frame_id, frame.timestamp, list(frame)]
+
+    def __iter__(self):
+        for index in range(self._num_frames):
+            yield self[index]
+
+    def to_arrays(self):
+        """представление таблицы в виде словаря массивов (для сохранения на диск)
+
+        Returns:
+            dict: массивы таблицы
+        """
+        arrays = {
+            'frame_ids': self.frame_ids,
+            'timestamps': self.timestamps,
+            'offsets': self.offsets
+        }
+        for name in self.columns:
+            arrays[name] = self.column(name)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """создание таблицы из словаря массивов, полученного из to_arrays
+
+        Args:
+            arrays (dict): массивы таблицы
+
+        Returns:
+            ResultTable: таблица результатов
+        """
+        table = cls(max(len(arrays['frame_ids']), 1))
+        table._load_arrays(arrays)
+        return table
+
+    def _load_arrays(self, arrays):
+        columns = {name: arrays[name] for name in self.columns if name in arrays}
+        self.append(arrays['frame_ids'], arrays['timestamps'], np.diff(arrays['offsets']), **columns)
+
+    @classmethod
+    @abstractmethod
+    def from_records(cls, records):
+        """создание таблицы из данных в формате записей
+
+        Args:
+            records (list): список кадров в формате [id кадра, временная метка, объекты]
+
+        Returns:
+            ResultTable: таблица результатов
+        """
+
+
+class DetectionTable(ResultTable):
+    """Таблица результатов моделей детекции. Для каждого объекта хранятся
+       номер класса в словаре таблицы labels и область xyxy
+    """
+    columns = {
+        'cls': np.int32,
+        'box': np.float32
+    }
+
+    def __init__(self, capacity=1024):
+        super().__init__(capacity)
+        self.labels = []  # названия классов
+        self._label_ids = {}
+
+    def label_id(self, name):
+        """номер класса в словаре таблицы, новые классы добавляются в словарь
+
+        Args:
+            name (str): название класса
+
+        Returns:
+            int: номер класса
+        """
+        if name not in self._label_ids:
+            self._label_ids[name] = len(self.labels)
+            self.labels.append(name)
+        return self._label_ids[name]
+
+    def label_index(self, name):
+        """номер класса в словаре таблицы без добавления новых классов
+
+        Args:
+            name (str): название класса
+
+        Returns:
+            int | None: номер класса или None, если класс не встречался
+        """
+        return self._label_ids.get(name)
+
+    def label_mask(self, name):
+        """маска объектов заданного класса
+
+        Args:
+            name (str): название класса
+
+        Returns:
+            np.array: булева маска объектов таблицы
+        """
+        if name not in self._label_ids:
+            return np.zeros(self._num_objects, dtype=bool)
+        return self.column('cls') == self._label_ids[name]
+
+    def extend(self, other):
+        label_ids = np.array([self.label_id(name) for name in other.labels], dtype=np.int32)
+        columns = {
+            'cls': label_ids[other.column('cls')] if len(label_ids) else other.column('cls'),
+            'box': other.column('box')
+        }
+        self.append(other.frame_ids, other.timestamps, other.counts, **columns)
+
+    def to_arrays(self):
+        arrays = super().to_arrays()
+        arrays['labels'] = np.array(self.labels, dtype=str)
+        return arrays
+
+    def _load_arrays(self, arrays):
+        for name in arrays['labels'].tolist():
+            self.label_id(name)
+        super()._load_arrays(arrays)
+
+    def object_records(self, start, stop):
+        labels = self.labels
+        return [(labels[cls], box) for cls, box in
+                zip(self.column('cls')[start:stop].tolist(), self.column('box')[start:stop].tolist())]
+
+    @classmethod
+    def from_records(cls, records):
+        table = cls(max(len(records), 1))
+        labels, boxes, counts = [], [], []
+        for _, _, objects in records:
+            counts.append(len(objects))
+            for name, xyxy in objects:
+                labels.append(table.label_id(name))
+                boxes.append(list(xyxy[:4]))
+        table.append([rec[0] for rec in records], [rec[1] for rec in records], counts,
+                     cls=np.array(labels, dtype=np.int32),
+                     box=np.array(boxes, dtype=np.float32).reshape(-1, 4))
+        return table
+
+
+class PoseTable(ResultTable):
+    """Таблица результатов моделей определения позы. Для каждого человека хранятся
+       его номер в кадре, ключевые точки и область xyxy
+    """
+    columns = {
+        'person': np.int32,
+        'keypoints': np.float32,
+        'box': np.float32
+    }
+
+    def object_records(self, start, stop):
+        return [[person, keys, box] for person, keys, box in
+                zip(self.column('person')[start:stop].tolist(),
+                    self.column('keypoints')[start:stop].tolist(),
+                    self.column('box')[start:stop].tolist())]
+
+    @classmethod
+    def from_records(cls, records):
+        table = cls(max(len(records), 1))
+        persons, keypoints, boxes, counts = [], [], [], []
+        for _, _, objects in records:
+            counts.append(len(objects))
+            for person, keys, xyxy in objects:
+                persons.append(person)
+                keypoints.append(keys)
+                boxes.append(list(xyxy[:4]))
+        table.append([rec[0] for rec in records], [rec[1] for rec in records], counts,
+                     person=np.array(persons, dtype=np.int32),
+                     keypoints=np.array(keypoints, dtype=np.float32),
+                     box=np.array(boxes, dtype=np.float32).reshape(-1, 4))
+        return table
@@ -0,0 +1,303 @@
+import numpy as np
+
+from dms.handler.results import ResultBatch
+
+# Параметры трекинга по умолчанию
+DEFAULT_TRACKING = {
+    'keyframe_interval': 5,
+    'iou_threshold': 0.3,
+    'max_age': 30,
+    'smoothing': 0.5
+}
+
+
+def box_iou(a, b):
+    """попарная метрика IoU рамок
+
+    Args:
+        a (np.array): рамки [x1, y1, x2, y2], форма (N, 4)
+        b (np.array): рамки [x1, y1, x2, y2], форма (M, 4)
+
+    Returns:
+        np.array: матрица IoU, форма (N, M)
+    """
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+class BoxTracker:
+    """ Трекер объектов одной модели.
+
+        На ключевых кадрах результаты модели сопоставляются с треками жадно по IoU
+        (в пределах класса), несопоставленные объекты получают новые номера. Между
+        ключевыми кадрами рамки и видимые ключевые точки треков сдвигаются с
+        постоянной скоростью, сглаженной по ключевым кадрам (alpha-beta фильтр)
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=30, smoothing=0.5):
+        """Инициализация объекта класса
+
+        Args:
+            iou_threshold (float, optional): минимальный IoU сопоставления. Defaults to 0.3.
+            max_age (int, optional): число кадров, после которого несопоставленный трек
+            удаляется. Defaults to 30.
+            smoothing (float, optional): вес предыдущей скорости при ее обновлении. Defaults to 0.5.
+        """
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.smoothing = smoothing
+        self.reset()
+
+    def reset(self):
+        """удаление всех треков"""
+        self.frame = 0
+        self.next_id = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 6), dtype=np.float32)  # текущие оценки рамок
+        self.observed = np.empty((0, 4), dtype=np.float32)  # рамки последнего сопоставления
+        self.velocity = np.empty((0, 4), dtype=np.float32)  # смещение рамки за кадр
+        self.last_seen = np.empty(0, dtype=np.int64)  # кадр последнего сопоставления
+        self.active = np.empty(0, dtype=bool)  # трек сопоставлен на последнем ключевом кадре
+        self.keypoints = None
+
+    def _advance(self):
+        """переход к следующему кадру: сдвиг треков на их скорость"""
+        self.frame += 1
+        self.boxes[:, :4] += self.velocity
+        if self.keypoints is not None and len(self.keypoints):
+            # Ключевые точки сдвигаются вместе с центром рамки, невидимые (0, 0) не изменяются
+            visible = (self.keypoints[..., :2] != 0).any(-1)
+            self.keypoints[..., 0] += ((self.velocity[:, 0] + self.velocity[:, 2]) / 2)[:, None] * visible
+            self.keypoints[..., 1] += ((self.velocity[:, 1] + self.velocity[:, 3]) / 2)[:, None] * visible
+
+    def _match(self, boxes):
+        """жадное сопоставление треков и объектов по убыванию IoU
+
+        Returns:
+            list: пары (номер трека, номер объекта)
+        """
+        if not len(self.ids) or not len(boxes):
+            return []
+        iou = box_iou(self.boxes[:, :4], boxes[:, :4])
+        iou[self.boxes[:, None, 5] != boxes[None, :, 5]] = 0
+        pairs = []
+        track_used = np.zeros(len(self.ids), dtype=bool)
+        object_used = np.zeros(len(boxes), dtype=bool)
+        for flat in np.argsort(-iou, axis=None):
+            track, obj = divmod(int(flat), len(boxes))
+            if iou[track, obj] < self.iou_threshold:
+                break
+            if track_used[track] or object_used[obj]:
+                continue
+            track_used[track] = object_used[obj] = True
+            pairs.append((track, obj))
+        return pairs
+
+    def update(self, boxes, keypoints=None):
+        """обновление треков результатами модели на ключевом кадре
+
+        Args:
+            boxes (np.array): рамки объектов кадра, форма (N, 6)
+            keypoints (np.array, optional): ключевые точки объектов. Defaults to None.
+
+        Returns:
+            tuple: номера треков объектов (в порядке объектов) и признак изменения состава
+            треков (появился новый трек или потерян трек предыдущего ключевого кадра)
+        """
+        self._advance()
+        pairs = self._match(boxes)
+        tracks = np.array([track for track, _ in pairs], dtype=np.int64)
+        objects = np.array([obj for _, obj in pairs], dtype=np.int64)
+
+        ids = np.empty(len(boxes), dtype=np.int64)
+        lost = self.active.copy()
+        if len(pairs):
+            measured = (boxes[objects, :4] - self.observed[tracks]) / (self.frame - self.last_seen[tracks])[:, None]
+            self.velocity[tracks] = self.smoothing * self.velocity[tracks] + (1 - self.smoothing) * measured
+            self.boxes[tracks] = boxes[objects]
+            self.observed[tracks] = boxes[objects, :4]
+            self.last_seen[tracks] = self.frame
+            if keypoints is not None:
+                self.keypoints[tracks] = keypoints[objects]
+            ids[objects] = self.ids[tracks]
+            lost[tracks] = False
+        self.active[:] = False
+        self.active[tracks] = True
+
+        new = np.setdiff1d(np.arange(len(boxes)), objects)
+        if len(new):
+            new_ids = np.arange(self.next_id, self.next_id + len(new))
+            self.next_id += len(new)
+            ids[new] = new_ids
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.boxes = np.concatenate([self.boxes, boxes[new]]).astype(np.float32)
+            self.observed = np.concatenate([self.observed, boxes[new, :4]]).astype(np.float32)
+            self.velocity = np.concatenate([self.velocity, np.zeros((len(new), 4), dtype=np.float32)])
+            self.last_seen = np.concatenate([self.last_seen, np.full(len(new), self.frame)])
+            self.active = np.concatenate([self.active, np.ones(len(new), dtype=bool)])
+            if keypoints is not None:
+                new_keypoints = keypoints[new].astype(np.float32)
+                self.keypoints = new_keypoints if self.keypoints is None or not len(self.keypoints) \
+                    else np.concatenate([self.keypoints, new_keypoints])
+
+        # Удаление треков, не сопоставленных дольше max_age кадров
+        alive = self.frame - self.last_seen <= self.max_age
+        if not alive.all():
+            for name in ('ids', 'boxes', 'observed', 'velocity', 'last_seen', 'active'):
+                setattr(self, name, getattr(self, name)[alive])
+            if self.keypoints is not None:
+                self.keypoints = self.keypoints[alive]
+        return ids, bool(len(new)) or bool(lost.any())
+
+    def predict(self):
+        """оценка объектов следующего кадра без применения модели
+
+        Returns:
+            tuple: рамки, ключевые точки (или None) и номера треков, сопоставленных
+            на последнем ключевом кадре
+        """
+        self._advance()
+        keypoints = self.keypoints[self.active] if self.keypoints is not None else None
+        return self.boxes[self.active].copy(), keypoints, self.ids[self.active]
+
+    def skip(self):
+        """переход к следующему кадру без оценки объектов"""
+        self._advance()
+
+
+class KeyframeTracker:
+    """ Применение моделей обработки к ключевым кадрам с трекингом объектов между ними.
+
+        Модели применяются к каждому keyframe_interval-му кадру, а также к первому кадру
+        следующего батча, если на ключевом кадре появился новый или потерялся прежний
+        объект. Для остальных кадров объекты оцениваются трекерами моделей. Результаты
+        возвращаются в формате VideoHandler.run_models, номера треков сохраняются в
+        ResultBatch.ids и используются как номера людей
+    """
+
+    def __init__(self, handler, config=None):
+        """Инициализация объекта класса
+
+        Args:
+            handler (VideoHandler): обработчик, модели которого применяются к ключевым кадрам
+            config (dict, optional): параметры трекинга (см. DEFAULT_TRACKING). Defaults to None.
+        """
+        self.handler = handler
+        self.config = {**DEFAULT_TRACKING, **(config or {})}
+        self.trackers = {}
+        self.reset()
+
+    def reset(self):
+        """сброс треков и расписания ключевых кадров (например, перед новым видео)"""
+        self.since_keyframe = None  # кадров после последнего ключевого, None - следующий кадр ключевой
+        self.force = False
+        self.trackers = {}
+
+    def _tracker(self, model_name):
+        if model_name not in self.trackers:
+            params = {name: self.config[name] for name in ('iou_threshold', 'max_age', 'smoothing')}
+            self.trackers[model_name] = BoxTracker(**params)
+        return self.trackers[model_name]
+
+    def schedule(self, frame_count):
+        """выбор ключевых кадров батча
+
+        Args:
+            frame_count (int): число кадров батча
+
+        Returns:
+            list: номера ключевых кадров батча
+        """
+        keyframes = []
+        interval = max(int(self.config['keyframe_interval']), 1)
+        for position in range(frame_count):
+            if self.force or self.since_keyframe is None or self.since_keyframe + 1 >= interval:
+                keyframes.append(position)
+                self.since_keyframe = 0
+                self.force = False
+            else:
+                self.since_keyframe += 1
+        return keyframes
+
+    def run(self, frames):
+        """применение моделей к ключевым кадрам батча и трекинг объектов на остальных кадрах
+
+        Args:
+            frames (np.array): кадры для обработки
+
+        Returns:
+            list: необработанные результаты моделей в формате VideoHandler.run_models
+        """
+        keyframes = self.schedule(len(frames))
+        raw_results = self.handler.run_models([frames[i] for i in keyframes]) if keyframes else []
+        observed = {}
+        for task, model_name, batch, names, indices in raw_results:
+            positions = keyframes if indices is None else [keyframes[i] for i in indices]
+            observed[model_name] = (task, batch, names, dict(zip(positions, range(len(positions)))))
+
+        cascade = self.handler.config['processing'].get('cascade', False)
+        keyframe_set = set(keyframes)
+        outputs = []  # (тип обработки, название модели, названия классов, объекты кадров)
+        for task in ('detection', 'pos_est'):
+            for model_name, model in self.handler.models[task]:
+                model_conf = self.handler.config['models'][model_name]
+                trigger = model_conf.get('trigger') if cascade else None
+                tracker = self._tracker(model_name)
+                _, batch, _, rows = observed.get(model_name, (task, None, None, {}))
+                offsets = np.concatenate(([0], np.cumsum(batch.counts))) if batch is not None else None
+
+                frame_objects = [None] * len(frames)
+                for position in range(len(frames)):
+                    if position in keyframe_set:
+                        if position not in rows:
+                            # Модель не применялась к ключевому кадру (каскадный режим)
+                            tracker.skip()
+                            continue
+                        start, stop = offsets[rows[position]], offsets[rows[position] + 1]
+                        keypoints = batch.keypoints[start:stop] if task == 'pos_est' and stop > start else None
+                        ids, changed = tracker.update(batch.boxes[start:stop], keypoints)
+                        self.force = self.force or changed
+                        frame_objects[position] = (batch.boxes[start:stop], keypoints, ids)
+                    elif trigger is not None and not self._triggered(outputs, trigger, position):
+                        tracker.skip()
+                    else:
+                        frame_objects[position] = tracker.predict()
+                outputs.append((task, model_name, model.names, frame_objects))
+
+        return [self._to_raw(task, model_name, names, frame_objects)
+                for task, model_name, names, frame_objects in outputs
+                if any(objects is not None for objects in frame_objects)]
+
+    @staticmethod
+    def _triggered(outputs, trigger, position):
+        """проверка условия запуска модели по объектам уже обработанных моделей на кадре"""
+        for task, _, names, frame_objects in outputs:
+            if task != trigger['task'] or frame_objects[position] is None:
+                continue
+            class_ids = [cls for cls, name in names.items() if name in trigger['classes']]
+            if np.isin(frame_objects[position][0][:, 5], class_ids).any():
+                return True
+        return False
+
+    @staticmethod
+    def _to_raw(task, model_name, names, frame_objects):
+        """объединение объектов кадров модели в необработанный результат"""
+        indices = [position for position, objects in enumerate(frame_objects) if objects is not None]
+        used = [frame_objects[position] for position in indices]
+        counts = [len(boxes) for boxes, _, _ in used]
+        boxes = np.concatenate([boxes for boxes, _, _ in used]).astype(np.float32)
+        keypoints = [keypoints for _, keypoints, _ in used if keypoints is not None and len(keypoints)]
+        if task == 'pos_est':
+            keypoints = np.concatenate(keypoints) if keypoints else np.empty((0, 0, 2), dtype=np.float32)
+        else:
+            keypoints = None
+        ids = np.concatenate([ids for _, _, ids in used])
+        batch = ResultBatch(counts, boxes, keypoints, ids)
+        return task, model_name, batch, names, None if len(indices) == len(frame_objects) else indices
@@ -2,19 +2,31 @@ import gradio as gr
 import pandas as pd
 import cv2
 
-from dms.engine import Engine
+from dms.engine.jobs import DEFAULT_SERVING, JobQueue
+from dms.settings import config as default_config
+
+COLUMNS = ['Начало', 'Конец', 'Человек', 'Нарушение']
 
 
 class Interface():
-    """Класс демонстрационного интерфейса системы
+    """Класс демонстрационного интерфейса системы.
+
+    Видео обрабатываются в очереди заданий (JobQueue), номер задания хранится
+    в состоянии сессии, поэтому пользователи получают только результаты своих видео
     """
-    def __init__(self) -> None:
-        """Инициализация объекта класса"""
-        self.engine = Engine()
+    def __init__(self, config=default_config) -> None:
+        """Инициализация объекта класса
+
+        Args:
+            config (dict, optional): конфигурация системы. Defaults to config.
+        """
+        self.jobs = JobQueue(config)
+        self.serving = {**DEFAULT_SERVING, **config.get('serving', {})}
 
         self.inputs  = [
             gr.Video(label='Input Video'),
-            gr.Textbox(lines=1, placeholder="0:00", label='Введите время нарушения')
+            gr.Textbox(lines=1, placeholder="0:00", label='Введите время нарушения'),
+            gr.State({})
         ]
 
         self.outputs = [
@@ -23,8 +35,10 @@ class Interface():
                 label="Результат обработки видео",
                 row_count=3,
                 col_count=4,
-                headers=['Начало', 'Конец', 'Человек', 'Нарушение'],
+                headers=COLUMNS,
             ),
+            gr.Textbox(label='Статус обработки'),
+            gr.State({})
         ]
 
         self.demo = gr.Interface(
@@ -32,33 +46,68 @@ class Interface():
             inputs=self.inputs,
             outputs=self.outputs,
         )
+        self.demo.queue(default_concurrency_limit=self.serving.get('concurrency_limit'))
+
+    @staticmethod
+    def status_text(state):
+        """описание состояния задания для интерфейса
+
+        Args:
+            state (dict): состояние задания (Job.snapshot)
 
-        self.last_video = None
-        self.pd_data = None
+        Returns:
+            str: описание состояния
+        """
+        if state['status'] == 'queued':
+            return f'Задание {state["id"]}: в очереди'
+        if state['status'] == 'running':
+            return f'Задание {state["id"]}: обработано {state["progress"]:.0%}'
+        if state['status'] == 'failed':
+            return f'Задание {state["id"]}: ошибка обработки ({state["error"]})'
+        return f'Задание {state["id"]}: обработка завершена'
 
-    def logic(self, video_path, image_time):
-        """метод, отвечающий за функционал всех компонентов интерфейса
+    def logic(self, video_path, image_time, session):
+        """метод, отвечающий за функционал всех компонентов интерфейса. Пока видео
+           обрабатывается, выдаются прогресс и уже найденные нарушения
 
         Args:
             video_path (str): путь к видео
             image_time (str): временная метка
+            session (dict): состояние сессии (путь к видео и номер задания)
 
-        Returns:
-            (nd.array, pd.Dataframe): обработанный кадр, информация о нарушениях
+        Yields:
+            (nd.array, pd.Dataframe, str, dict): обработанный кадр, информация о нарушениях,
+            состояние обработки, состояние сессии
         """
-        image = None
+        if not video_path:
+            yield None, pd.DataFrame(columns=COLUMNS), '', {}
+            return
 
-        if video_path and self.last_video != video_path:
-            violations = self.engine.violations_search(video_path)
-            self.pd_ans = pd.DataFrame(violations, columns=['Начало', 'Конец', 'Человек', 'Нарушение'])
-            self.last_video = video_path
+        job = self.jobs.get(session.get('job')) if session.get('video') == video_path else None
+        # Задание, завершившееся ошибкой, ставится в очередь заново при повторном запуске
+        if job is None or job.status == 'failed':
+            try:
+                job = self.jobs.submit(video_path)
+            except RuntimeError as e:
+                raise gr.Error(str(e))
+            session = {'video': video_path, 'job': job.id}
 
-        if image_time and video_path:
+        # До завершения задания выдаются промежуточные результаты
+        while not job.done.wait(self.serving['poll_interval']):
+            state = job.snapshot()
+            yield None, pd.DataFrame(state['violations'], columns=COLUMNS), self.status_text(state), session
+
+        state = job.snapshot()
+        if state['status'] == 'failed':
+            raise gr.Error(self.status_text(state))
+
+        image = None
+        if image_time:
             time_ms = sum([int(el) * 60 ** i for i, el in enumerate(image_time.split(':')[::-1])]) * 1000
-            image = self.engine.show_violations(time_ms, video_path)
+            image = self.jobs.show_frame(job, time_ms)
             image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        
-        return image, self.pd_ans
+
+        yield image, pd.DataFrame(state['violations'], columns=COLUMNS), self.status_text(state), session
 
 
     def launch(self):
@@ -8,10 +8,11 @@ config = {
         'models': {
             'yolo_phone_detection': {
                 'path': './trained_models/70_7_x_best.pt',
-                'format': 'YOLO',
+                'format': 'YOLO',  # бэкенд исполнения: YOLO (PyTorch), ONNX (ONNX Runtime), OpenVINO
                 'task': 'detection',
                 'specific_params': {
-                    'conf': 0.8
+                    'conf': 0.8,
+                    'precision': 'fp32'  # fp32, fp16 или int8 (int8 только для ONNX и OpenVINO)
                 }
             },
             'yolo_pose_detection': {
@@ -19,18 +20,98 @@ config = {
                 'format': 'YOLO',
                 'task': 'pos_est',
                 'specific_params': {
-                    'conf': 0.8
+                    'conf': 0.8,
+                    'precision': 'fp32'
+                },
+                # в каскадном режиме модель запускается только на кадрах,
+                # где модели детекции нашли указанные объекты
+                'trigger': {
+                    'task': 'detection',
+                    'classes': ['cell phones']
                 }
             },
         },
         'processing': {
             'BATCH_SIZE': 4,
-            'save_path': None
+            'save_path': None,  # каталог для видео с разметкой результатов, None - видео не сохраняется
+            'export': {  # параметры сохранения видео с разметкой
+                'clips': False,  # сохранять только фрагменты вокруг нарушений
+                'padding': 1000,  # расширение фрагментов нарушений в обе стороны (мс)
+                'codec': 'mp4v',
+                'batch_size': 16,  # число кадров в батче между потоками декодирования, отрисовки и кодирования
+                'queue_size': 4
+            },
+            'pipeline': True,  # конвейерная обработка: декодирование, инференс и постобработка в отдельных потоках
+            'queue_size': 4,  # максимальное число батчей в очереди между стадиями конвейера
+            'frame_buffer': {  # декодирование кадров в заранее выделенные массивы батчей
+                'enabled': True,
+                'slots': 3  # максимальное число массивов батчей, чтение ждет возврата массива обработанного
+                            # батча. Для конвейера (pipeline) нужно не меньше 3
+            },
+            'segment_workers': 1,  # число процессов для параллельной обработки фрагментов одного видео
+                                  # (несовместимо с tracking и motion_gating)
+            'cascade': False,  # запуск зависимых моделей только на кадрах, удовлетворяющих условию 'trigger'
+                               # (на остальных кадрах нет результатов этих моделей, например поз)
+            # Кэш результатов обработки на диске, по умолчанию выключен. Для включения:
+            # {'path': './cache', 'max_size_mb': 2048} - каталог кэша и его максимальный размер
+            'cache': None,
+            'preprocessing': {
+                'roi': None,  # область интереса камеры [x1, y1, x2, y2] в пикселях кадра, None - весь кадр
+                'imgsz': None,  # размер входа моделей, None - размер по умолчанию модели
+                'models': {}  # параметры 'roi' и 'imgsz' для отдельных моделей: название модели -> параметры
+            },
+            'tracking': {  # применение моделей к ключевым кадрам и трекинг объектов между ними
+                          # (кроме InferenceScheduler)
+                'enabled': False,
+                'keyframe_interval': 5,  # модели применяются к каждому N-му кадру
+                'iou_threshold': 0.3,  # минимальный IoU сопоставления объекта с треком
+                'max_age': 30,  # число кадров, после которого несопоставленный трек удаляется
+                'smoothing': 0.5  # вес предыдущей скорости трека при ее обновлении
+            },
+            'concurrency': {  # одновременное применение независимых моделей в пуле потоков
+                'enabled': False,
+                'workers': None,  # число потоков пула, None - по числу независимых моделей
+                'threads': {}  # число потоков моделей: название модели -> число, по умолчанию ядра
+                               # делятся поровну между независимыми моделями. Для ONNX и OpenVINO
+                               # задается потокам сессии модели, для YOLO - общему числу потоков
+                               # torch (наибольшее значение среди моделей YOLO)
+            },
+            'motion_gating': {  # повтор результатов предыдущего кадра для статичных кадров вместо инференса
+                               # (кроме InferenceScheduler)
+                'enabled': False,
+                'threshold': 2.0,  # минимальное среднее отличие яркости (0-255) от последнего обработанного кадра
+                'width': 64,  # ширина уменьшенного кадра для сравнения
+                'max_skip': 30  # максимальное число кадров подряд без инференса
+            }
         }
     },
+    'renderer': {
+        'frame_cache_size': 64,  # число последних кадров в LRU кэше
+        'max_open_videos': 4,  # число одновременно открытых видео
+        'max_forward_frames': 30  # максимальное число кадров, дочитываемых последовательно вместо перемотки
+    },
+    'serving': {
+        'workers': 2,  # число видео, обрабатываемых одновременно
+        'max_pending': 8,  # максимальное число заданий, ожидающих обработки
+        'max_jobs': 32,  # число хранимых заданий (результаты старых завершенных заданий удаляются)
+        'concurrency_limit': 16,  # число одновременно обслуживаемых запросов интерфейса
+        'poll_interval': 0.5  # период обновления прогресса в интерфейсе (с)
+    },
+    'metrics': {
+        'enabled': False,  # замеры длительности стадий обработки и счетчики кадров
+        'flush_interval': 10,  # период передачи метрик приемникам (с), None - только по завершении обработки
+        'sinks': [  # приемники метрик: json (строки json), prometheus (текстовый формат), memory
+            {'type': 'json', 'path': './results/metrics.jsonl'},
+            {'type': 'prometheus', 'path': './results/metrics.prom'}
+        ]
+    },
     'analyser': {
+        # Правила поиска нарушений: признак нарушения ('evidence', см. dms.analysis.rules)
+        # вычисляется по кадрам для каждого человека, метки с признаком объединяются в интервалы
         'wrist_phone_usage': {
             'required_data': ['detection', 'pos_est'],
+            'evidence': 'phone_near_wrist',
+            'violation': 'использование телефона',
             'min_duration': 3000,
             'max_wrist_dist': 200,
             'max_short_diff': 2000,
@@ -0,0 +1,280 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class _VideoSource:
+    """Открытое видео: объект захвата, параметры потока, индекс ключевых кадров
+       и временных меток кадров
+    """
+
+    def __init__(self, path):
+        """Инициализация объекта класса
+
+        Args:
+            path (str): путь к видео
+        """
+        self.path = path
+        self.stat = self._stat(path)
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.keyframes, self.timestamps = self._build_index(path)
+        if self.keyframes is not None:
+            self.frame_count = len(self.timestamps)
+        else:
+            # Без индекса временные метки заполняются по мере чтения кадров
+            self.frame_count = max(int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+            self.timestamps = np.full(self.frame_count, np.nan)
+        self.position = 0  # номер кадра, который будет прочитан следующим
+
+    @staticmethod
+    def _build_index(path):
+        """индекс ключевых кадров и временных меток всех кадров. Пакеты видео читаются
+           без декодирования, поэтому построение индекса значительно быстрее чтения кадров
+
+        Args:
+            path (str): путь к видео
+
+        Returns:
+            (np.array, np.array): номера ключевых кадров и временные метки кадров или
+            (None, None), если бэкенд OpenCV не поддерживает чтение пакетов или порядок
+            пакетов не совпадает с порядком отображения кадров
+        """
+        cap = cv2.VideoCapture(path)
+        try:
+            if not cap.set(cv2.CAP_PROP_FORMAT, -1):
+                return None, None
+            keyframes = []
+            timestamps = []
+            while cap.grab():
+                if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    keyframes.append(len(timestamps))
+                timestamps.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+        finally:
+            cap.release()
+        if not keyframes or keyframes[0] != 0:
+            return None, None
+        timestamps = np.array(timestamps, dtype=np.float64)
+        # Пакеты читаются в порядке декодирования. При B-кадрах (H.264, HEVC) он отличается
+        # от порядка отображения, номер пакета не равен номеру кадра, и используется
+        # поиск по частоте кадров и декодированным кадрам
+        if not np.all(np.diff(timestamps) >= 0):
+            return None, None
+        return np.array(keyframes, dtype=np.int64), timestamps
+
+    @staticmethod
+    def _stat(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def is_stale(self):
+        """проверка, что файл видео изменился после открытия"""
+        try:
+            return self._stat(self.path) != self.stat
+        except OSError:
+            return True
+
+    def frame_time(self, index):
+        """временная метка кадра: из индекса, если она известна, иначе по частоте кадров"""
+        if index < len(self.timestamps) and not np.isnan(self.timestamps[index]):
+            return float(self.timestamps[index])
+        return index * 1000 / self.fps if self.fps else None
+
+    def find(self, timestamp):
+        """номер первого кадра с временной меткой не меньше заданной по индексу
+
+        Returns:
+            int | None: номер кадра или None, если индекс не построен
+        """
+        if self.keyframes is None or not self.frame_count:
+            return None
+        return min(int(np.searchsorted(self.timestamps, timestamp, side='left')), self.frame_count - 1)
+
+    def estimate_index(self, timestamp):
+        """оценка номера первого кадра с временной меткой не меньше заданной"""
+        if not self.fps or timestamp <= 0:
+            return 0
+        index = max(math.ceil(timestamp * self.fps / 1000 - 1e-6), 0)
+        if self.frame_count:
+            index = min(index, self.frame_count - 1)
+        return index
+
+    def _seek_target(self, index, max_forward):
+        """номер кадра для перемотки или None, если кадр выгоднее дочитать последовательно"""
+        if self.keyframes is not None:
+            # Перемотка к ближайшему предшествующему ключевому кадру, если он
+            # находится после текущей позиции декодера
+            keyframe = int(self.keyframes[np.searchsorted(self.keyframes, index, side='right') - 1])
+            if index < self.position or keyframe > self.position:
+                return keyframe
+            return None
+        if index < self.position or index - self.position > max_forward:
+            return index
+        return None
+
+    def read(self, index, max_forward):
+        """чтение кадра по номеру. Декодер переходит к ближайшему предшествующему
+           ключевому кадру и декодирует вперед только от него, если между текущей
+           позицией и кадром нет ключевых кадров, кадры дочитываются последовательно.
+           Без индекса ключевых кадров перемотка выполняется, когда кадр дальше
+           max_forward кадров от текущей позиции
+
+        Args:
+            index (int): номер кадра (с 0)
+            max_forward (int): максимальное число кадров, пропускаемых без перемотки
+            (без индекса ключевых кадров)
+
+        Returns:
+            np.array | None: кадр или None, если кадр не удалось прочитать
+        """
+        target = self._seek_target(index, max_forward)
+        if target is not None:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            self.position = target
+        while self.position < index:
+            if not self.cap.grab():
+                return None
+            self.position += 1
+        success, frame = self.cap.read()
+        if not success:
+            return None
+        self.position = index + 1
+        if self.keyframes is None and index < len(self.timestamps):
+            self.timestamps[index] = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        return frame
+
+    def release(self):
+        self.cap.release()
+
+
+class FrameReader:
+    """ Произвольный доступ к кадрам видео.
+
+        Хранит открытые объекты захвата для последних видео, индекс ключевых кадров
+        и временных меток, построенный при открытии видео, и LRU кэш последних
+        возвращенных кадров, поэтому время получения кадра не зависит от его
+        положения в видео
+    """
+
+    def __init__(self, cache_size=64, max_videos=4, max_forward=30):
+        """Инициализация объекта класса
+
+        Args:
+            cache_size (int, optional): число кадров в LRU кэше. Defaults to 64.
+            max_videos (int, optional): число одновременно открытых видео. Defaults to 4.
+            max_forward (int, optional): максимальное число кадров, которые дочитываются
+            последовательно вместо перемотки. Defaults to 30.
+        """
+        self.cache_size = cache_size
+        self.max_videos = max_videos
+        self.max_forward = max_forward
+        self._sources = OrderedDict()
+        self._frames = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _source(self, path):
+        """открытое видео из кэша или новое"""
+        source = self._sources.get(path)
+        if source is not None and source.is_stale():
+            self._drop(path)
+            source = None
+        if source is None:
+            source = _VideoSource(path)
+            self._sources[path] = source
+            while len(self._sources) > self.max_videos:
+                self._drop(next(iter(self._sources)))
+        self._sources.move_to_end(path)
+        return source
+
+    def _drop(self, path):
+        """закрытие видео и удаление его кадров из кэша"""
+        source = self._sources.pop(path, None)
+        if source is not None:
+            source.release()
+        for key in [key for key in self._frames if key[0] == path]:
+            del self._frames[key]
+
+    def _read_cached(self, path, index):
+        """получение кадра из LRU кэша или чтение из видео с записью в кэш"""
+        source = self._source(path)
+        key = (path, index)
+        if key in self._frames:
+            self._frames.move_to_end(key)
+            return self._frames[key]
+
+        frame = source.read(index, self.max_forward)
+        if frame is not None and self.cache_size:
+            self._frames[key] = frame
+            while len(self._frames) > self.cache_size:
+                self._frames.popitem(last=False)
+        return frame
+
+    def read(self, path, index):
+        """получение кадра по номеру. Возвращается копия, которую можно изменять
+
+        Args:
+            path (str): путь к видео
+            index (int): номер кадра (с 0)
+
+        Returns:
+            np.array | None: кадр или None, если кадр не удалось прочитать
+        """
+        with self._lock:
+            frame = self._read_cached(path, index)
+            return None if frame is None else frame.copy()
+
+    def frame_index(self, path, timestamp):
+        """номер первого кадра с временной меткой не меньше заданной
+
+        Args:
+            path (str): путь к видео
+            timestamp (float): временная метка
+
+        Returns:
+            int: номер кадра (с 0)
+        """
+        with self._lock:
+            source = self._source(path)
+            index = source.find(timestamp)
+            if index is not None:
+                return index
+
+            # Без индекса оценка по частоте кадров уточняется по фактическим временным меткам
+            index = source.estimate_index(timestamp)
+            while True:
+                known = index < len(source.timestamps) and not np.isnan(source.timestamps[index])
+                if not known and self._read_cached(path, index) is None:
+                    return max(index - 1, 0)
+                current = source.frame_time(index)
+                if current is None or current >= timestamp:
+                    break
+                index += 1
+            while index > 0:
+                previous = source.frame_time(index - 1)
+                if previous is None or previous < timestamp:
+                    break
+                index -= 1
+            return index
+
+    def read_at(self, path, timestamp):
+        """получение первого кадра с временной меткой не меньше заданной
+
+        Args:
+            path (str): путь к видео
+            timestamp (float): временная метка
+
+        Returns:
+            np.array | None: кадр или None, если кадр не удалось прочитать
+        """
+        with self._lock:
+            return self.read(path, self.frame_index(path, timestamp))
+
+    def close(self):
+        """закрытие всех открытых видео и очистка кэша"""
+        with self._lock:
+            for path in list(self._sources):
+                self._drop(path)
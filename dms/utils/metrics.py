@@ -0,0 +1,306 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Границы корзин гистограмм длительности (с), как в клиентах Prometheus
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Гистограмма наблюдений с фиксированными корзинами, суммой и числом наблюдений"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последняя корзина - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        """состояние гистограммы с накопленными (cumulative) значениями корзин"""
+        cumulative, total = [], 0
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return {
+            'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], cumulative)),
+            'sum': self.sum,
+            'count': self.count
+        }
+
+
+class _Timer:
+    """контекстный менеджер замера длительности блока кода"""
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _NullTimer:
+    """пустой замер, используется при выключенных метриках"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """ Метрики обработки: счетчики и гистограммы длительности с метками.
+
+        При выключенных метриках замеры не выполняются: timer() возвращает пустой
+        контекстный менеджер, а inc() и observe() сразу завершаются. Накопленные
+        значения периодически и по завершении обработки передаются приемникам
+    """
+
+    def __init__(self):
+        """Инициализация объекта класса"""
+        self.enabled = False
+        self.sinks = []
+        self.buckets = DEFAULT_BUCKETS
+        self.flush_interval = None
+        self._counters = {}  # (название, метки) -> значение
+        self._histograms = {}  # (название, метки) -> Histogram
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        """настройка метрик по конфигурации системы
+
+        Args:
+            config (dict | None): раздел конфигурации 'metrics', None - метрики выключены
+        """
+        config = config or {}
+        self.enabled = config.get('enabled', False)
+        self.buckets = tuple(config.get('buckets', DEFAULT_BUCKETS))
+        self.flush_interval = config.get('flush_interval')
+        self.sinks = [create_sink(sink_conf) for sink_conf in config.get('sinks', [])]
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """увеличение счетчика
+
+        Args:
+            name (str): название метрики
+            value (float, optional): приращение. Defaults to 1.
+        """
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """добавление наблюдения в гистограмму
+
+        Args:
+            name (str): название метрики
+            value (float): значение (длительность в секундах)
+        """
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+        if self.flush_interval and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def timer(self, name, **labels):
+        """замер длительности блока кода: with metrics.timer('decode_seconds'): ...
+
+        Args:
+            name (str): название метрики
+
+        Returns:
+            контекстный менеджер замера
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def snapshot(self):
+        """текущие значения всех метрик
+
+        Returns:
+            dict: время снимка, счетчики и гистограммы в виде списков
+            {'name', 'labels', 'value'} и {'name', 'labels', 'sum', 'count', 'buckets'}
+        """
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in self._counters.items()]
+            histograms = [{'name': name, 'labels': dict(labels), **histogram.snapshot()}
+                          for (name, labels), histogram in self._histograms.items()]
+        return {'time': time.time(), 'counters': counters, 'histograms': histograms}
+
+    def flush(self):
+        """передача текущих значений метрик всем приемникам"""
+        self._last_flush = time.monotonic()
+        if not self.enabled or not self.sinks:
+            return
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink.export(snapshot)
+
+    def reset(self):
+        """сброс накопленных значений"""
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+
+class MemorySink:
+    """Приемник, сохраняющий снимки метрик в памяти (для тестов)"""
+
+    def __init__(self):
+        self.snapshots = []
+
+    def export(self, snapshot):
+        self.snapshots.append(snapshot)
+
+    @property
+    def last(self):
+        """последний снимок или None"""
+        return self.snapshots[-1] if self.snapshots else None
+
+
+class JSONSink:
+    """Приемник, дописывающий каждый снимок метрик строкой json в файл"""
+
+    def __init__(self, path):
+        """Инициализация объекта класса
+
+        Args:
+            path (str): путь к файлу
+        """
+        self.path = path
+
+    def export(self, snapshot):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(snapshot, ensure_ascii=False) + '\n')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in items) + '}'
+
+
+def to_prometheus(snapshot, prefix='dms_'):
+    """представление снимка метрик в текстовом формате Prometheus
+
+    Args:
+        snapshot (dict): снимок метрик
+        prefix (str, optional): префикс названий метрик. Defaults to 'dms_'.
+
+    Returns:
+        str: текст метрик
+    """
+    lines = []
+    declared = set()
+    # Строки одной метрики должны идти подряд
+    for counter in sorted(snapshot['counters'], key=lambda counter: counter['name']):
+        name = prefix + counter['name']
+        if name not in declared:
+            lines.append(f'# TYPE {name} counter')
+            declared.add(name)
+        lines.append(f'{name}{_format_labels(counter["labels"])} {counter["value"]}')
+    for histogram in sorted(snapshot['histograms'], key=lambda histogram: histogram['name']):
+        name = prefix + histogram['name']
+        if name not in declared:
+            lines.append(f'# TYPE {name} histogram')
+            declared.add(name)
+        labels = histogram['labels']
+        for bound, count in histogram['buckets'].items():
+            lines.append(f'{name}_bucket{_format_labels(labels, {"le": bound})} {count}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {histogram["sum"]}')
+        lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusSink:
+    """ Приемник, записывающий метрики в текстовом формате Prometheus.
+        Файл перезаписывается атомарно и подходит для textfile collector node_exporter
+    """
+
+    def __init__(self, path, prefix='dms_'):
+        """Инициализация объекта класса
+
+        Args:
+            path (str): путь к файлу
+            prefix (str, optional): префикс названий метрик. Defaults to 'dms_'.
+        """
+        self.path = path
+        self.prefix = prefix
+
+    def export(self, snapshot):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(to_prometheus(snapshot, self.prefix))
+        os.replace(tmp_path, self.path)
+
+
+# Реестр приемников метрик: значение поля 'type' конфигурации -> класс
+SINKS = {
+    'json': JSONSink,
+    'prometheus': PrometheusSink,
+    'memory': MemorySink
+}
+
+
+def create_sink(sink_conf):
+    """создание приемника метрик по описанию из конфигурации
+
+    Args:
+        sink_conf (dict): тип приемника ('type') и параметры его создания
+
+    Returns:
+        приемник метрик
+    """
+    params = dict(sink_conf)
+    sink_type = params.pop('type')
+    if sink_type not in SINKS:
+        raise ValueError(f'Неизвестный приемник метрик: {sink_type}')
+    return SINKS[sink_type](**params)
+
+
+# Общие метрики процесса
+metrics = Metrics()
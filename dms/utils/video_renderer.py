@@ -1,11 +1,23 @@
 import cv2
 
+from dms.utils.frame_reader import FrameReader
+
 
 class VideoRenderer():
     """Класс, содержащий вспомогательные методы для работы с изоражениями и видео"""
-    def __init__(self) -> None:
-        """Инициализация объекта класса"""
-        self.config = None 
+    def __init__(self, config=None) -> None:
+        """Инициализация объекта класса
+
+        Args:
+            config (dict, optional): параметры доступа к кадрам видео (размер кэша кадров,
+            число открытых видео). Defaults to None.
+        """
+        self.config = config or {}
+        self.reader = FrameReader(
+            cache_size=self.config.get('frame_cache_size', 64),
+            max_videos=self.config.get('max_open_videos', 4),
+            max_forward=self.config.get('max_forward_frames', 30)
+        )
 
     @staticmethod
     def plot_boxes(frame, data, type = 'detection'): 
@@ -32,7 +44,23 @@ class VideoRenderer():
         return frame
 
     @staticmethod
-    def save_handled_frame(frame_id, saved_video_path, img_save_path):
+    def plot_keypoints(frame, keypoints):
+        """метод для отрисовки ключевых точек людей. Невидимые точки (0, 0) пропускаются
+
+        Args:
+            frame (np.array): кадр
+            keypoints (np.array): ключевые точки людей кадра, форма (N, K, 2)
+
+        Returns:
+            nd.array: кадр с отрисованными точками
+        """
+        for person in keypoints:
+            for x, y in person[:, :2].tolist():
+                if x or y:
+                    frame = cv2.circle(frame, (int(x), int(y)), 4, (255, 0, 0), -1)
+        return frame
+
+    def save_handled_frame(self, frame_id, saved_video_path, img_save_path):
         """метод для сохранения кадра из видео
 
         Args:
@@ -40,19 +68,12 @@ class VideoRenderer():
             saved_video_path (_type_): пусть к видео
             img_save_path (_type_): путь сохранения кадра 
         """
-        cap = cv2.VideoCapture(saved_video_path)
-        count = 1
-        _, frame = cap.read()
-
-        while count != frame_id:
-            count += 1
-            _, frame = cap.read()
+        frame = self.reader.read(saved_video_path, frame_id - 1)
 
         cv2.imwrite(f'{img_save_path}/detection_frame_{frame_id}.jpg', frame)
         print('image was saved')
 
-    @staticmethod
-    def get_frame(timestamp, saved_video_path):
+    def get_frame(self, timestamp, saved_video_path):
         """поиск кадра по временной метке
 
         Args:
@@ -62,8 +83,16 @@ class VideoRenderer():
         Returns:
             np.array: искомый кадр
         """
-        cap = cv2.VideoCapture(saved_video_path)
-        _, frame = cap.read()
-        while cap.get(cv2.CAP_PROP_POS_MSEC) < timestamp:
-            _, frame = cap.read()
-        return frame
\ No newline at end of file
+        return self.reader.read_at(saved_video_path, timestamp)
+
+    def get_frame_by_id(self, frame_id, saved_video_path):
+        """получение кадра по id, записанному обработчиком
+
+        Args:
+            frame_id (int): id кадра (номер кадра, начиная с 1)
+            saved_video_path (str): путь к видео
+
+        Returns:
+            np.array: искомый кадр
+        """
+        return self.reader.read(saved_video_path, frame_id - 1)
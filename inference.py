@@ -2,6 +2,7 @@ import argparse
 import pandas as pd
 
 from dms.engine import Engine
+from dms.engine.batch import collect_videos, process_videos
 
 parser = argparse.ArgumentParser()
 
@@ -9,10 +10,24 @@ parser.add_argument('-v', '--video-path', help="Путь к исходному 
                     type=str, default='data/test_short.mp4')
 parser.add_argument('-s', '--save-path', help="Место для хранения csv",
                     type=str, default='results/results.csv')
-args = parser.parse_args()
+parser.add_argument('-i', '--input', help="Пакетный режим: каталоги, шаблоны путей или манифесты с видео",
+                    type=str, nargs='+', default=None)
+parser.add_argument('-o', '--output-dir', help="Каталог результатов пакетного режима",
+                    type=str, default='results')
+parser.add_argument('-w', '--workers', help="Число процессов-обработчиков в пакетном режиме",
+                    type=int, default=1)
+parser.add_argument('-t', '--threads', help="Число потоков torch на процесс-обработчик",
+                    type=int, default=None)
 
-dms = Engine()
-violations = dms.violations_search(args.video_path)
+if __name__ == '__main__':
+    args = parser.parse_args()
 
-ans_df = pd.DataFrame(violations, columns=['Начало', 'Конец', 'Человек', 'Нарушение'])
-ans_df.to_csv(args.save_path, index=False)
+    if args.input:
+        videos = collect_videos(args.input)
+        process_videos(videos, args.output_dir, workers=args.workers, threads=args.threads)
+    else:
+        dms = Engine()
+        violations = dms.violations_search(args.video_path)
+
+        ans_df = pd.DataFrame(violations, columns=['Начало', 'Конец', 'Человек', 'Нарушение'])
+        ans_df.to_csv(args.save_path, index=False)